@@ -1,32 +1,385 @@
 # api.py
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 import json
 import os
+import sys
+import threading
+import time
+import paho.mqtt.client as mqtt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+from codec import decode
+from mqtt_config import BROKER_ADDRESS, BROKER_PORT, TOPICS
+from stream import EVICTED_FRAME, KEEPALIVE_FRAME, SseServer, StreamHub, sse_token
+from topology import TopologyView, edges_to_graph
+from topology_index import TopologyIndex, check_line_order, line_neighbors
 
 app = Flask(__name__)
 CACHE_FILE = "neighbors_cache.json"
+METRICS_FILE = os.getenv("METRICS_FILE", "master_metrics.json")  # written by the master node
+METRICS_PREFIX = "topology_"
+MAX_NEAREST = 100  # largest k accepted by /topology/nearest
+NEIGHBORS_TOPIC = "neighbors/update"  # same feed as listener.py
+STREAM_PORT = int(os.getenv("STREAM_PORT", 5001))          # asyncio SSE server for many subscribers
+STREAM_BUFFER = int(os.getenv("STREAM_BUFFER", 1024))      # events kept for resuming subscribers
+STREAM_MAX_LAG = int(os.getenv("STREAM_MAX_LAG", 256))     # events a subscriber may fall behind before eviction
+STREAM_HEARTBEAT = 15.0  # seconds between keepalive comments on an idle stream
+
+class JsonFileCache:
+    """
+    Parsed contents of a JSON file kept in memory: the neighbors cache
+    written by listener.py, or the metrics file written by the master.
+
+    The file is only re-read when its mtime or size changes, and its JSON
+    body (served as is by /neighbors) is serialized once per reload. The
+    (mtime, size) signature doubles as the ETag of the responses.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.signature = None
+        # (data, serialized body, etag, last modified), swapped as a whole
+        self.current = ({}, b"{}", "empty", None)
+
+    def get(self):
+        """Current (data, body, etag, last_modified), reloading the file if it changed."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+        signature = (stat.st_mtime_ns, stat.st_size) if stat else None
+        if signature == self.signature:
+            return self.current
+
+        with self.lock:
+            if signature == self.signature:
+                return self.current
+            if stat is None:
+                data = {}
+            else:
+                try:
+                    with open(self.path, "r") as f:
+                        data = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    # Keep serving the last good copy; the next request retries
+                    print(f"Erro ao ler {self.path}:", e)
+                    return self.current
+            etag = f"{signature[0]:x}-{signature[1]:x}" if signature else "empty"
+            self.current = (data, app.json.dumps(data).encode(), etag, stat.st_mtime if stat else None)
+            self.signature = signature
+            return self.current
+
+neighbor_cache = JsonFileCache(CACHE_FILE)
+metrics_cache = JsonFileCache(METRICS_FILE)
 
 def load_neighbors():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r") as f:
-            return json.load(f)
-    return {}
+    return neighbor_cache.get()[0]
+
+def conditional_response(etag, last_modified, build_body):
+    """
+    304 when the client already has version `etag` of the cache, otherwise
+    a JSON response built by `build_body()`; both carry the ETag and
+    Last-Modified headers.
+    """
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(build_body(), mimetype="application/json")
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
 
 @app.route("/neighbors/<station>", methods=["GET"])
 def get_neighbors(station):
-    data = load_neighbors()
+    data, _, etag, last_modified = neighbor_cache.get()
     if station in data:
-        return jsonify({
+        return conditional_response(etag, last_modified, lambda: app.json.dumps({
             "station": station,
             "left": data[station].get("left"),
             "right": data[station].get("right")
-        })
+        }))
     else:
         return jsonify({"error": "Estação não encontrada"}), 404
 
 @app.route("/neighbors", methods=["GET"])
 def get_all():
-    return jsonify(load_neighbors())
+    _, body, etag, last_modified = neighbor_cache.get()
+    return conditional_response(etag, last_modified, lambda: body)
+
+def load_metrics():
+    """Latest master metrics snapshot plus the age of the last topology publish."""
+    metrics = dict(metrics_cache.get()[0])
+    now = time.time()
+    gauges = list(metrics.get("gauges", []))
+    for gauge in gauges:
+        if gauge["name"] == "last_publish_timestamp":
+            gauges.append({"name": "last_publish_age_seconds", "labels": {}, "value": now - gauge["value"]})
+            break
+    if "timestamp" in metrics:
+        gauges.append({"name": "metrics_age_seconds", "labels": {}, "value": now - metrics["timestamp"]})
+    metrics["gauges"] = gauges
+    return metrics
+
+def prometheus_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def prometheus_text(metrics):
+    """Prometheus text exposition (version 0.0.4) of a metrics snapshot."""
+    lines = []
+    for kind, entries in (("counter", metrics.get("counters", [])), ("gauge", metrics.get("gauges", []))):
+        declared = set()
+        for entry in entries:
+            name = METRICS_PREFIX + entry["name"]
+            if name not in declared:
+                lines.append(f"# TYPE {name} {kind}")
+                declared.add(name)
+            lines.append(f"{name}{prometheus_labels(entry['labels'])} {entry['value']}")
+    for timing in metrics.get("timings", []):
+        name = METRICS_PREFIX + timing["name"]
+        lines.append(f"# TYPE {name} summary")
+        lines.append(f"{name}_count {timing['count']}")
+        lines.append(f"{name}_sum {timing['sum']}")
+        lines.append(f"# TYPE {name}_max gauge")
+        lines.append(f"{name}_max {timing['max']}")
+        lines.append(f"# TYPE {name}_last gauge")
+        lines.append(f"{name}_last {timing['last']}")
+    return "\n".join(lines) + "\n"
+
+class TopologyService:
+    """
+    The master's topology stream (topology/snapshot and topology/delta)
+    followed through a TopologyView, with a TopologyIndex rebuilt by a
+    background thread for every new version. Requests read whichever
+    index is current: it is swapped in whole and never modified, so they
+    take no lock and never wait for a rebuild.
+
+    The master's line order (topology/line_order, see things.order_lines)
+    is kept as received; it is served by /topology/lines and gives the
+    upstream/downstream stations of /topology/stations/<station>.
+
+    Topology messages, line orders and neighbor updates are also
+    forwarded, as they arrive, to the subscribers of /stream through `hub`.
+    """
+
+    def __init__(self):
+        self.view = TopologyView()
+        self.hub = StreamHub(STREAM_BUFFER, STREAM_MAX_LAG, snapshot=self.stream_snapshot)
+        self.index = TopologyIndex(None, {}, set())
+        self.stale = True
+        self.indexed_version = None
+        self.indexed_state = None
+        self.line_order = None
+        self.client = None
+
+    def on_connect(self, client, userdata, flags, rc):
+        print("Conectado ao broker MQTT (topologia)")
+        client.subscribe(TOPICS["TOPOLOGY_SNAPSHOT"], qos=1)
+        client.subscribe(TOPICS["TOPOLOGY_DELTA"], qos=1)
+        client.subscribe(TOPICS["LINE_ORDER"], qos=1)
+        client.subscribe(NEIGHBORS_TOPIC)
+
+    def on_message(self, client, userdata, msg):
+        # A malformed message is logged and dropped: raising here would stop the network thread
+        try:
+            self._handle(client, msg.topic, decode(msg.payload))
+        except Exception as e:
+            print(f"Erro ao processar mensagem de {msg.topic}:", e)
+
+    def _handle(self, client, topic, message):
+        if topic == NEIGHBORS_TOPIC:
+            self.hub.publish("neighbors", {"kind": "update", "station": message.get("station"),
+                                           "left": message.get("left_neighbor"),
+                                           "right": message.get("right_neighbor")})
+            return
+        if topic == TOPICS["LINE_ORDER"]:
+            check_line_order(message)
+            self.line_order = message
+            self.hub.publish("neighbors", {"kind": "line_order", **message})
+            return
+        if topic == TOPICS["TOPOLOGY_SNAPSHOT"]:
+            self.view.apply_snapshot(message)
+            self.hub.publish("topology", {"kind": "snapshot", **message})
+        else:
+            if not self.view.apply_delta(message):
+                # Missed a delta: ask the master for a fresh snapshot
+                client.publish(TOPICS["TOPOLOGY_RESYNC"], "{}")
+            self.hub.publish("topology", {"kind": "delta", **message})
+
+    def stream_snapshot(self):
+        """Current state for a new /stream subscriber, or one too far behind to resume."""
+        with self.view.changed:
+            seq, positions, edges, stale = self.view.seq, self.view.positions, self.view.edges, self.view.stale
+        line_order = self.line_order
+        events = [("neighbors", {"kind": "snapshot", "stations": neighbor_cache.get()[0]})]
+        if line_order is not None:
+            events.append(("neighbors", {"kind": "line_order", **line_order}))
+        if seq is not None:
+            events.append(("topology", {"kind": "snapshot", "seq": seq, "positions": positions,
+                                        "graph": edges_to_graph(positions, edges), "stale": stale}))
+        return events
+
+    def refresh(self):
+        """Rebuilds the index if the view changed since the last build; returns True when it did."""
+        version, positions, edges, stale = self.view.state()
+        if version == self.indexed_version:
+            return False
+        # Turning stale bumps the version but keeps the (copy-on-write) containers
+        if self.indexed_state is None or positions is not self.indexed_state[0] or edges is not self.indexed_state[1]:
+            self.index = TopologyIndex(self.view.seq, positions, edges)
+            self.indexed_state = (positions, edges)
+        self.stale = stale
+        self.indexed_version = version
+        return True
+
+    def _run_indexer(self):
+        while True:
+            self.view.wait_for_change(self.indexed_version)
+            try:
+                self.refresh()
+            except Exception as e:
+                print("Erro ao indexar topologia:", e)
+                time.sleep(1)
+
+    def start(self, broker=BROKER_ADDRESS, port=BROKER_PORT):
+        threading.Thread(target=self._run_indexer, daemon=True).start()
+        self.client = mqtt.Client()
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.client.connect(broker, port, 60)
+        self.client.loop_start()
+
+topology_service = TopologyService()
+
+def topology_error(message, status):
+    return jsonify({"error": message}), status
+
+def float_arg(name):
+    value = request.args.get(name)
+    return None if value is None else float(value)
+
+def query_point(index):
+    """Station id (?station=) or coordinates (?x=&y=) of a spatial query."""
+    station = request.args.get("station")
+    if station is not None:
+        if station not in index:
+            raise KeyError(station)
+        return station
+    x, y = float_arg("x"), float_arg("y")
+    if x is None or y is None:
+        raise ValueError("Indique station ou x e y")
+    return (x, y)
+
+@app.route("/topology", methods=["GET"])
+def get_topology():
+    index = topology_service.index
+    line_order = topology_service.line_order
+    return jsonify({"seq": index.seq, "stale": topology_service.stale, "stations": len(index),
+                    "lines": None if line_order is None else len(line_order["lines"]),
+                    "index_build_seconds": index.build_time,
+                    "stream_clients": topology_service.hub.clients, "stream_evicted": topology_service.hub.evicted})
+
+@app.route("/topology/stations/<station>", methods=["GET"])
+def get_topology_station(station):
+    index = topology_service.index
+    if station not in index:
+        return topology_error("Estação não encontrada", 404)
+    line_order = topology_service.line_order
+    line = line_neighbors(line_order, station) if line_order is not None else None
+    return jsonify({"station": station, "position": index.position(station), **(line or {"line": None})})
+
+@app.route("/topology/lines", methods=["GET"])
+def get_lines():
+    line_order = topology_service.line_order
+    if line_order is None:
+        return topology_error("Ordem das linhas indisponível", 404)
+    return jsonify(line_order)
+
+@app.route("/topology/within", methods=["GET"])
+def get_within():
+    index = topology_service.index
+    try:
+        point = query_point(index)
+        radius = float_arg("radius")
+        if radius is None or radius < 0:
+            raise ValueError("radius inválido")
+    except KeyError:
+        return topology_error("Estação não encontrada", 404)
+    except ValueError as e:
+        return topology_error(str(e), 400)
+    return jsonify({"seq": index.seq, "stations": index.within(point, radius)})
+
+@app.route("/topology/nearest", methods=["GET"])
+def get_nearest():
+    index = topology_service.index
+    try:
+        point = query_point(index)
+        k = int(request.args.get("k", 5))
+        if not 0 < k <= MAX_NEAREST:
+            raise ValueError(f"k deve estar entre 1 e {MAX_NEAREST}")
+    except KeyError:
+        return topology_error("Estação não encontrada", 404)
+    except ValueError as e:
+        return topology_error(str(e), 400)
+    return jsonify({"seq": index.seq, "stations": index.nearest(point, k)})
+
+@app.route("/topology/path", methods=["GET"])
+def get_path():
+    index = topology_service.index
+    source, target = request.args.get("from"), request.args.get("to")
+    if source not in index or target not in index:
+        return topology_error("Estação não encontrada", 404)
+    path = index.hop_path(source, target)
+    if path is None:
+        return topology_error("Estações não ligadas", 404)
+    return jsonify({"seq": index.seq, "hops": len(path) - 1, "path": path})
+
+@app.route("/stream", methods=["GET"])
+def get_stream():
+    """
+    Server-Sent Events of neighbor and topology changes. Each subscriber
+    holds a server thread here; the asyncio server on STREAM_PORT serves the
+    same stream to many subscribers.
+    """
+    hub = topology_service.hub
+    client = hub.open(sse_token({"last-event-id": request.headers.get("Last-Event-ID")},
+                                request.args.to_dict(flat=False)))
+
+    def events():
+        try:
+            while True:
+                frames = hub.poll(client)
+                if frames is None:
+                    yield EVICTED_FRAME
+                    return
+                if frames:
+                    yield b"".join(frames)
+                elif not hub.wait(client, STREAM_HEARTBEAT):
+                    yield KEEPALIVE_FRAME
+        finally:
+            hub.close(client)
+
+    response = app.response_class(events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return app.response_class(prometheus_text(load_metrics()), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics.json", methods=["GET"])
+def get_metrics_json():
+    return jsonify(load_metrics())
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    topology_service.start()
+    SseServer(topology_service.hub, port=STREAM_PORT, heartbeat=STREAM_HEARTBEAT).start()
+    app.run(host="0.0.0.0", port=5000, threaded=True)
@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+
+def write_atomic(path, data, prefix=".tmp."):
+    """
+    Writes `data` (str or bytes) to `path` through a temporary file in the
+    same directory and an atomic rename, so readers see either the previous
+    file or the whole new one. The temporary file is removed on failure and
+    the error re-raised.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,120 @@
+import asyncio
+import math
+import random
+import time
+
+from bleak import BleakScanner
+
+RSSI_ALPHA = 0.2           # EWMA weight of a new advertisement
+RSSI_PRIOR_VARIANCE = 9.0  # dB^2 assumed before a device has been heard a few times
+DEVICE_MAX_AGE = 60        # seconds without advertisements before a device is forgotten
+MIN_DISTANCE_VARIANCE = 0.01
+
+
+class RssiStats:
+    """Exponentially weighted mean and variance of one device's RSSI."""
+    __slots__ = ("mean", "variance", "count", "last_seen")
+
+    def __init__(self, rssi, timestamp):
+        self.mean = float(rssi)
+        self.variance = RSSI_PRIOR_VARIANCE
+        self.count = 1
+        self.last_seen = timestamp
+
+    def add(self, rssi, timestamp, alpha):
+        diff = rssi - self.mean
+        increment = alpha * diff
+        self.mean += increment
+        self.variance = (1 - alpha) * (self.variance + diff * increment)
+        self.count += 1
+        self.last_seen = timestamp
+
+
+class RssiTracker:
+    """
+    Streaming per-device RSSI aggregation.
+
+    Every advertisement updates a constant-size EWMA of the device's RSSI
+    mean and variance, so a station can listen continuously and still
+    report a smoothed distance and a real variance at any moment. Devices
+    not heard for `max_age` seconds are dropped.
+    """
+
+    def __init__(self, alpha=RSSI_ALPHA, max_age=DEVICE_MAX_AGE):
+        self.alpha = alpha
+        self.max_age = max_age
+        self.devices = {}  # name -> RssiStats
+
+    def update(self, name, rssi, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        stats = self.devices.get(name)
+        if stats is None:
+            self.devices[name] = RssiStats(rssi, timestamp)
+        else:
+            stats.add(rssi, timestamp, self.alpha)
+
+    def snapshot(self, now=None):
+        """Fresh devices as {name: RssiStats}, forgetting the stale ones."""
+        now = time.time() if now is None else now
+        stale = [name for name, stats in self.devices.items() if now - stats.last_seen > self.max_age]
+        for name in stale:
+            del self.devices[name]
+        return dict(self.devices)
+
+
+def distance_variance(distance, rssi_variance, n=2.0):
+    """
+    Variance of a log-distance estimate from the variance of the RSSI it was
+    computed from (first-order propagation through d = 10^((tx - rssi) / 10n)).
+    """
+    slope = distance * math.log(10) / (10 * n)
+    return max(slope * slope * rssi_variance, MIN_DISTANCE_VARIANCE)
+
+
+class BleakAdvertisementSource:
+    """Continuous passive scan with bleak, reporting every advertisement."""
+
+    async def run(self, on_advertisement, stop):
+        def detection_callback(device, advertisement_data):
+            name = device.name or advertisement_data.local_name
+            on_advertisement(name, advertisement_data.rssi, time.time())
+
+        scanner = BleakScanner(detection_callback=detection_callback)
+        await scanner.start()
+        try:
+            await stop.wait()
+        finally:
+            await scanner.stop()
+
+
+class SimulatedAdvertisementSource:
+    """
+    Advertiser stream for tests and simulations without BLE hardware: every
+    `interval` seconds each advertiser in `distances` ({name: metres})
+    reports an RSSI from the log-distance model plus Gaussian noise.
+    """
+
+    def __init__(self, distances, interval=0.1, noise_db=2.0, tx_power=-59, n=2.0, seed=None):
+        self.distances = dict(distances)
+        self.interval = interval
+        self.noise_db = noise_db
+        self.tx_power = tx_power
+        self.n = n
+        self.random = random.Random(seed)
+
+    def rssi_at(self, distance):
+        return self.tx_power - 10 * self.n * math.log10(distance) + self.random.gauss(0, self.noise_db)
+
+    def advertise(self, on_advertisement):
+        """Emits one advertisement per advertiser."""
+        now = time.time()
+        for name, distance in list(self.distances.items()):
+            on_advertisement(name, self.rssi_at(distance), now)
+
+    async def run(self, on_advertisement, stop):
+        while not stop.is_set():
+            self.advertise(on_advertisement)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
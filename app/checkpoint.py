@@ -0,0 +1,34 @@
+import json
+import zlib
+
+from atomic_file import write_atomic
+
+CHECKPOINT_VERSION = 1
+
+
+def write_checkpoint(path, state):
+    """
+    Writes `state` (JSON-serializable) as zlib-compressed JSON through a
+    temporary file and an atomic rename, so a crash mid-write leaves the
+    previous checkpoint intact.
+    """
+    data = zlib.compress(json.dumps({"checkpoint_version": CHECKPOINT_VERSION, **state},
+                                    separators=(",", ":")).encode("utf-8"))
+    write_atomic(path, data, prefix=".checkpoint.")
+    return len(data)
+
+
+def read_checkpoint(path):
+    """State written by write_checkpoint, None when there is none; ValueError when it is unreadable."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        state = json.loads(zlib.decompress(data))
+    except (zlib.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Corrupt checkpoint {path}: {e}") from e
+    if not isinstance(state, dict) or state.get("checkpoint_version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint {path}")
+    return state
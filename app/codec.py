@@ -0,0 +1,256 @@
+import itertools
+import json
+import re
+import struct
+
+# Payload format of the neighbors and topology topics.
+#
+# JSON payloads are unchanged. Binary payloads start with a header byte with
+# the high bit set (never the first byte of a JSON document), whose low bits
+# are the format version, followed by a kind byte and a string table that
+# interns every station id once (ids joined by NUL bytes):
+#
+#   header u8 | kind u8 | n_strings u16 | table_size u32 | utf-8 table | body
+#
+# Bodies (little endian, ids as u16 indices into the string table):
+#   neighbors: from u16 | n u16 | n * (id u16, dist f32, var f32)
+#   snapshot:  [epoch u32] | seq u32 | positions body | graph body
+#   delta:     [epoch u32] | seq u32 | positions body (moved) | n u16 | n * removed id u16 |
+#              n u16 | n * added edge (u16, u16) | n u16 | n * removed edge (u16, u16)
+# with
+#   positions body: n u16 | n * (id u16, x f32, y f32)
+#   graph body:     n u16 | n * id u16 | n * degree u16 | sum(degree) * neighbor u16
+#
+# The epoch, present when FLAG_EPOCH is set in the kind byte, identifies the
+# publisher instance: sequence numbers only compare within one epoch.
+BINARY_VERSION = 1
+BINARY_HEADER = 0x80 | BINARY_VERSION
+PAYLOAD_FORMATS = ("json", "binary")
+
+KIND_NEIGHBORS = 1
+# 2 and 3 were standalone positions and graph payloads, replaced by snapshots and deltas
+KIND_SNAPSHOT = 4
+KIND_DELTA = 5
+FLAG_STALE = 0x40  # or-ed into the kind byte of a snapshot restored from disk
+FLAG_EPOCH = 0x20  # or-ed into the kind byte of a snapshot or delta that carries its epoch
+
+_COUNT = struct.Struct("<H")
+_PREFIX = struct.Struct("<BBHI")
+_NEIGHBOR = struct.Struct("<Hff")
+_POSITION = struct.Struct("<Hff")
+_SEQ = struct.Struct("<I")
+_JSON_SENDER = re.compile(rb'"from"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def _string_table(kind, ids):
+    """Header and string table for `ids`; returns (bytes, {id: index})."""
+    strings = list(dict.fromkeys(ids))
+    if len(strings) > 0xFFFF:
+        raise ValueError("Too many distinct ids for a binary payload")
+    table = "\0".join(strings)
+    if table.count("\0") != max(len(strings) - 1, 0):
+        raise ValueError("Ids with NUL characters cannot be sent as a binary payload")
+    raw = table.encode("utf-8")
+    index = {value: i for i, value in enumerate(strings)}
+    return _PREFIX.pack(BINARY_HEADER, kind, len(strings), len(raw)) + raw, index
+
+
+def _check_format(fmt):
+    if fmt not in PAYLOAD_FORMATS:
+        raise ValueError(f"Unknown payload format '{fmt}', expected one of {PAYLOAD_FORMATS}")
+
+
+def encode_neighbors(station_id, data, fmt="json"):
+    """Payload of station/<master>/neighbors: {"from": station_id, "data": [{id, dist, var}]}."""
+    _check_format(fmt)
+    if fmt == "json":
+        return json.dumps({"from": station_id, "data": data}).encode("utf-8")
+    head, index = _string_table(KIND_NEIGHBORS, [station_id] + [entry["id"] for entry in data])
+    parts = [head, _COUNT.pack(index[station_id]), _COUNT.pack(len(data))]
+    parts.extend(_NEIGHBOR.pack(index[entry["id"]], entry["dist"], entry["var"]) for entry in data)
+    return b"".join(parts)
+
+
+def _pack_positions(index, positions):
+    parts = [_COUNT.pack(len(positions))]
+    parts.extend(_POSITION.pack(index[node_id], x, y) for node_id, (x, y) in positions.items())
+    return b"".join(parts)
+
+
+def _pack_ids(values):
+    """u16 array body; always the last part of a payload since it is read up to the end."""
+    return struct.pack(f"<{len(values)}H", *values)
+
+
+def _graph_values(index, graph):
+    values = [len(graph)]
+    values.extend([index[node_id] for node_id in graph])
+    values.extend([len(neighbors) for neighbors in graph.values()])
+    values.extend([index[n] for neighbors in graph.values() for n in neighbors])
+    return values
+
+
+def _edge_values(index, edges):
+    values = [len(edges)]
+    values.extend([index[node_id] for edge in edges for node_id in edge])
+    return values
+
+
+def _pack_seq(epoch, seq):
+    return _SEQ.pack(seq) if epoch is None else _SEQ.pack(epoch) + _SEQ.pack(seq)
+
+
+def encode_snapshot(seq, positions, graph, fmt="json", stale=False, epoch=None):
+    """
+    Payload of topology/snapshot: {"seq", "positions": {id: [x, y]}, "graph": {id: [ids]}},
+    plus "stale": true for a topology not recomputed since the master restarted
+    and "epoch" (a u32) when given.
+    """
+    _check_format(fmt)
+    if fmt == "json":
+        message = {"seq": seq, "positions": positions, "graph": graph}
+        if epoch is not None:
+            message["epoch"] = epoch
+        if stale:
+            message["stale"] = True
+        return json.dumps(message).encode("utf-8")
+    kind = KIND_SNAPSHOT | (FLAG_STALE if stale else 0) | (0 if epoch is None else FLAG_EPOCH)
+    head, index = _string_table(kind, itertools.chain(positions, graph, *graph.values()))
+    return head + _pack_seq(epoch, seq) + _pack_positions(index, positions) + _pack_ids(_graph_values(index, graph))
+
+
+def encode_delta(seq, moved, removed, added_edges, removed_edges, fmt="json", epoch=None):
+    """
+    Payload of topology/delta: {"seq", "moved": {id: [x, y]}, "removed": [ids],
+    "added_edges": [[id, id]], "removed_edges": [[id, id]]}, plus "epoch" when given.
+    """
+    _check_format(fmt)
+    if fmt == "json":
+        message = {"seq": seq, "moved": moved, "removed": removed,
+                   "added_edges": added_edges, "removed_edges": removed_edges}
+        if epoch is not None:
+            message["epoch"] = epoch
+        return json.dumps(message).encode("utf-8")
+    kind = KIND_DELTA | (0 if epoch is None else FLAG_EPOCH)
+    head, index = _string_table(kind, itertools.chain(moved, removed, *added_edges, *removed_edges))
+    values = [len(removed)] + [index[node_id] for node_id in removed]
+    values += _edge_values(index, added_edges) + _edge_values(index, removed_edges)
+    return head + _pack_seq(epoch, seq) + _pack_positions(index, moved) + _pack_ids(values)
+
+
+def is_binary(payload):
+    return isinstance(payload, (bytes, bytearray)) and len(payload) > 0 and payload[0] & 0x80 != 0
+
+
+def peek_sender(payload):
+    """
+    Sender ("from") of a neighbors payload without decoding the whole
+    table, or None when it cannot be found cheaply.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    if is_binary(payload):
+        if len(payload) <= _PREFIX.size or payload[1] != KIND_NEIGHBORS:
+            return None
+        # encode_neighbors interns the sender first in the string table
+        table_end = _PREFIX.size + _PREFIX.unpack_from(payload, 0)[3]
+        end = payload.find(b"\0", _PREFIX.size, table_end)
+        return bytes(payload[_PREFIX.size:end if end >= 0 else table_end]).decode("utf-8", errors="replace")
+    match = _JSON_SENDER.search(payload)
+    if match is None:
+        return None
+    return json.loads(b'"' + match.group(1) + b'"')
+
+
+def _unpack_positions(payload, offset, strings):
+    """Positions body at `offset`; returns ({id: [x, y]}, offset after it)."""
+    (count,) = _COUNT.unpack_from(payload, offset)
+    end = offset + 2 + count * _POSITION.size
+    if end > len(payload):
+        raise ValueError("Malformed binary payload: truncated positions")
+    entries = _POSITION.iter_unpack(payload[offset + 2:end])
+    return {strings[i]: [x, y] for i, x, y in entries}, end
+
+
+def _unpack_ids(payload, offset):
+    if offset > len(payload) or (len(payload) - offset) % 2:
+        raise ValueError("Malformed binary payload: truncated id array")
+    return struct.unpack_from(f"<{(len(payload) - offset) // 2}H", payload, offset)
+
+
+def _unpack_graph(values, strings):
+    count = values[0]
+    nodes, degrees = values[1:1 + count], values[1 + count:1 + 2 * count]
+    ends = list(itertools.accumulate(degrees))
+    names = [strings[n] for n in values[1 + 2 * count:]]
+    if len(degrees) != count or len(names) != (ends[-1] if ends else 0):
+        raise ValueError("Malformed binary payload: truncated graph")
+    return {strings[node]: names[end - degree:end] for node, degree, end in zip(nodes, degrees, ends)}
+
+
+def _unpack_edges(values, position, strings):
+    """Edge list at `position` of a u16 array; returns ([[id, id]], position after it)."""
+    end = position + 1 + 2 * values[position]
+    if end > len(values):
+        raise ValueError("Malformed binary payload: truncated edge list")
+    ids = [strings[n] for n in values[position + 1:end]]
+    return [ids[k:k + 2] for k in range(0, len(ids), 2)], end
+
+
+def decode(payload):
+    """
+    Decodes a JSON (str or bytes) or binary payload to the same structure
+    json.loads gives for the JSON form. Raises ValueError on a malformed or
+    unsupported binary payload.
+    """
+    if not is_binary(payload):
+        return json.loads(payload)
+
+    try:
+        header, kind, num_strings, table_size = _PREFIX.unpack_from(payload, 0)
+        if header != BINARY_HEADER:
+            raise ValueError(f"Unsupported binary payload version {header & 0x7F}")
+        offset = _PREFIX.size + table_size
+        strings = bytes(payload[_PREFIX.size:offset]).decode("utf-8").split("\0") if num_strings else []
+        if len(strings) != num_strings:
+            raise ValueError("Malformed binary payload: string table size mismatch")
+
+        if kind == KIND_NEIGHBORS:
+            from_idx, count = struct.unpack_from("<HH", payload, offset)
+            if len(payload) - offset - 4 != count * _NEIGHBOR.size:
+                raise ValueError("Malformed binary payload: neighbor table size mismatch")
+            entries = _NEIGHBOR.iter_unpack(payload[offset + 4:])
+            return {"from": strings[from_idx],
+                    "data": [{"id": strings[i], "dist": dist, "var": var} for i, dist, var in entries]}
+        epoch = None
+        if kind & ~(FLAG_STALE | FLAG_EPOCH) in (KIND_SNAPSHOT, KIND_DELTA) and kind & FLAG_EPOCH:
+            (epoch,) = _SEQ.unpack_from(payload, offset)
+            offset += _SEQ.size
+            kind &= ~FLAG_EPOCH
+        if kind & ~FLAG_STALE == KIND_SNAPSHOT:
+            (seq,) = _SEQ.unpack_from(payload, offset)
+            positions, offset = _unpack_positions(payload, offset + _SEQ.size, strings)
+            message = {"seq": seq, "positions": positions,
+                       "graph": _unpack_graph(_unpack_ids(payload, offset), strings)}
+            if epoch is not None:
+                message["epoch"] = epoch
+            if kind & FLAG_STALE:
+                message["stale"] = True
+            return message
+        if kind == KIND_DELTA:
+            (seq,) = _SEQ.unpack_from(payload, offset)
+            moved, offset = _unpack_positions(payload, offset + _SEQ.size, strings)
+            values = _unpack_ids(payload, offset)
+            removed = [strings[n] for n in values[1:1 + values[0]]]
+            added_edges, position = _unpack_edges(values, 1 + values[0], strings)
+            removed_edges, position = _unpack_edges(values, position, strings)
+            if position != len(values):
+                raise ValueError("Malformed binary payload: trailing data")
+            message = {"seq": seq, "moved": moved, "removed": removed,
+                       "added_edges": added_edges, "removed_edges": removed_edges}
+            if epoch is not None:
+                message["epoch"] = epoch
+            return message
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed binary payload: {e}") from e
+    raise ValueError(f"Unknown binary payload kind {kind}")
@@ -1,86 +1,105 @@
 
-# pip install streamlit paho-mqtt networkx matplotlib
+# pip install streamlit paho-mqtt matplotlib altair
 
-import json
 import streamlit as st
-import networkx as nx
-import matplotlib.pyplot as plt
 import paho.mqtt.client as mqtt
 import threading
-import time
+from codec import decode
+from render import LARGE_GRAPH, FigureRenderer, altair_chart
+from topology import TopologyView
 
 # --- Configurações
 BROKER = "localhost"  # altere para o IP do broker se estiver em outro dispositivo
 PORT = 1883
+REFRESH_INTERVAL = 1  # segundos entre verificações de nova versão da topologia
 
-TOPIC_POS = "topology/positions"
-TOPIC_GRAPH = "topology/graph"
-
-positions = {}
-edges = {}
+TOPIC_SNAPSHOT = "topology/snapshot"
+TOPIC_DELTA = "topology/delta"
+TOPIC_RESYNC = "topology/resync"
 
 # --- Funções MQTT
 def on_connect(client, userdata, flags, rc):
     print("Connected with result code", rc)
-    client.subscribe(TOPIC_POS)
-    client.subscribe(TOPIC_GRAPH)
-
-def on_message(client, userdata, msg):
-    global positions, edges
-    if msg.topic == TOPIC_POS:
-        try:
-            positions.update(json.loads(msg.payload.decode()))
-        except:
-            pass
-    elif msg.topic == TOPIC_GRAPH:
-        try:
-            edges.update(json.loads(msg.payload.decode()))
-        except:
-            pass
-
-def mqtt_thread():
-    client = mqtt.Client()
+    # The retained snapshot arrives first, then the deltas after it
+    client.subscribe(TOPIC_SNAPSHOT, qos=1)
+    client.subscribe(TOPIC_DELTA, qos=1)
+
+def on_message(client, view, msg):
+    # A malformed message is logged and dropped: raising here would end loop_forever
+    try:
+        message = decode(msg.payload)
+        if msg.topic == TOPIC_SNAPSHOT:
+            view.apply_snapshot(message)
+        elif msg.topic == TOPIC_DELTA:
+            if not view.apply_delta(message):
+                # Missed a delta: ask the master for a fresh snapshot
+                client.publish(TOPIC_RESYNC, "{}")
+    except Exception as e:
+        print(f"Erro ao processar mensagem de {msg.topic}:", e)
+
+def mqtt_thread(view):
+    client = mqtt.Client(userdata=view)
     client.on_connect = on_connect
     client.on_message = on_message
     client.connect(BROKER, PORT, 60)
     client.loop_forever()
 
-# --- Inicializa o cliente MQTT em thread separada
-threading.Thread(target=mqtt_thread, daemon=True).start()
+# --- Estado partilhado por todas as sessões: uma ligação MQTT e uma figura
+@st.cache_resource
+def topology_view():
+    view = TopologyView()
+    threading.Thread(target=mqtt_thread, args=(view,), daemon=True).start()
+    return view
+
+@st.cache_resource
+def figure_renderer():
+    return FigureRenderer()
+
+def rendered(version, positions, edges, renderer):
+    """Drawing of this topology version, computed once per version and renderer."""
+    key = (version, renderer)
+    if st.session_state.get("rendered_key") != key:
+        if renderer == "altair":
+            st.session_state["rendered"] = altair_chart(positions, edges)
+        else:
+            st.session_state["rendered"] = figure_renderer().render(positions, edges)
+        st.session_state["rendered_key"] = key
+    return st.session_state["rendered"]
 
 # --- Interface Streamlit
 st.title("BLE Network Topology")
 st.markdown("Este painel mostra a topologia atual estimada a partir das distâncias BLE.")
 
-with st.spinner("Aguardando dados MQTT..."):
-    time.sleep(1)
-
-# --- Atualização dinâmica
-while True:
-    st.subheader("Posições dos Nós")
-    st.json(positions)
-
-    st.subheader("Ligações (grafo)")
-    st.json(edges)
-
-    if positions and edges:
-        G = nx.Graph()
-        for node, pos in positions.items():
-            G.add_node(node, pos=tuple(pos))
-
-        for node, neighbors in edges.items():
-            for neighbor in neighbors:
-                if G.has_edge(node, neighbor) or node == neighbor:
-                    continue
-                G.add_edge(node, neighbor)
-
-        pos_dict = nx.get_node_attributes(G, 'pos')
-
-        fig, ax = plt.subplots(figsize=(6, 6))
-        nx.draw(G, pos=pos_dict, with_labels=True, node_color='skyblue',
-                node_size=1000, font_weight='bold', ax=ax)
-        st.pyplot(fig)
-
-    st.info("Este painel atualiza automaticamente a cada 10 segundos.")
-    time.sleep(10)
-    st.experimental_rerun()
+view = topology_view()
+renderer_choice = st.sidebar.radio("Renderização", ["automática", "matplotlib", "altair"],
+                                   help=f"Automática usa altair (no navegador) acima de {LARGE_GRAPH} nós.")
+show_raw = st.sidebar.checkbox("Mostrar dados brutos")
+
+# --- Atualização dinâmica: só este bloco corre de novo, e só desenha quando a versão muda
+@st.fragment(run_every=REFRESH_INTERVAL)
+def topology_panel():
+    version, positions, edges, stale = view.state()
+    if not positions:
+        st.info("Aguardando dados MQTT...")
+        return
+    if stale:
+        st.warning("Topologia desatualizada, à espera de novo snapshot.")
+
+    renderer = renderer_choice
+    if renderer == "automática":
+        renderer = "altair" if len(positions) > LARGE_GRAPH else "matplotlib"
+
+    st.caption(f"Versão {version} · {len(positions)} nós · {len(edges)} ligações")
+    drawing = rendered(version, positions, edges, renderer)
+    if renderer == "altair":
+        st.altair_chart(drawing, use_container_width=True)
+    else:
+        st.image(drawing)
+
+    if show_raw:
+        st.subheader("Posições dos Nós")
+        st.json(positions)
+        st.subheader("Ligações (grafo)")
+        st.json(sorted(edges))
+
+topology_panel()
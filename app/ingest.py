@@ -0,0 +1,103 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+# Outcomes of IngestQueue.put
+QUEUED = "queued"
+COALESCED = "coalesced"  # replaced a message with the same key still waiting
+DELAYED = "delayed"      # queued after waiting for space
+DROPPED = "dropped"      # the queue stayed full for block_timeout
+
+
+class IngestQueue:
+    """
+    Bounded FIFO of received messages between the network loop and the
+    master's ingest workers.
+
+    Messages are coalesced by key: one whose key is already waiting replaces
+    the waiting message in place, so a station that reports faster than it
+    is processed only has its latest table handled. get() never hands out a
+    key that another worker is still processing, which keeps one station's
+    messages in arrival order. When the queue is full, put() blocks the
+    caller for at most `block_timeout` seconds (backpressure on the network
+    loop) and then drops the message.
+    """
+
+    def __init__(self, maxsize=1000, block_timeout=0.05):
+        self.maxsize = maxsize
+        self.block_timeout = block_timeout
+        self.pending = OrderedDict()  # key -> item, oldest first
+        self.active = set()           # keys handed out and not yet done
+        self.unfinished = 0
+        self.closed = False
+        self.unkeyed = itertools.count()
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.all_done = threading.Condition(self.lock)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
+
+    def put(self, key, item):
+        """Queues `item` under `key` (None: never coalesced); returns one of QUEUED, COALESCED, DELAYED, DROPPED."""
+        with self.lock:
+            if key is None:
+                key = (None, next(self.unkeyed))
+            elif key in self.pending:
+                self.pending[key] = item
+                return COALESCED
+            outcome = QUEUED
+            if len(self.pending) >= self.maxsize:
+                outcome = DELAYED
+                deadline = time.monotonic() + self.block_timeout
+                while len(self.pending) >= self.maxsize and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return DROPPED
+                    self.not_full.wait(remaining)
+                if key in self.pending:
+                    self.pending[key] = item
+                    return COALESCED
+            self.pending[key] = item
+            self.unfinished += 1
+            self.not_empty.notify()
+            return outcome
+
+    def get(self):
+        """Oldest (key, item) whose key is not being processed; blocks, returns None once closed."""
+        with self.lock:
+            while not self.closed:
+                # At most len(self.active) entries are skipped, keys are unique
+                for key in self.pending:
+                    if key not in self.active:
+                        item = self.pending.pop(key)
+                        self.active.add(key)
+                        self.not_full.notify()
+                        return key, item
+                self.not_empty.wait()
+            return None
+
+    def task_done(self, key):
+        """Marks the item got for `key` as processed."""
+        with self.lock:
+            self.active.discard(key)
+            self.unfinished -= 1
+            if key in self.pending:
+                self.not_empty.notify()
+            if self.unfinished == 0:
+                self.all_done.notify_all()
+
+    def join(self, timeout=None):
+        """Blocks until every queued item has been processed; False on timeout."""
+        with self.lock:
+            return self.all_done.wait_for(lambda: self.unfinished == 0, timeout)
+
+    def close(self):
+        """Wakes every worker and makes get() return None; waiting items are discarded."""
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
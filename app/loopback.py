@@ -0,0 +1,110 @@
+import itertools
+import queue
+import threading
+from types import SimpleNamespace
+
+import paho.mqtt.client as mqtt
+
+
+class LoopbackBroker:
+    """
+    In-process stand-in for the MQTT broker, for simulations and load tests
+    without a network: routes publishes to the matching subscriptions
+    (MQTT wildcards included) and keeps retained messages.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = []  # (topic filter, client)
+        self.retained = {}
+        self.published = 0
+
+    def client(self, userdata=None):
+        return LoopbackClient(self, userdata)
+
+    def subscribe(self, client, topic_filter):
+        with self.lock:
+            if (topic_filter, client) not in self.subscriptions:
+                self.subscriptions.append((topic_filter, client))
+            retained = [(topic, payload) for topic, payload in self.retained.items()
+                        if mqtt.topic_matches_sub(topic_filter, topic)]
+        for topic, payload in retained:
+            client.deliver(topic, payload)
+
+    def publish(self, topic, payload, retain=False):
+        with self.lock:
+            self.published += 1
+            if retain:
+                if payload:
+                    self.retained[topic] = payload
+                else:
+                    self.retained.pop(topic, None)
+            targets = {client for topic_filter, client in self.subscriptions
+                       if mqtt.topic_matches_sub(topic_filter, topic)}
+        for client in targets:
+            client.deliver(topic, payload)
+
+
+class LoopbackClient:
+    """
+    The subset of paho's Client used by the nodes, connected to a
+    LoopbackBroker. Like paho's network loop, loop_start runs on_message for
+    every delivered message on one background thread, in order.
+    """
+
+    def __init__(self, broker, userdata=None):
+        self.broker = broker
+        self.userdata = userdata
+        self.on_connect = None
+        self.on_message = None
+        self.inbox = queue.Queue()
+        self.thread = None
+        self.mids = itertools.count(1)
+
+    def connect(self, host=None, port=None, keepalive=60):
+        if self.on_connect:
+            self.on_connect(self, self.userdata, {}, 0)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def subscribe(self, topic, qos=0):
+        self.broker.subscribe(self, topic)
+        return mqtt.MQTT_ERR_SUCCESS, next(self.mids)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.broker.publish(topic, payload or b"", retain)
+        return SimpleNamespace(rc=mqtt.MQTT_ERR_SUCCESS, mid=next(self.mids))
+
+    def deliver(self, topic, payload):
+        self.inbox.put(SimpleNamespace(topic=topic, payload=payload, qos=0, retain=False))
+
+    def loop_start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def loop_stop(self):
+        if self.thread:
+            self.inbox.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def disconnect(self):
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def drain(self):
+        """Blocks until every message delivered so far has been handled."""
+        self.inbox.join()
+
+    def _run(self):
+        while True:
+            msg = self.inbox.get()
+            try:
+                if msg is None:
+                    return
+                if self.on_message:
+                    self.on_message(self, self.userdata, msg)
+            except Exception as e:
+                print(f"[LOOPBACK] Erro em on_message ({msg.topic}): {e}")
+            finally:
+                self.inbox.task_done()
@@ -2,35 +2,322 @@ import json
 import time
 import threading
 import paho.mqtt.client as mqtt
-from mqtt_config import BROKER_ADDRESS, BROKER_PORT, TOPICS
-from things import solve_point_positions_and_graph
+from mqtt_config import (BROKER_ADDRESS, BROKER_PORT, TOPICS, SOLVER_ENGINE, SOLVER_OPTIONS, GRAPH_NEIGHBORS,
+                         CHANGE_TOLERANCE, RECOMPUTE_DEBOUNCE, RECOMPUTE_MAX_DELAY, PAYLOAD_FORMAT,
+                         RESYNC_MIN_INTERVAL, METRICS_FILE, METRICS_INTERVAL, INGEST_WORKERS, INGEST_QUEUE_SIZE,
+                         INGEST_BLOCK_TIMEOUT, MEASUREMENT_TTL, MEASUREMENT_HALFLIFE, MAX_STATIONS,
+                         ROLLOUT_CHECK_INTERVAL, ROLLOUT_WAVE_SIZE, ROLLOUT_MAX_IN_FLIGHT, ROLLOUT_WAVE_INTERVAL,
+                         UPDATE_TIMEOUT, UPDATE_MAX_ATTEMPTS, CHECKPOINT_FILE, CHECKPOINT_INTERVAL, LINE_ORDER)
+from checkpoint import read_checkpoint, write_checkpoint
+from codec import decode, encode_delta, encode_snapshot, peek_sender
+from ingest import COALESCED, DELAYED, DROPPED, IngestQueue
+from measurements import MeasurementStore, NeighborTables, table_columns
+from metrics import Metrics
+from rollout import Rollout, parse_version
+from things import order_lines, shutdown_component_pool, solve_point_positions_and_graph
+from topology import TopologyPublisher
+
+def table_changed(old, new, tolerance=CHANGE_TOLERANCE):
+    """
+    True when neighbor table `new` differs from `old`: a neighbor appeared
+    or disappeared, or a distance moved by more than `tolerance`.
+    """
+    if old is None:
+        return True
+    old_dists = {entry["id"]: entry["dist"] for entry in old}
+    new_dists = {entry["id"]: entry["dist"] for entry in new}
+    if old_dists.keys() != new_dists.keys():
+        return True
+    return any(abs(new_dists[n] - old_dists[n]) > tolerance for n in new_dists)
 
 class MasterNode:
-    def __init__(self):
-        self.measurements_raw = {}  # id -> list of {id, dist, var}
-        self.versions = {}          # id -> version
-        self.detected_masters = set()
+    """
+    Collects the stations' neighbor tables and publishes the topology.
+
+    The topology is recomputed when measurements change, not on a timer:
+    `handle_neighbors` marks a station dirty when its table moved beyond
+    `tolerance` from the one used in the last solve, and a scheduler thread
+    solves `debounce` seconds after the last change (or `max_delay` seconds
+    after the first one when updates never settle). Without changes the
+    scheduler just sleeps.
+
+    Once connected, on_message only queues what the network loop receives:
+    `ingest_workers` threads decode and apply it from a bounded IngestQueue
+    that keeps only the latest waiting table of each station. The solver
+    works on a snapshot of the tables taken in one short critical section,
+    so ingest never waits for a solve.
+
+    Tables, versions and master claims expire `ttl` seconds after a
+    station's last report, and at most `max_stations` stations are tracked,
+    so departed stations leave the solve and stop getting update commands.
+    With `halflife`, readings are down-weighted by their age at solve time.
+
+    Out-of-date stations are updated by a staged Rollout (see rollout.py)
+    that verify_versions advances every ROLLOUT_CHECK_INTERVAL seconds.
+
+    The tables, versions, positions and published topology are
+    checkpointed to disk every CHECKPOINT_INTERVAL seconds. On start the
+    checkpoint is restored: the last topology is republished marked stale
+    and the restored positions warm-start the first solve.
+
+    With `line_order`, every solve also orders the stations along their
+    lines (things.order_lines) and publishes their left/right neighbors,
+    retained, whenever the order changes.
+    """
 
-        self.client = mqtt.Client()
+    def __init__(self, tolerance=CHANGE_TOLERANCE, debounce=RECOMPUTE_DEBOUNCE, max_delay=RECOMPUTE_MAX_DELAY,
+                 payload_format=PAYLOAD_FORMAT, client=None, ingest_workers=INGEST_WORKERS,
+                 ingest_queue_size=INGEST_QUEUE_SIZE, ttl=MEASUREMENT_TTL, halflife=MEASUREMENT_HALFLIFE,
+                 max_stations=MAX_STATIONS, line_order=LINE_ORDER):
+        self.measurements_raw = NeighborTables(ttl, max_stations)    # id -> list of {id, dist, var}, also columnar
+        self.versions = MeasurementStore(ttl, max_stations)          # id -> version
+        self.detected_masters = MeasurementStore(ttl, max_stations)  # id -> True
+        self.halflife = halflife
+        self.rollout = Rollout(ROLLOUT_WAVE_SIZE, ROLLOUT_MAX_IN_FLIGHT, ROLLOUT_WAVE_INTERVAL,
+                               UPDATE_TIMEOUT, UPDATE_MAX_ATTEMPTS)
+        self.positions = {}         # id -> [x, y] from the last solve, warm start for the next one
+        self.line_order_enabled = line_order
+        self.line_order = None      # last published things.order_lines result
+
+        self.tolerance = tolerance
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.payload_format = payload_format
+        self.solved_tables = {}     # id -> neighbor table used in the last solve
+        self.dirty = set()          # stations changed since the last solve
+        self.first_change = None
+        self.last_change = None
+        self.solves = 0
+        self.running = False
+        self.scheduler = None
+        self.topology = TopologyPublisher()
+        self.publish_lock = threading.Lock()  # keeps snapshots and deltas in sequence order
+        self.last_resync = None
+        self.metrics = Metrics()
+        self.stopping = threading.Event()  # ends the metrics and checkpoint writers
+        self.ingest_workers = ingest_workers
+        self.ingest = IngestQueue(ingest_queue_size, INGEST_BLOCK_TIMEOUT)
+        self.workers = []
+
+        self.client = client or mqtt.Client()  # e.g. a loopback.LoopbackClient in simulations
         self.client.on_message = self.on_message
         self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
 
     def start(self):
+        self.restore_checkpoint()
+        self.connect()
+        with self.publish_lock:
+            if self.topology.stale:
+                self.publish_topology("snapshot", self.topology.snapshot())
+        threading.Thread(target=self._run_metrics_writer, daemon=True).start()
+        threading.Thread(target=self._run_checkpoint_writer, daemon=True).start()
+
+        last_masters_check = time.monotonic()
+        try:
+            while True:
+                time.sleep(ROLLOUT_CHECK_INTERVAL)
+                if time.monotonic() - last_masters_check >= 60:
+                    last_masters_check = time.monotonic()
+                    self.verify_masters()
+                self.verify_versions()
+        finally:
+            self.save_checkpoint()
+
+    def connect(self):
+        """Subscribes to the station topics and starts the network loop and the scheduler."""
         self.client.connect(BROKER_ADDRESS, BROKER_PORT, 60)
         self.client.subscribe("station/+/neighbors")
         self.client.subscribe("station/+/version")
         self.client.subscribe("station/+/is_master")
+        self.client.subscribe(TOPICS["TOPOLOGY_RESYNC"])
+        self.start_workers()
         self.client.loop_start()
+        self.start_scheduler()
+
+    def stop(self):
+        self.client.loop_stop()
+        self.stop_workers()
+        self.stop_scheduler()
+        shutdown_component_pool()
+        self.stopping.set()
 
+    def start_workers(self):
+        for i in range(self.ingest_workers):
+            worker = threading.Thread(target=self._run_worker, name=f"ingest-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop_workers(self):
+        self.ingest.close()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def drain(self, timeout=None):
+        """Blocks until every message queued so far has been handled; False on timeout."""
+        return self.ingest.join(timeout)
+
+    def _run_worker(self):
+        while True:
+            got = self.ingest.get()
+            if got is None:
+                return
+            key, (topic, payload, received) = got
+            try:
+                self.metrics.observe("ingest_wait_seconds", time.perf_counter() - received)
+                self.process_message(topic, payload)
+            finally:
+                self.ingest.task_done(key)
+
+    def start_scheduler(self):
+        self.running = True
+        self.scheduler = threading.Thread(target=self._run_scheduler, daemon=True)
+        self.scheduler.start()
+
+    def stop_scheduler(self):
+        with self.changed:
+            self.running = False
+            self.changed.notify()
+        if self.scheduler:
+            self.scheduler.join()
+            self.scheduler = None
+
+    def _time_until_due(self):
+        """Seconds until the pending changes should be solved, None if there are none."""
+        if not self.dirty:
+            return None
+        due = min(self.last_change + self.debounce, self.first_change + self.max_delay)
+        return due - time.monotonic()
+
+    def _time_until_expiry(self):
+        expiries = [store.next_expiry() for store in (self.measurements_raw, self.versions, self.detected_masters)]
+        expiries = [expiry for expiry in expiries if expiry is not None]
+        return min(expiries) - time.monotonic() if expiries else None
+
+    def _run_scheduler(self):
         while True:
-            time.sleep(60)
-            self.verify_masters()
-            self.verify_versions()
-            self.reconstruct_topology()
+            with self.changed:
+                while self.running:
+                    self._expire()
+                    remaining = self._time_until_due()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    expiry = self._time_until_expiry()
+                    if expiry is not None:
+                        remaining = expiry if remaining is None else min(remaining, expiry)
+                    self.changed.wait(max(remaining, 0) if remaining is not None else None)
+                if not self.running:
+                    return
+            try:
+                self.reconstruct_topology()
+            except Exception as e:
+                print(f"[MASTER] Erro ao reconstruir topologia: {e}")
+
+    def _run_metrics_writer(self, path=METRICS_FILE, interval=METRICS_INTERVAL):
+        while not self.stopping.wait(interval):
+            try:
+                self.metrics.write(path)
+            except OSError as e:
+                print(f"[MASTER] Erro ao gravar métricas: {e}")
+
+    def _run_checkpoint_writer(self, path=CHECKPOINT_FILE, interval=CHECKPOINT_INTERVAL):
+        while not self.stopping.wait(interval):
+            self.save_checkpoint(path)
+
+    def checkpoint_state(self):
+        """JSON-serializable copy of the state a restarted master needs, receive times as wall clock."""
+        now, wall = time.monotonic(), time.time()
+
+        def stamped(store):
+            return [[station, value, wall - (now - received)] for station, (value, received) in store.snapshot().items()]
+
+        with self.lock:
+            state = {"saved_at": wall, "measurements": stamped(self.measurements_raw),
+                     "versions": stamped(self.versions), "positions": dict(self.positions)}
+        with self.publish_lock:
+            state["topology"] = {"seq": self.topology.seq, "positions": dict(self.topology.positions),
+                                 "edges": sorted(self.topology.edges)}
+        return state
+
+    def save_checkpoint(self, path=CHECKPOINT_FILE):
+        try:
+            with self.metrics.time("checkpoint_seconds"):
+                size = write_checkpoint(path, self.checkpoint_state())
+        except OSError as e:
+            print(f"[MASTER] Erro ao gravar checkpoint: {e}")
+            return False
+        self.metrics.set("checkpoint_bytes", size)
+        return True
+
+    def restore_checkpoint(self, path=CHECKPOINT_FILE):
+        """Loads a checkpoint written by save_checkpoint; returns False when there is none usable."""
+        try:
+            state = read_checkpoint(path)
+        except (OSError, ValueError) as e:
+            print(f"[MASTER] Checkpoint ignorado: {e}")
+            return False
+        if state is None:
+            return False
+
+        now, wall = time.monotonic(), time.time()
+        with self.lock:
+            # The stores expect receive order, least recent first
+            for station, table, received in sorted(state["measurements"], key=lambda entry: entry[2]):
+                try:
+                    self.measurements_raw.put(station, table, now=now - max(wall - received, 0))
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"[MASTER] Tabela de {station} ignorada no checkpoint: {e}")
+            for station, version, received in sorted(state["versions"], key=lambda entry: entry[2]):
+                try:
+                    self.rollout.report(station, version)
+                except (TypeError, ValueError) as e:
+                    print(f"[MASTER] Versão de {station} ignorada no checkpoint: {e}")
+                    continue
+                self.versions.put(station, version, now=now - max(wall - received, 0))
+            self.positions = {node_id: list(pos) for node_id, pos in state["positions"].items()}
+            # Stations that went silent while the master was down
+            self._expire(now)
+        topology = state["topology"]
+        if topology["seq"]:
+            with self.publish_lock:
+                self.topology.restore(topology["positions"], topology["edges"])
+        print(f"[MASTER] Estado restaurado de {path}: {len(self.measurements_raw)} estações, "
+              f"topologia {topology['seq']} de há {wall - state['saved_at']:.0f}s.")
+        return True
 
     def on_message(self, client, userdata, msg):
+        """Network loop callback: queues the message for the ingest workers, or handles it inline without them."""
         topic = msg.topic
-        payload = msg.payload.decode()
+        payload = msg.payload  # JSON or binary, see codec.decode
+        kind = topic.rsplit("/", 1)[-1]
+        self.metrics.inc("messages_total", {"topic": kind})
+        if not self.workers:
+            self.process_message(topic, payload)
+            return
+
+        key = None
+        if kind == "neighbors":
+            try:
+                sender = peek_sender(payload)
+            except ValueError:
+                sender = None  # the worker reports the bad payload
+            key = (kind, sender) if sender else None
+        elif topic == TOPICS["TOPOLOGY_RESYNC"]:
+            key = (kind,)
+        outcome = self.ingest.put(key, (topic, payload, time.perf_counter()))
+        if outcome == COALESCED:
+            self.metrics.inc("ingest_coalesced_total", {"topic": kind})
+        elif outcome in (DELAYED, DROPPED):
+            self.metrics.inc("ingest_backpressure_total")
+            if outcome == DROPPED:
+                self.metrics.inc("ingest_dropped_total", {"topic": kind})
+                print(f"[MASTER] Fila de ingestão cheia, mensagem descartada ({topic}).")
+        self.metrics.set("ingest_queue_depth", len(self.ingest))
+
+    def process_message(self, topic, payload):
+        kind = topic.rsplit("/", 1)[-1]
+        start = time.perf_counter()
         try:
             if topic.endswith("/neighbors"):
                 self.handle_neighbors(payload)
@@ -38,71 +325,212 @@ class MasterNode:
                 self.handle_version(payload)
             elif topic.endswith("/is_master"):
                 self.handle_is_master(payload)
+            elif topic == TOPICS["TOPOLOGY_RESYNC"]:
+                self.handle_resync()
+        except ValueError as e:
+            # Also covers json.JSONDecodeError
+            self.metrics.inc("decode_failures_total", {"topic": kind})
+            print(f"[MASTER] Payload inválido em {topic}: {e}")
         except Exception as e:
+            self.metrics.inc("message_errors_total", {"topic": kind})
             print(f"[MASTER] Erro ao processar mensagem: {e}")
+        finally:
+            self.metrics.observe("ingest_seconds", time.perf_counter() - start)
 
     def handle_neighbors(self, payload):
-        data = json.loads(payload)
+        data = decode(payload)
         from_id = data.get("from")
         neighbors = data.get("data")
 
         if not from_id or not neighbors:
             print(f"[MASTER] Payload inválido: {payload}")
             return
+        # Rejected before anything is stored, see process_message
+        table_columns(neighbors)
 
-        with self.lock:
-            self.measurements_raw[from_id] = neighbors
+        with self.changed:
+            evicted = self.measurements_raw.put(from_id, neighbors)
+            for station in evicted:
+                self._mark_dirty(station)
+            if table_changed(self.solved_tables.get(from_id), neighbors, self.tolerance):
+                self._mark_dirty(from_id)
+        if evicted:
+            self.metrics.inc("stations_evicted_total", value=len(evicted))
+            print(f"[MASTER] Limite de {self.measurements_raw.max_stations} estações, removidas: {evicted}")
         print(f"[MASTER] Vizinhos de {from_id}: {neighbors}")
 
+    def _mark_dirty(self, station):
+        """Schedules a solve for a changed station; call with `changed` held."""
+        now = time.monotonic()
+        if not self.dirty:
+            self.first_change = now
+        self.last_change = now
+        self.dirty.add(station)
+        self.changed.notify()
+
+    def expire_stations(self, now=None):
+        """Forgets the stations silent for longer than the TTL; returns those whose table was dropped."""
+        with self.changed:
+            return self._expire(now)
+
+    def _expire(self, now=None):
+        expired = self.measurements_raw.expire(now)
+        for station in expired:
+            self._mark_dirty(station)
+        for station in self.versions.expire(now):
+            self.rollout.forget(station)
+        self.detected_masters.expire(now)
+        if expired:
+            self.metrics.inc("stations_expired_total", value=len(expired))
+            print(f"[MASTER] Estações sem notícias há mais de {self.measurements_raw.ttl:.0f}s: {expired}")
+        self.metrics.set("tracked_stations", len(self.measurements_raw))
+        return expired
+
     def handle_version(self, payload):
-        data = json.loads(payload)
+        data = decode(payload)
         node_id = data["id"]
         version = data["version"]
+        parse_version(version)  # ValueError for a malformed version
         with self.lock:
-            self.versions[node_id] = version
+            for station in self.versions.put(node_id, version):
+                self.rollout.forget(station)
+            acked = self.rollout.report(node_id, version)
+        if acked:
+            self.metrics.inc("updates_acked_total")
+            print(f"[MASTER] {node_id} atualizado para {version}")
         print(f"[MASTER] Versão de {node_id}: {version}")
 
     def handle_is_master(self, payload):
-        data = json.loads(payload)
+        data = decode(payload)
         if data["is_master"]:
-            self.detected_masters.add(data["id"])
+            with self.lock:
+                self.detected_masters.put(data["id"], True)
+
+    def handle_resync(self):
+        """Republishes the retained snapshot for a subscriber that saw a gap, at most every RESYNC_MIN_INTERVAL."""
+        with self.publish_lock:
+            now = time.monotonic()
+            if self.topology.seq == 0 or (self.last_resync is not None
+                                          and now - self.last_resync < RESYNC_MIN_INTERVAL):
+                return
+            self.last_resync = now
+            self.publish_topology("snapshot", self.topology.snapshot())
+
+    def publish_topology(self, kind, message):
+        if kind == "snapshot":
+            payload = encode_snapshot(message["seq"], message["positions"], message["graph"], self.payload_format,
+                                      stale=message.get("stale", False), epoch=message.get("epoch"))
+            self.client.publish(TOPICS["TOPOLOGY_SNAPSHOT"], payload, qos=1, retain=True)
+        else:
+            payload = encode_delta(message["seq"], message["moved"], message["removed"],
+                                   message["added_edges"], message["removed_edges"], self.payload_format,
+                                   epoch=message.get("epoch"))
+            self.client.publish(TOPICS["TOPOLOGY_DELTA"], payload, qos=1)
+        self.metrics.inc("publishes_total", {"kind": kind})
+        self.metrics.inc("published_bytes_total", {"kind": kind}, len(payload))
+        self.metrics.set("last_publish_timestamp", time.time())
+        print(f"[MASTER] Topologia publicada ({kind} {message['seq']}, {len(payload)} bytes).")
+
+    def update_line_order(self, input_structure):
+        """Publishes the order of the stations along their lines when it changed; returns True when it did."""
+        with self.metrics.time("line_order_seconds"):
+            line_order = order_lines(input_structure, self.line_order)
+        if self.line_order is not None and line_order["lines"] == self.line_order["lines"]:
+            return False
+        self.line_order = line_order
+        payload = json.dumps(line_order, separators=(",", ":"))
+        self.client.publish(TOPICS["LINE_ORDER"], payload, qos=1, retain=True)
+        self.metrics.inc("publishes_total", {"kind": "line_order"})
+        self.metrics.inc("published_bytes_total", {"kind": "line_order"}, len(payload))
+        print(f"[MASTER] Ordem das linhas publicada ({len(line_order['lines'])} linhas).")
+        return True
 
     def verify_masters(self):
-        print(f"[MASTER] Mestres detectados: {self.detected_masters}")
-        if len(self.detected_masters) > 1:
+        with self.lock:
+            self._expire()
+            masters = set(self.detected_masters)
+        print(f"[MASTER] Mestres detectados: {masters}")
+        if len(masters) > 1:
             print("[MASTER] Mais de um mestre detectado! Conflito.")
 
     def verify_versions(self):
-        latest_version = max(self.versions.values(), default=None)
-        for node_id, version in self.versions.items():
-            if version != latest_version:
-                update_payload = json.dumps({
-                    "required_version": latest_version,
-                    "your_version": version
-                })
-                topic = TOPICS["UPDATE_CMD"].format(id=node_id)
-                self.client.publish(topic, update_payload)
-                print(f"[MASTER] Pedido de atualização enviado para {node_id}")
+        """Sends the update commands of the rollout's current step, if any."""
+        with self.lock:
+            self._expire()
+            timed_out = self.rollout.timed_out
+            commands = self.rollout.due(dict(self.versions.items()))
+            latest_version = self.rollout.target
+            timed_out = self.rollout.timed_out - timed_out
+            in_flight = len(self.rollout.in_flight)
+            failed = len(self.rollout.failed)
+        if timed_out:
+            self.metrics.inc("update_timeouts_total", value=timed_out)
+        self.metrics.set("updates_in_flight", in_flight)
+        self.metrics.set("updates_failed", failed)
+        for node_id, version in commands:
+            update_payload = json.dumps({
+                "required_version": latest_version,
+                "your_version": version
+            })
+            topic = TOPICS["UPDATE_CMD"].format(id=node_id)
+            self.client.publish(topic, update_payload)
+            self.metrics.inc("update_commands_total")
+            print(f"[MASTER] Pedido de atualização enviado para {node_id}")
+
+    def record_solve(self, report):
+        self.metrics.inc("solves_total", {"engine": report.engine})
+        self.metrics.observe("parse_seconds", report.parse_time)
+        self.metrics.observe("solve_seconds", report.wall_time)
+        self.metrics.observe("graph_seconds", report.graph_time)
+        self.metrics.set("solver_iterations", report.iterations)
+        self.metrics.set("solver_stress", report.stress)
+        self.metrics.set("stations", report.num_points)
 
     def reconstruct_topology(self):
+        """Solves and publishes the topology; returns False when nothing changed since the last solve."""
         with self.lock:
-            input_structure = []
-            for src_id, neighbor_list in self.measurements_raw.items():
-                edges = []
-                for entry in neighbor_list:
-                    edges.append((entry["id"], entry["dist"], entry["var"]))
-                input_structure.append((src_id, edges))
-
-        if not input_structure:
-            print("[MASTER] Nenhuma medição para reconstruir topologia.")
-            return
+            if not self.dirty:
+                print("[MASTER] Nenhuma alteração desde a última topologia.")
+                return False
+            self.dirty.clear()
+            # Tables are replaced, never modified, so a shallow copy is a consistent snapshot
+            entries = self.measurements_raw.snapshot()
+            self.solved_tables = {src_id: table for src_id, (table, _) in entries.items()}
+            readings = self.measurements_raw.readings()
+
+        start = time.perf_counter()
+        parsed = readings.parse(time.monotonic(), self.halflife)
+        parse_time = time.perf_counter() - start
 
-        print("[MASTER] Recalculando topologia...")
-        positions, graph = solve_point_positions_and_graph(input_structure, visualize=False)
+        if not entries:
+            if not self.positions:
+                print("[MASTER] Nenhuma medição para reconstruir topologia.")
+                return False
+            # Every station expired: publish the empty topology
+            positions, graph = {}, {}
+        else:
+            print("[MASTER] Recalculando topologia...")
+            with self.metrics.time("reconstruct_seconds"):
+                positions, graph, report = solve_point_positions_and_graph(
+                    parsed, visualize=False, initial_positions=self.positions,
+                    engine=SOLVER_ENGINE, return_report=True, graph_neighbors=GRAPH_NEIGHBORS,
+                    engine_options=SOLVER_OPTIONS)
+            report.parse_time = parse_time
+            print(f"[MASTER] Solver: {report}")
+            self.record_solve(report)
+        if self.line_order_enabled:
+            self.update_line_order(parsed)
+        # Only stations still present in the measurements are kept
+        self.positions = {node_id: [float(x), float(y)] for node_id, (x, y) in positions.items()}
+        self.solves += 1
 
-        self.client.publish(TOPICS["TOPOLOGY_POS"], json.dumps(positions))
-        self.client.publish(TOPICS["TOPOLOGY_GRAPH"], json.dumps(graph))
-        print(f"[MASTER] Topologia publicada com {len(positions)} posições.")
+        with self.publish_lock:
+            update = self.topology.update(self.positions, graph)
+            if update is None:
+                print("[MASTER] Topologia sem alterações visíveis, nada publicado.")
+            else:
+                self.publish_topology(*update)
+        return True
 
 if __name__ == "__main__":
     master = MasterNode()
@@ -0,0 +1,277 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import solvers
+
+
+def aged_variance(variance, age, halflife=None):
+    """
+    Variance of a reading received `age` seconds ago: doubles every
+    `halflife` seconds, so the solver (which weights edges by 1/variance)
+    trusts old readings less. No ageing when `halflife` is falsy.
+    """
+    if not halflife or age <= 0:
+        return variance
+    return variance * 2.0 ** (age / halflife)
+
+
+class MeasurementStore:
+    """
+    Latest value reported by each station and when it was received.
+
+    Entries expire `ttl` seconds after their last update (see expire), and
+    at most `max_stations` are tracked: a new station beyond the cap evicts
+    the one heard from least recently. Entries are kept in receive order, so
+    both cost O(removed). Reads behave like a dict of station -> value.
+    Not thread-safe, the owner guards it with its own lock.
+    """
+
+    def __init__(self, ttl=None, max_stations=None, clock=time.monotonic):
+        self.ttl = ttl or None
+        self.max_stations = max_stations or None
+        self.clock = clock
+        self.entries = OrderedDict()  # station -> (value, received), least recently received first
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, station):
+        return station in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, station):
+        return self.entries[station][0]
+
+    def get(self, station, default=None):
+        entry = self.entries.get(station)
+        return default if entry is None else entry[0]
+
+    def items(self):
+        return [(station, value) for station, (value, _) in self.entries.items()]
+
+    def values(self):
+        return [value for value, _ in self.entries.values()]
+
+    def received(self, station):
+        return self.entries[station][1]
+
+    def put(self, station, value, now=None):
+        """Stores `value` for `station`; returns the stations evicted to stay within max_stations."""
+        now = self.clock() if now is None else now
+        evicted = []
+        if station in self.entries:
+            self.entries.move_to_end(station)
+        elif self.max_stations is not None:
+            while len(self.entries) >= self.max_stations:
+                evicted.append(self.entries.popitem(last=False)[0])
+        self.entries[station] = (value, now)
+        return evicted
+
+    def pop(self, station, default=None):
+        entry = self.entries.pop(station, None)
+        return default if entry is None else entry[0]
+
+    def expire(self, now=None):
+        """Removes the entries not updated for more than ttl seconds; returns their stations."""
+        if self.ttl is None:
+            return []
+        now = self.clock() if now is None else now
+        expired = []
+        while self.entries:
+            station, (_, received) = next(iter(self.entries.items()))
+            if now - received <= self.ttl:
+                break
+            del self.entries[station]
+            expired.append(station)
+        return expired
+
+    def next_expiry(self):
+        """Clock time at which the oldest entry expires, None when nothing can expire."""
+        if self.ttl is None or not self.entries:
+            return None
+        _, received = next(iter(self.entries.values()))
+        return received + self.ttl
+
+    def snapshot(self):
+        """Shallow copy {station: (value, received)} for work outside the owner's lock."""
+        return dict(self.entries)
+
+
+def table_columns(table):
+    """
+    Target ids, distances and variances of a neighbor table
+    ([{id, dist, var}, ...]); raises ValueError when an entry is malformed.
+    """
+    try:
+        targets = [entry["id"] for entry in table]
+        dists = np.array([entry["dist"] for entry in table], dtype=float)
+        variances = np.array([entry["var"] for entry in table], dtype=float)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Malformed neighbor table entry: {e!r}") from None
+    if not all(isinstance(target, str) and target for target in targets):
+        raise ValueError("Malformed neighbor table entry: station ids must be non-empty strings")
+    return targets, dists, variances
+
+
+class Readings:
+    """
+    Columnar copy of the neighbor tables, one row per reading: interned
+    source and target indices into `ids`, distance, variance and the
+    time its table was received. `sources` are the stations with a table.
+    """
+
+    def __init__(self, ids, sources, targets, dists, variances, received, tables):
+        self.ids = ids
+        self.sources = sources
+        self.targets = targets
+        self.dists = dists
+        self.variances = variances
+        self.received = received
+        self.tables = tables
+
+    def __len__(self):
+        return len(self.dists)
+
+    def parse(self, now=None, halflife=None):
+        """
+        Same result as things.parse_input_data on the tables, with every
+        variance aged by aged_variance, from a few array operations.
+        """
+        present = np.union1d(np.union1d(self.sources, self.targets), self.tables)
+        point_ids_list = sorted(self.ids[i] for i in present)
+        if not point_ids_list:
+            return [], {}, {}, solvers.EdgeList([], [], [], [])
+        id_to_idx = {pid: i for i, pid in enumerate(point_ids_list)}
+        idx_to_id = dict(enumerate(point_ids_list))
+
+        local = np.empty(len(self.ids), dtype=np.int64)
+        local[present] = [id_to_idx[self.ids[i]] for i in present]
+        variances = self.variances
+        if halflife and now is not None:
+            variances = variances * 2.0 ** (np.maximum(now - self.received, 0) / halflife)
+        measurements = solvers.aggregate_readings(local[self.sources], local[self.targets], self.dists,
+                                                  variances, len(point_ids_list))
+        return point_ids_list, id_to_idx, idx_to_id, measurements
+
+
+class NeighborTables(MeasurementStore):
+    """
+    MeasurementStore of neighbor tables ([{id, dist, var}, ...]) that also
+    keeps every reading in preallocated columnar arrays with an interned
+    station id table, so a solve starts from readings() and Readings.parse
+    instead of rebuilding and regrouping Python tuples.
+
+    A station's readings are appended as one block when its table arrives
+    and its previous block is marked dead; the arrays double when full and
+    are compacted (dropping dead rows and unused ids) once half of them
+    are dead. The owner's lock guards both views.
+    """
+
+    def __init__(self, ttl=None, max_stations=None, clock=time.monotonic, capacity=1024):
+        super().__init__(ttl, max_stations, clock)
+        self.ids = []       # interned station ids
+        self.index = {}     # station id -> interned index
+        self.blocks = {}    # station -> (first row, end row) of its readings
+        self.size = 0       # rows used, live or dead
+        self.dead = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.sources = np.empty(capacity, dtype=np.int64)
+        self.targets = np.empty(capacity, dtype=np.int64)
+        self.dists = np.empty(capacity)
+        self.variances = np.empty(capacity)
+        self.stamps = np.empty(capacity)
+        self.live = np.zeros(capacity, dtype=bool)
+
+    def _intern(self, station):
+        i = self.index.get(station)
+        if i is None:
+            i = self.index[station] = len(self.ids)
+            self.ids.append(station)
+        return i
+
+    def _drop(self, station):
+        block = self.blocks.pop(station, None)
+        if block is not None:
+            self.live[block[0]:block[1]] = False
+            self.dead += block[1] - block[0]
+
+    def _reserve(self, rows):
+        if self.size + rows <= len(self.live):
+            return
+        if self.dead * 2 >= self.size:
+            self._compact()
+        if self.size + rows > len(self.live):
+            old = (self.sources, self.targets, self.dists, self.variances, self.stamps, self.live)
+            self._allocate(max(2 * len(self.live), self.size + rows))
+            for column, values in zip((self.sources, self.targets, self.dists, self.variances, self.stamps,
+                                       self.live), old):
+                column[:self.size] = values[:self.size]
+
+    def _compact(self):
+        """Drops the dead rows and re-interns the ids still referenced."""
+        live = np.flatnonzero(self.live[:self.size])
+        size = len(live)
+        ids, index = [], {}
+        remap = np.full(len(self.ids), -1, dtype=np.int64)
+        used = np.union1d(np.union1d(self.sources[live], self.targets[live]),
+                          np.array([self.index[station] for station in self.blocks], dtype=np.int64))
+        for old_index in used:
+            remap[old_index] = len(ids)
+            index[self.ids[old_index]] = len(ids)
+            ids.append(self.ids[old_index])
+        # Every row moves back by the number of dead rows before it
+        shift = np.concatenate([[0], np.cumsum(~self.live[:self.size])])
+        self.blocks = {station: (int(start - shift[start]), int(end - shift[start]))
+                       for station, (start, end) in self.blocks.items()}
+        self.sources[:size] = remap[self.sources[live]]
+        self.targets[:size] = remap[self.targets[live]]
+        self.dists[:size] = self.dists[live]
+        self.variances[:size] = self.variances[live]
+        self.stamps[:size] = self.stamps[live]
+        self.live[:size] = True
+        self.live[size:] = False
+        self.ids, self.index, self.size, self.dead = ids, index, size, 0
+
+    def put(self, station, value, now=None):
+        """Stores a neighbor table; raises ValueError, leaving the store unchanged, when it is malformed."""
+        targets, dists, variances = table_columns(value)
+        now = self.clock() if now is None else now
+        evicted = super().put(station, value, now)
+        for gone in evicted:
+            self._drop(gone)
+        self._drop(station)
+        rows = len(targets)
+        self._reserve(rows)
+        start, end = self.size, self.size + rows
+        self.sources[start:end] = self._intern(station)
+        self.targets[start:end] = [self._intern(target) for target in targets]
+        self.dists[start:end] = dists
+        self.variances[start:end] = variances
+        self.stamps[start:end] = now
+        self.live[start:end] = True
+        self.blocks[station] = (start, end)
+        self.size = end
+        return evicted
+
+    def pop(self, station, default=None):
+        self._drop(station)
+        return super().pop(station, default)
+
+    def expire(self, now=None):
+        expired = super().expire(now)
+        for station in expired:
+            self._drop(station)
+        return expired
+
+    def readings(self):
+        """Copy of the live readings, for parsing outside the owner's lock."""
+        live = np.flatnonzero(self.live[:self.size])
+        tables = np.array([self.index[station] for station in self.blocks], dtype=np.int64)
+        return Readings(list(self.ids), self.sources[live], self.targets[live], self.dists[live],
+                        self.variances[live], self.stamps[live], tables)
@@ -0,0 +1,65 @@
+import contextlib
+import json
+import threading
+import time
+
+from atomic_file import write_atomic
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and timing summaries of the topology
+    pipeline. snapshot() gives a JSON-serializable copy that the master
+    writes to a file (see write) for api.py to serve.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, labels) -> value, labels as a sorted tuple of pairs
+        self.gauges = {}
+        self.timings = {}   # name -> [count, sum, max, last] in seconds
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items())) if labels else ()
+
+    def inc(self, name, labels=None, value=1):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, labels=None):
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, seconds):
+        with self.lock:
+            summary = self.timings.setdefault(name, [0, 0.0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += seconds
+            summary[2] = max(summary[2], seconds)
+            summary[3] = seconds
+
+    @contextlib.contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "timestamp": time.time(),
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+                "timings": [{"name": name, "count": count, "sum": total, "max": longest, "last": last}
+                            for name, (count, total, longest, last) in sorted(self.timings.items())],
+            }
+
+    def write(self, path):
+        """Writes snapshot() to `path` through a temporary file and an atomic rename."""
+        write_atomic(path, json.dumps(self.snapshot(), separators=(",", ":")), prefix=".metrics.")
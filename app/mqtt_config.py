@@ -1,17 +1,47 @@
 # mqtt_config.py
 import dotenv
+import json
 import os
 dotenv.load_dotenv()
 
 BROKER_ADDRESS = os.getenv("BROKER_IP", "localhost")
 BROKER_PORT = int(os.getenv("BROKER_PORT", 1883))
 IM_MASTER = os.getenv("IM_MASTER", "False").lower() == "true"
+SOLVER_ENGINE = os.getenv("SOLVER_ENGINE", "smacof")  # see things.SOLVER_ENGINES
+SOLVER_OPTIONS = json.loads(os.getenv("SOLVER_OPTIONS", "{}"))  # engine keyword arguments, e.g. {"seed": 7, "time_budget": 2}
+GRAPH_NEIGHBORS = int(os.getenv("GRAPH_NEIGHBORS", 2))  # k of the published k-nearest graph
+LINE_ORDER = os.getenv("LINE_ORDER", "True").lower() == "true"      # also publish the stations' order along their lines
+CHANGE_TOLERANCE = float(os.getenv("CHANGE_TOLERANCE", 0.1))        # metres a distance must move to count as a change
+RECOMPUTE_DEBOUNCE = float(os.getenv("RECOMPUTE_DEBOUNCE", 2.0))    # seconds of quiet before re-solving
+RECOMPUTE_MAX_DELAY = float(os.getenv("RECOMPUTE_MAX_DELAY", 10.0)) # seconds a change may wait under constant updates
+PAYLOAD_FORMAT = os.getenv("PAYLOAD_FORMAT", "json")  # "json" or "binary" (see codec.py), both are always accepted
+MOVE_THRESHOLD = float(os.getenv("MOVE_THRESHOLD", 0.05))           # metres a position must move to be republished
+SNAPSHOT_EVERY = int(os.getenv("SNAPSHOT_EVERY", 20))               # topology deltas between two full snapshots
+RESYNC_MIN_INTERVAL = float(os.getenv("RESYNC_MIN_INTERVAL", 1.0))  # seconds between snapshots sent on request
+METRICS_FILE = os.getenv("METRICS_FILE", "master_metrics.json")     # read by api.py for /metrics
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", 5.0))        # seconds between two metrics file writes
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))                # threads handling received messages, 0: inline
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 1000))       # messages waiting for a worker before backpressure
+INGEST_BLOCK_TIMEOUT = float(os.getenv("INGEST_BLOCK_TIMEOUT", 0.05)) # seconds the network loop waits on a full queue
+MEASUREMENT_TTL = float(os.getenv("MEASUREMENT_TTL", 120.0))        # seconds a silent station is kept, 0: forever
+MEASUREMENT_HALFLIFE = float(os.getenv("MEASUREMENT_HALFLIFE", 0))  # seconds for a reading's variance to double, 0: no ageing
+MAX_STATIONS = int(os.getenv("MAX_STATIONS", 5000))                 # stations tracked at most, the least recent are evicted
+ROLLOUT_CHECK_INTERVAL = float(os.getenv("ROLLOUT_CHECK_INTERVAL", 10.0)) # seconds between two rollout steps
+ROLLOUT_WAVE_SIZE = int(os.getenv("ROLLOUT_WAVE_SIZE", 10))         # stations updated per wave
+ROLLOUT_MAX_IN_FLIGHT = int(os.getenv("ROLLOUT_MAX_IN_FLIGHT", 5))  # update commands outstanding at once
+ROLLOUT_WAVE_INTERVAL = float(os.getenv("ROLLOUT_WAVE_INTERVAL", 60.0)) # seconds at least between two wave starts
+UPDATE_TIMEOUT = float(os.getenv("UPDATE_TIMEOUT", 300.0))          # seconds for a station to report the new version
+UPDATE_MAX_ATTEMPTS = int(os.getenv("UPDATE_MAX_ATTEMPTS", 3))      # commands per station before giving up on it
+CHECKPOINT_FILE = os.getenv("CHECKPOINT_FILE", "master_checkpoint.json.z")  # master state reloaded on restart
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", 30.0)) # seconds between two checkpoints
 
 TOPICS = {
     "IS_MASTER": "station/{id}/is_master",  
     "NEIGHBORS": "station/{id}/neighbors",
     "VERSION": "station/{id}/version",
-    "TOPOLOGY_POS": "topology/positions",
-    "TOPOLOGY_GRAPH": "topology/graph",
+    "TOPOLOGY_SNAPSHOT": "topology/snapshot",  # retained full state
+    "TOPOLOGY_DELTA": "topology/delta",
+    "TOPOLOGY_RESYNC": "topology/resync",      # subscribers ask for a fresh snapshot
+    "LINE_ORDER": "topology/line_order",       # retained left/right neighbors of every station
     "UPDATE_CMD": "station/{id}/update"
 }
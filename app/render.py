@@ -0,0 +1,75 @@
+import io
+import threading
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+LARGE_GRAPH = 200  # above this many stations the dashboard draws in the browser by default
+
+
+def edge_segments(positions, edges):
+    """(E, 2, 2) array of edge endpoints, skipping edges to unknown stations."""
+    segments = [(positions[u], positions[v]) for u, v in edges if u in positions and v in positions]
+    return np.array(segments, dtype=float).reshape(-1, 2, 2)
+
+
+class FigureRenderer:
+    """
+    Draws the topology into one reused matplotlib Figure and returns PNG
+    bytes. The figure is created once and cleared between renders, outside
+    pyplot, so nothing accumulates no matter how often the topology changes.
+    """
+
+    def __init__(self, size=(6, 6), dpi=100, labels_up_to=LARGE_GRAPH):
+        self.figure = Figure(figsize=size, dpi=dpi)
+        self.labels_up_to = labels_up_to
+        self.lock = threading.Lock()
+        self.renders = 0
+
+    def render(self, positions, edges):
+        with self.lock:
+            self.figure.clear()
+            ax = self.figure.add_subplot()
+            ids = list(positions)
+            coords = np.array([positions[node_id] for node_id in ids], dtype=float).reshape(-1, 2)
+            ax.add_collection(LineCollection(edge_segments(positions, edges), colors="gray", linewidths=1, zorder=1))
+            ax.scatter(coords[:, 0], coords[:, 1], s=300 if len(ids) <= self.labels_up_to else 10,
+                       color="skyblue", edgecolors="black", zorder=2)
+            if len(ids) <= self.labels_up_to:
+                for node_id, (x, y) in zip(ids, coords):
+                    ax.annotate(node_id, (x, y), ha="center", va="center", fontsize=8, fontweight="bold", zorder=3)
+            ax.set_aspect("equal", adjustable="datalim")
+            ax.autoscale_view()
+            ax.grid(True, linestyle="--", alpha=0.5)
+
+            buffer = io.BytesIO()
+            self.figure.savefig(buffer, format="png")
+            self.renders += 1
+            return buffer.getvalue()
+
+
+def chart_data(positions, edges):
+    """Plain records for a client-side chart: one per station and one per edge."""
+    nodes = [{"id": node_id, "x": x, "y": y} for node_id, (x, y) in positions.items()]
+    links = [{"x": a[0], "y": a[1], "x2": b[0], "y2": b[1]} for a, b in edge_segments(positions, edges).tolist()]
+    return nodes, links
+
+
+def altair_chart(positions, edges):
+    """
+    Vega-Lite chart of the topology, drawn in the browser so large fleets do
+    not cost a server-side image per change. Needs altair.
+    """
+    import altair as alt
+
+    nodes, links = chart_data(positions, edges)
+    edge_layer = alt.Chart(alt.Data(values=links)).mark_rule(color="gray").encode(
+        x="x:Q", y="y:Q", x2="x2:Q", y2="y2:Q")
+    node_layer = alt.Chart(alt.Data(values=nodes)).mark_circle(size=120, color="steelblue").encode(
+        x=alt.X("x:Q", scale=alt.Scale(zero=False)), y=alt.Y("y:Q", scale=alt.Scale(zero=False)),
+        tooltip=["id:N", "x:Q", "y:Q"])
+    layers = [edge_layer, node_layer]
+    if len(nodes) <= LARGE_GRAPH:
+        layers.append(node_layer.mark_text(dy=-12, fontSize=10).encode(text="id:N"))
+    return alt.layer(*layers).interactive()
@@ -0,0 +1,132 @@
+import re
+import time
+
+_SEMVER = re.compile(r"^v?(\d+(?:\.\d+)*)(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$")
+
+
+def parse_version(text):
+    """
+    Sort key of a semantic version ("1.10.0", "v2.0", "1.4.0-rc.1+build5"):
+    numeric components compare as numbers, missing ones count as 0, and a
+    pre-release sorts before its release. Build metadata is ignored.
+    Raises ValueError for anything else.
+    """
+    match = _SEMVER.match(str(text).strip())
+    if match is None:
+        raise ValueError(f"Invalid version '{text}'")
+    core = [int(part) for part in match.group(1).split(".")]
+    while len(core) > 1 and core[-1] == 0:
+        core.pop()
+    if match.group(2) is None:
+        return tuple(core), (1,)
+    # Numeric identifiers sort before alphanumeric ones, as in SemVer
+    pre = tuple((0, int(part), "") if part.isdigit() else (1, 0, part) for part in match.group(2).split("."))
+    return tuple(core), (0,) + pre
+
+
+class Rollout:
+    """
+    Staged, rate-limited update of out-of-date stations to the newest
+    version any station reports.
+
+    due() hands out update commands in waves of `wave_size` stations, with
+    at most `max_in_flight` of them outstanding at once; the next wave
+    starts once every command of the previous one is resolved and
+    `wave_interval` seconds have passed since it started. A command is
+    acknowledged when its station reports the target version (or newer)
+    and times out after `timeout` seconds, freeing its slot; a station is
+    retried in a later wave up to `max_attempts` times. A station with a
+    command in flight never gets another one, so update traffic is bounded
+    by the wave settings whatever the fleet size.
+    """
+
+    def __init__(self, wave_size=10, max_in_flight=5, wave_interval=30.0, timeout=300.0, max_attempts=3,
+                 clock=time.monotonic):
+        self.wave_size = wave_size
+        self.max_in_flight = max_in_flight
+        self.wave_interval = wave_interval
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.target = None      # newest version reported, as sent in the commands
+        self.target_key = None
+        self.in_flight = {}     # station -> time its command was sent
+        self.attempts = {}      # station -> commands sent for the current target
+        self.failed = set()     # stations out of attempts for the current target
+        self.wave_started = None
+        self.wave_sent = 0
+        self.acked = 0
+        self.timed_out = 0
+
+    def report(self, station, version):
+        """
+        Records a version report; returns True when it acknowledges an
+        in-flight update. A newer version than the target starts a new rollout.
+        """
+        key = parse_version(version)
+        if self.target_key is None or key > self.target_key:
+            self.target, self.target_key = version, key
+            self.in_flight.clear()
+            self.attempts.clear()
+            self.failed.clear()
+            self.wave_started = None
+            self.wave_sent = 0
+        if key >= self.target_key:
+            self.attempts.pop(station, None)
+            self.failed.discard(station)
+            if self.in_flight.pop(station, None) is not None:
+                self.acked += 1
+                return True
+        return False
+
+    def forget(self, station):
+        """Drops a departed station, freeing its slot."""
+        self.in_flight.pop(station, None)
+        self.attempts.pop(station, None)
+        self.failed.discard(station)
+
+    def _expire_in_flight(self, now):
+        for station, sent_at in list(self.in_flight.items()):
+            if now - sent_at > self.timeout:
+                del self.in_flight[station]
+                self.timed_out += 1
+                if self.attempts.get(station, 0) >= self.max_attempts:
+                    self.failed.add(station)
+
+    def due(self, versions, now=None):
+        """
+        Update commands to send now, as (station, version) pairs, given the
+        current {station: version}; they are counted as in flight.
+        """
+        now = self.clock() if now is None else now
+        self._expire_in_flight(now)
+        if self.target_key is None:
+            return []
+
+        if self.wave_sent >= self.wave_size:
+            if self.in_flight or now - self.wave_started < self.wave_interval:
+                return []
+            self.wave_started, self.wave_sent = None, 0
+
+        slots = min(self.max_in_flight - len(self.in_flight), self.wave_size - self.wave_sent)
+        commands = []
+        for station, version in sorted(versions.items()):
+            if len(commands) >= slots:
+                break
+            if station in self.in_flight or station in self.failed:
+                continue
+            try:
+                if parse_version(version) >= self.target_key:
+                    continue
+            except ValueError:
+                continue
+            commands.append((station, version))
+
+        for station, _ in commands:
+            self.in_flight[station] = now
+            self.attempts[station] = self.attempts.get(station, 0) + 1
+        if commands:
+            if self.wave_started is None:
+                self.wave_started = now
+            self.wave_sent += len(commands)
+        return commands
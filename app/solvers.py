@@ -0,0 +1,359 @@
+import heapq
+from dataclasses import dataclass
+
+import numpy as np
+
+MIN_VARIANCE = 1e-3
+FULL_MDS_MAX_POINTS = 200   # above this classical_mds switches to landmark MDS
+MDS_LANDMARKS = 50
+
+
+@dataclass
+class SolveReport:
+    """Summary of one position solve, used to compare solver engines."""
+    engine: str
+    num_points: int
+    iterations: int
+    stress: float
+    wall_time: float
+    parse_time: float = 0.0  # set by things.solve_point_positions_and_graph
+    graph_time: float = 0.0
+
+    def __str__(self):
+        return (f"{self.engine}: {self.num_points} points, {self.iterations} iterations, "
+                f"stress {self.stress:.6f}, {self.wall_time * 1000:.1f} ms")
+
+
+class EdgeList:
+    """
+    Sparse measurement model: one entry per measured pair of point indices
+    (COO layout, rows[k] < cols[k]) with its averaged distance and variance.
+
+    Memory and the cost of every solver iteration grow with the number of
+    measured pairs instead of with N^2.
+    """
+
+    def __init__(self, rows, cols, dists, variances):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.dists = np.asarray(dists, dtype=float)
+        self.variances = np.asarray(variances, dtype=float)
+
+    def __len__(self):
+        return len(self.dists)
+
+    def items(self):
+        """Yields ((idx1, idx2), (dist, var)) like the former measurements dict."""
+        for k in range(len(self)):
+            yield (int(self.rows[k]), int(self.cols[k])), (float(self.dists[k]), float(self.variances[k]))
+
+    def pair(self, idx1, idx2):
+        """(dist, var) measured between two indices, or None."""
+        if idx1 > idx2:
+            idx1, idx2 = idx2, idx1
+        found = np.flatnonzero((self.rows == idx1) & (self.cols == idx2))
+        if len(found) == 0:
+            return None
+        return float(self.dists[found[0]]), float(self.variances[found[0]])
+
+    def to_csr(self, num_points):
+        """
+        Symmetric CSR adjacency: the neighbors of point i are
+        indices[indptr[i]:indptr[i + 1]] at distances dists[indptr[i]:indptr[i + 1]].
+
+        Returns:
+            A tuple (indptr, indices, dists).
+        """
+        sources = np.concatenate([self.rows, self.cols])
+        targets = np.concatenate([self.cols, self.rows])
+        dists = np.concatenate([self.dists, self.dists])
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(num_points + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_points), out=indptr[1:])
+        return indptr, targets[order], dists[order]
+
+
+def aggregate_readings(sources, targets, dists, variances, num_points):
+    """
+    Averages every reading of the same unordered pair of point indices into
+    one EdgeList entry, with a vectorized group-by: the pairs are keyed as
+    min * num_points + max, grouped by np.unique and summed with bincount.
+    Readings of a point by itself carry no geometry and are dropped.
+
+    Returns:
+        An EdgeList sorted by (rows, cols).
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    distinct = sources != targets
+    if not distinct.all():
+        sources, targets = sources[distinct], targets[distinct]
+        dists, variances = np.asarray(dists, dtype=float)[distinct], np.asarray(variances, dtype=float)[distinct]
+    if len(sources) == 0:
+        return EdgeList([], [], [], [])
+    keys = np.minimum(sources, targets) * num_points + np.maximum(sources, targets)
+    pairs, group = np.unique(keys, return_inverse=True)
+    counts = np.bincount(group)
+    return EdgeList(pairs // num_points, pairs % num_points,
+                    np.bincount(group, np.asarray(dists, dtype=float)) / counts,
+                    np.bincount(group, np.asarray(variances, dtype=float)) / counts)
+
+
+def edge_weights(variances):
+    """
+    Inverse-variance weights for the measured pairs, scaled to a mean of 1 so
+    the stress stays comparable between inputs.
+    """
+    weights = 1.0 / np.maximum(variances, MIN_VARIANCE)
+    return weights / weights.mean() if len(weights) else weights
+
+
+def stress(points, edges, weights):
+    """
+    Normalized weighted stress of a configuration:
+    sqrt(sum w * (|p_i - p_j| - d)^2 / sum w * d^2) over the measured pairs.
+    """
+    if len(edges) == 0:
+        return 0.0
+    cur_dists = np.linalg.norm(points[edges.rows] - points[edges.cols], axis=1)
+    return float(np.sqrt(np.sum(weights * (cur_dists - edges.dists) ** 2) / np.sum(weights * edges.dists ** 2)))
+
+
+def connected_components(num_points, edges):
+    """
+    Connected component label of every point over the measured pairs,
+    numbered in order of each component's lowest point index.
+    """
+    indptr, indices, _ = edges.to_csr(num_points)
+    labels = np.full(num_points, -1, dtype=np.int64)
+    count = 0
+    for start in range(num_points):
+        if labels[start] >= 0:
+            continue
+        labels[start] = count
+        stack = [start]
+        while stack:
+            i = stack.pop()
+            for j in indices[indptr[i]:indptr[i + 1]]:
+                if labels[j] < 0:
+                    labels[j] = count
+                    stack.append(j)
+        count += 1
+    return labels
+
+
+def shortest_path_distances(num_points, edges, sources=None):
+    """
+    Shortest path lengths over the measured pairs (Dijkstra from each of
+    `sources`, every point by default). Pairs in different connected
+    components are set to 1.5x the largest finite path so they still get a
+    finite, far-apart placement.
+
+    Returns:
+        A (len(sources), num_points) array.
+    """
+    if sources is None:
+        sources = range(num_points)
+    indptr, indices, dists = edges.to_csr(num_points)
+
+    paths = np.full((len(sources), num_points), np.inf)
+    for row, source in zip(paths, sources):
+        row[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, i = heapq.heappop(heap)
+            if d > row[i]:
+                continue
+            for k in range(indptr[i], indptr[i + 1]):
+                j, through = indices[k], d + dists[k]
+                if through < row[j]:
+                    row[j] = through
+                    heapq.heappush(heap, (through, j))
+
+    finite = np.isfinite(paths)
+    if not finite.all():
+        paths[~finite] = 1.5 * paths[finite].max() if paths[finite].max() > 0 else 1.0
+    return paths
+
+
+def _torgerson(squared, dims):
+    """Top `dims` eigenpairs of the double-centred squared distance matrix."""
+    size = squared.shape[0]
+    centering = np.eye(size) - 1.0 / size
+    gram = -0.5 * centering @ squared @ centering
+    eigenvalues, eigenvectors = np.linalg.eigh(gram)
+    top = np.argsort(eigenvalues)[::-1][:dims]
+    return eigenvectors[:, top], np.maximum(eigenvalues[top], 0)
+
+
+def classical_mds(num_points, edges, dims=2):
+    """
+    Classical (Torgerson) MDS on the shortest-path completion of the
+    measurements: double-centres the squared distances and keeps the top
+    `dims` eigenvectors.
+
+    Above FULL_MDS_MAX_POINTS this becomes landmark MDS: shortest paths are
+    only run from MDS_LANDMARKS farthest-point landmarks, the landmarks are
+    embedded classically and every other point is triangulated from its
+    distances to them, so memory stays O(N * landmarks).
+    """
+    if num_points == 1:
+        return np.zeros((1, dims))
+    if num_points <= FULL_MDS_MAX_POINTS:
+        vectors, values = _torgerson(shortest_path_distances(num_points, edges) ** 2, dims)
+        points = vectors * np.sqrt(values)
+    else:
+        landmarks = [0]
+        paths = shortest_path_distances(num_points, edges, landmarks)
+        nearest = paths[0].copy()
+        while len(landmarks) < MDS_LANDMARKS:
+            landmarks.append(int(np.argmax(nearest)))
+            row = shortest_path_distances(num_points, edges, landmarks[-1:])
+            paths = np.vstack([paths, row])
+            nearest = np.minimum(nearest, row[0])
+        squared = paths ** 2
+        vectors, values = _torgerson(squared[:, landmarks], dims)
+        pseudo_inverse = (vectors / np.sqrt(np.where(values > 0, values, np.inf))).T
+        mean_squared = squared[:, landmarks].mean(axis=1)
+        points = (-0.5 * pseudo_inverse @ (squared - mean_squared[:, np.newaxis])).T
+
+    if points.shape[1] < dims:
+        points = np.hstack([points, np.zeros((num_points, dims - points.shape[1]))])
+    return points
+
+
+def _laplacian_product(x, edges, weights, degree):
+    """L x for the weighted graph Laplacian of the measured pairs, in O(edges)."""
+    num_points = x.shape[0]
+    neighbor_sum = np.empty_like(x)
+    for dim in range(x.shape[1]):
+        neighbor_sum[:, dim] = (np.bincount(edges.rows, weights * x[edges.cols, dim], minlength=num_points)
+                                + np.bincount(edges.cols, weights * x[edges.rows, dim], minlength=num_points))
+    return degree[:, np.newaxis] * x - neighbor_sum
+
+
+def _solve_laplacian(rhs, x0, edges, weights, degree, max_iterations=50, tolerance=1e-10):
+    """
+    Solves L x = rhs by Jacobi-preconditioned conjugate gradients, one column
+    per coordinate. L is singular (translations), but the SMACOF right-hand
+    side always sums to zero over each connected component so the system is
+    consistent; the component offsets of `x0` are simply kept.
+    """
+    inv_degree = (1.0 / np.where(degree > 0, degree, 1.0))[:, np.newaxis]
+    x = x0.copy()
+    residual = rhs - _laplacian_product(x, edges, weights, degree)
+    z = inv_degree * residual
+    direction = z.copy()
+    rz = np.sum(residual * z, axis=0)
+    threshold = tolerance * max(np.sum(rhs * rhs), 1e-300)
+    for _ in range(max_iterations):
+        if np.sum(residual * residual) <= threshold:
+            break
+        product = _laplacian_product(direction, edges, weights, degree)
+        curvature = np.sum(direction * product, axis=0)
+        alpha = np.where(curvature > 0, rz / np.where(curvature > 0, curvature, 1.0), 0.0)
+        x += alpha * direction
+        residual -= alpha * product
+        z = inv_degree * residual
+        rz_next = np.sum(residual * z, axis=0)
+        direction = z + np.where(rz > 0, rz_next / np.where(rz > 0, rz, 1.0), 0.0) * direction
+        rz = rz_next
+    return x
+
+
+def smacof(points, edges, weights, max_iterations=300, tolerance=1e-5):
+    """
+    Weighted SMACOF stress majorization starting from `points`.
+
+    Each iteration applies the Guttman transform X = V^+ B(X) X, which never
+    increases the weighted stress, so no learning rate is needed. Both B(X) X
+    and the V solve (conjugate gradients warm-started from X) only touch the
+    measured pairs. Stops when the relative stress improvement drops below
+    `tolerance` or the stress is practically zero.
+
+    Returns:
+        The final points and the number of iterations run.
+    """
+    num_points = points.shape[0]
+    if num_points < 2 or len(edges) == 0:
+        return points, 0
+
+    degree = (np.bincount(edges.rows, weights, minlength=num_points)
+              + np.bincount(edges.cols, weights, minlength=num_points))
+
+    prev_stress = stress(points, edges, weights)
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        diff_p = points[edges.rows] - points[edges.cols]
+        cur_dists = np.linalg.norm(diff_p, axis=1)
+        ratio = np.where(cur_dists > 1e-12, weights * edges.dists / np.maximum(cur_dists, 1e-12), 0.0)
+        pull = ratio[:, np.newaxis] * diff_p
+        guttman_rhs = np.empty_like(points)
+        for dim in range(points.shape[1]):
+            guttman_rhs[:, dim] = (np.bincount(edges.rows, pull[:, dim], minlength=num_points)
+                                   - np.bincount(edges.cols, pull[:, dim], minlength=num_points))
+        points = _solve_laplacian(guttman_rhs, points, edges, weights, degree)
+
+        cur_stress = stress(points, edges, weights)
+        if cur_stress < 1e-6 or prev_stress - cur_stress < tolerance * prev_stress:
+            break
+        prev_stress = cur_stress
+    return points, iterations
+
+
+def line_coordinates(num_points, edges, weights=None, max_iterations=50, tolerance=1e-5):
+    """
+    Places a connected set of points along one axis, for lines that are
+    essentially one-dimensional, in near-linear time.
+
+    A double Dijkstra sweep finds the two ends a and b of the line (the
+    point farthest from point 0, then the point farthest from that one);
+    each point starts at (d(a, x) - d(b, x) + d(a, b)) / 2, its projection
+    on the a-b axis, and a few 1-D SMACOF iterations then fit the offsets to
+    the measurements. Three shortest path runs and O(edges) iterations, no
+    N x N matrix.
+
+    Returns:
+        The coordinates (a at 0, increasing towards b) and the number of
+        SMACOF iterations run.
+    """
+    if num_points < 2 or len(edges) == 0:
+        return np.zeros(num_points), 0
+    first = int(np.argmax(shortest_path_distances(num_points, edges, [0])[0]))
+    from_first = shortest_path_distances(num_points, edges, [first])[0]
+    last = int(np.argmax(from_first))
+    from_last = shortest_path_distances(num_points, edges, [last])[0]
+    coords = (from_first - from_last + from_first[last]) / 2
+
+    if weights is None:
+        weights = edge_weights(edges.variances)
+    points, iterations = smacof(coords[:, np.newaxis], edges, weights, max_iterations, tolerance)
+    coords = points[:, 0]
+    if coords[last] < coords[first]:
+        coords = -coords
+    return coords - coords[first], iterations
+
+
+def align_to_anchors(points):
+    """
+    Rigidly moves a configuration into the anchor frame used by the solver:
+    the first point at the origin and the second on the positive x axis.
+    """
+    points = points - points[0]
+    if points.shape[0] > 1:
+        angle = np.arctan2(points[1, 1], points[1, 0])
+        cos, sin = np.cos(-angle), np.sin(-angle)
+        points = points @ np.array([[cos, sin], [-sin, cos]])
+    return points
+
+
+def align_to_reference(points, reference, mask):
+    """
+    Rigidly moves (rotation, translation and possibly a reflection) a
+    configuration onto `reference` using orthogonal Procrustes over the rows
+    selected by `mask`, so consecutive solves do not jump around.
+    """
+    source, target = points[mask], reference[mask]
+    source_centre, target_centre = source.mean(axis=0), target.mean(axis=0)
+    u, _, vt = np.linalg.svd((source - source_centre).T @ (target - target_centre))
+    return (points - source_centre) @ (u @ vt) + target_centre
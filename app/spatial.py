@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class SpatialGrid:
+    """
+    Uniform grid over 2-D coordinates for nearest-neighbor queries.
+
+    Points are bucketed into square cells sized so that each occupied cell
+    holds a few points on average; a query only looks at the rings of cells
+    around it until the k-th nearest candidate is provably inside the
+    searched area, so building the k-nearest graph of N points costs about
+    O(N * k) instead of O(N^2).
+    """
+
+    def __init__(self, coords, points_per_cell=3):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        num_points = self.coords.shape[0]
+        self.origin = self.coords.min(axis=0) if num_points else np.zeros(2)
+        extent = (self.coords.max(axis=0) - self.origin) if num_points else np.zeros(2)
+        occupancy = points_per_cell / max(num_points, 1)
+        # Square-ish layouts fill an area, assembly lines are nearly 1-D
+        self.cell_size = max(np.sqrt(extent[0] * extent[1] * occupancy), float(extent.max()) * occupancy, 1e-9)
+
+        cells = np.floor((self.coords - self.origin) / self.cell_size).astype(np.int64)
+        self.grid_shape = cells.max(axis=0) + 1 if num_points else np.ones(2, dtype=np.int64)
+        keys = cells[:, 0] * self.grid_shape[1] + cells[:, 1]
+        order = np.argsort(keys, kind="stable")
+        unique_keys, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self.buckets = {int(key): order[start:start + count]
+                        for key, start, count in zip(unique_keys, starts, counts)}
+        self.cells = cells
+
+    def __len__(self):
+        return self.coords.shape[0]
+
+    def _block(self, cell, ring):
+        """Indices of the points in the (2 * ring + 1)^2 cells around `cell`."""
+        x_range = range(max(cell[0] - ring, 0), min(cell[0] + ring, self.grid_shape[0] - 1) + 1)
+        y_range = range(max(cell[1] - ring, 0), min(cell[1] + ring, self.grid_shape[1] - 1) + 1)
+        found = [self.buckets[key] for key in (x * self.grid_shape[1] + y for x in x_range for y in y_range)
+                 if key in self.buckets]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def _covers_grid(self, cell, ring):
+        return (cell[0] - ring <= 0 and cell[1] - ring <= 0
+                and cell[0] + ring >= self.grid_shape[0] - 1 and cell[1] + ring >= self.grid_shape[1] - 1)
+
+    def knn_all(self, k):
+        """
+        The k nearest other points of every point.
+
+        Returns:
+            (indices, distances), both (N, k) and sorted by distance; rows of
+            points with fewer than k others are padded with -1 / inf.
+        """
+        num_points = len(self)
+        indices = np.full((num_points, k), -1, dtype=np.int64)
+        distances = np.full((num_points, k), np.inf)
+        if num_points < 2 or k <= 0:
+            return indices, distances
+        wanted = min(k, num_points - 1)
+
+        for key, members in self.buckets.items():
+            cell = self.cells[members[0]]
+            ring = 1
+            while True:
+                candidates = self._block(cell, ring)
+                if len(candidates) > wanted or self._covers_grid(cell, ring):
+                    dists = np.linalg.norm(self.coords[members][:, np.newaxis] - self.coords[candidates], axis=2)
+                    dists[members[:, np.newaxis] == candidates] = np.inf
+                    nearest = np.argsort(dists, axis=1, kind="stable")[:, :wanted]
+                    nearest_dists = np.take_along_axis(dists, nearest, axis=1)
+                    # Anything outside the block is at least `ring` cells away
+                    if self._covers_grid(cell, ring) or np.all(nearest_dists[:, -1] <= ring * self.cell_size):
+                        indices[members, :wanted] = candidates[nearest]
+                        distances[members, :wanted] = nearest_dists
+                        break
+                ring *= 2
+        return indices, distances
+
+    def _cell_of(self, point):
+        cell = np.floor((np.asarray(point, dtype=float) - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(cell, 0, self.grid_shape - 1)
+
+    def _ring_reach(self, point, cell, ring):
+        """Distance from `point` to the edge of the block searched at `ring` around `cell`."""
+        low = self.origin + (cell - ring) * self.cell_size
+        high = self.origin + (cell + ring + 1) * self.cell_size
+        point = np.asarray(point, dtype=float)
+        return max(float(min((point - low).min(), (high - point).min())), 0.0)
+
+    def query_radius(self, point, radius):
+        """
+        Points within `radius` of `point`.
+
+        Returns:
+            (indices, distances) sorted by distance.
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        point = np.asarray(point, dtype=float)
+        low = np.floor((point - radius - self.origin) / self.cell_size).astype(np.int64)
+        high = np.floor((point + radius - self.origin) / self.cell_size).astype(np.int64)
+        low, high = np.maximum(low, 0), np.minimum(high, self.grid_shape - 1)
+        found = [self.buckets[key] for key in (x * self.grid_shape[1] + y
+                                               for x in range(low[0], high[0] + 1)
+                                               for y in range(low[1], high[1] + 1))
+                 if key in self.buckets]
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        candidates = np.concatenate(found)
+        dists = np.linalg.norm(self.coords[candidates] - point, axis=1)
+        inside = dists <= radius
+        candidates, dists = candidates[inside], dists[inside]
+        order = np.argsort(dists, kind="stable")
+        return candidates[order], dists[order]
+
+    def query_knn(self, point, k):
+        """
+        The k points nearest to `point` (fewer when there are not enough).
+
+        Returns:
+            (indices, distances) sorted by distance.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        cell = self._cell_of(point)
+        ring = 1
+        while True:
+            candidates = self._block(cell, ring)
+            covers = self._covers_grid(cell, ring)
+            if len(candidates) >= k or covers:
+                dists = np.linalg.norm(self.coords[candidates] - np.asarray(point, dtype=float), axis=1)
+                nearest = np.argsort(dists, kind="stable")[:k]
+                # Points outside the block are further than its nearest edge
+                if covers or dists[nearest[-1]] <= self._ring_reach(point, cell, ring):
+                    return candidates[nearest], dists[nearest]
+            ring *= 2
@@ -1,21 +1,35 @@
 import asyncio
 import json
+import threading
 import time
 from typing import List
 from bleak import BleakScanner, BLEDevice
 import paho.mqtt.client as mqtt
-from mqtt_config import BROKER_ADDRESS, BROKER_PORT
+from mqtt_config import BROKER_ADDRESS, BROKER_PORT, PAYLOAD_FORMAT
+from ble import BleakAdvertisementSource, RssiTracker, distance_variance
+from codec import encode_neighbors
 
 VERSION = "1.0.0"
 
 class StationNode:
-    def __init__(self, station_id: str, is_master: bool = False):
+    def __init__(self, station_id: str, is_master: bool = False, ble_source=None, continuous_scan: bool = True,
+                 payload_format: str = PAYLOAD_FORMAT, client=None):
         self.station_id = station_id
         self.is_master = is_master
         self.known_master = station_id if is_master else None
         self.has_propagated_master = is_master
         self.neighbors: List[BLEDevice] = []
-        self.client = mqtt.Client()
+        # Continuous mode listens to every advertisement of `ble_source`
+        # (bleak by default); otherwise scan_ble takes a 10 s snapshot per loop.
+        self.continuous_scan = continuous_scan
+        self.payload_format = payload_format
+        self.ble_source = ble_source or BleakAdvertisementSource()
+        self.rssi = RssiTracker()
+        self.rssi_lock = threading.Lock()
+        self.scan_thread = None
+        self.scan_loop = None
+        self.scan_stop = None
+        self.client = client or mqtt.Client()  # e.g. a loopback.LoopbackClient in simulations
         self.client.on_message = self.on_message
 
     def start(self):
@@ -26,22 +40,56 @@ class StationNode:
         if self.is_master:
             self.propagate_master_info()
 
+        if self.continuous_scan:
+            self.start_scanning()
+
         while True:
-            self.scan_ble()
+            if not self.continuous_scan:
+                self.scan_ble()
             self.advertise_ble_name()
             self.publish_neighbors()
             time.sleep(30)
 
+    def start_scanning(self):
+        """Runs `ble_source` on its own event loop in a background thread."""
+        started = threading.Event()
+
+        async def scan_forever():
+            self.scan_loop = asyncio.get_running_loop()
+            self.scan_stop = asyncio.Event()
+            started.set()
+            await self.ble_source.run(self.on_advertisement, self.scan_stop)
+
+        self.scan_thread = threading.Thread(target=lambda: asyncio.run(scan_forever()), daemon=True)
+        self.scan_thread.start()
+        started.wait()
+        print(f"[{self.station_id}] Continuous BLE scanning started")
+
+    def stop_scanning(self):
+        if self.scan_thread is None:
+            return
+        self.scan_loop.call_soon_threadsafe(self.scan_stop.set)
+        self.scan_thread.join()
+        self.scan_thread = None
+
+    def on_advertisement(self, name, rssi, timestamp=None):
+        if not name:
+            return
+        with self.rssi_lock:
+            self.rssi.update(name, rssi, timestamp)
+        self.detect_master(name)
+
+    def detect_master(self, name):
+        if not self.known_master and name.startswith("MASTER_"):
+            master_id = name.replace("MASTER_", "")
+            print(f"[{self.station_id}] Detected master: {master_id}")
+            self.known_master = master_id
+
     def scan_ble(self):
         print(f"[{self.station_id}] Scanning BLE devices...")
         self.neighbors = asyncio.run(BleakScanner.discover(timeout=10))
-        if not self.known_master:
-            for device in self.neighbors:
-                if device.name and device.name.startswith("MASTER_"):
-                    master_id = device.name.replace("MASTER_", "")
-                    print(f"[{self.station_id}] Detected master: {master_id}")
-                    self.known_master = master_id
-                    break
+        for device in self.neighbors:
+            self.on_advertisement(device.name, device.rssi)
 
     def advertise_ble_name(self):
         if self.is_master:
@@ -52,24 +100,27 @@ class StationNode:
             advertise_name = f"NODE_{self.station_id}"
         print(f"[{self.station_id}] Simulating BLE advertising as: {advertise_name}")
 
+    def neighbor_table(self):
+        """Smoothed distance and its variance for every device heard recently."""
+        with self.rssi_lock:
+            devices = self.rssi.snapshot()
+        data = []
+        for name, stats in devices.items():
+            dist = self.estimate_distance(stats.mean)
+            data.append({
+                "id": name,
+                "dist": dist,
+                "var": round(distance_variance(dist, stats.variance), 4)
+            })
+        return data
+
     def publish_neighbors(self):
         if self.is_master or not self.known_master:
             return
 
-        data = []
-        for device in self.neighbors:
-            if device.name:
-                dist = self.estimate_distance(device.rssi)
-                data.append({
-                    "id": device.name,
-                    "dist": dist,
-                    "var": 0.05
-                })
-
-        payload = json.dumps({
-            "from": self.station_id,
-            "data": data
-        })
+        data = self.neighbor_table()
+
+        payload = encode_neighbors(self.station_id, data, self.payload_format)
         topic = f"station/{self.known_master}/neighbors"
         self.client.publish(topic, payload)
         print(f"[{self.station_id}] Sent neighbors to master {self.known_master}: {data}")
@@ -0,0 +1,225 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+
+class StreamClient:
+    """A subscriber's place in a StreamHub: the last sequence number it was sent."""
+
+    def __init__(self, cursor, initial):
+        self.cursor = cursor
+        self.initial = initial  # frames to send before the live ones (replay or fresh state)
+
+
+class StreamHub:
+    """
+    Fan-out of live change events to any number of stream subscribers.
+
+    publish() serializes an event once, as a ready-to-send Server-Sent
+    Events frame, into one shared ring buffer of the last `buffer_size`
+    events. A subscriber is only a cursor into that buffer, so publishing
+    costs the same for one subscriber or thousands; its bounded queue is
+    the window between its cursor and the newest event, and a subscriber
+    more than `max_lag` events behind is evicted (poll returns None) rather
+    than holding memory or slowing the others.
+
+    Every frame carries an id "<epoch>-<seq>" that a client sends back
+    (Last-Event-ID or ?since=) to resume after a disconnect: the missed
+    events are replayed while they are still buffered, otherwise, or when
+    the token comes from another hub instance, the client first gets
+    fresh state from `snapshot()`, a list of (event, data) pairs.
+    """
+
+    def __init__(self, buffer_size=1024, max_lag=256, snapshot=None):
+        self.buffer_size = buffer_size
+        self.max_lag = min(max_lag, buffer_size)
+        self.snapshot = snapshot or (lambda: [])
+        self.epoch = f"{time.time_ns():x}"
+        self.seq = 0
+        self.frames = deque(maxlen=buffer_size)  # frames of events seq - len + 1 .. seq
+        self.condition = threading.Condition()
+        self.listeners = []  # called after every publish, e.g. to wake an event loop
+        self.clients = 0
+        self.evicted = 0
+
+    def token(self, seq):
+        return f"{self.epoch}-{seq}"
+
+    def _frame(self, seq, event, data):
+        return f"id: {self.token(seq)}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+    def publish(self, event, data):
+        with self.condition:
+            self.seq += 1
+            self.frames.append(self._frame(self.seq, event, data))
+            self.condition.notify_all()
+        for listener in self.listeners:
+            listener()
+
+    def open(self, token=None):
+        """New subscriber resuming after `token` when it still can, from fresh state otherwise."""
+        with self.condition:
+            self.clients += 1
+            seq = self._parse_token(token)
+            if seq is not None and 0 <= self.seq - seq <= min(self.max_lag, len(self.frames)):
+                return StreamClient(seq, [])
+            cursor = self.seq
+        # Events published while the snapshot is taken are sent again after
+        # it; they carry their own sequence numbers, so clients drop repeats
+        return StreamClient(cursor, [self._frame(cursor, event, data) for event, data in self.snapshot()])
+
+    def close(self, client):
+        with self.condition:
+            self.clients -= 1
+
+    def _parse_token(self, token):
+        if not token:
+            return None
+        epoch, _, seq = token.rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def poll(self, client):
+        """Frames for `client` since its last poll; None when it fell too far behind and is evicted."""
+        frames, client.initial = client.initial, []
+        with self.condition:
+            lag = self.seq - client.cursor
+            if lag > self.max_lag:
+                self.evicted += 1
+                return None
+            if lag:
+                frames += list(itertools.islice(reversed(self.frames), lag))[::-1]
+                client.cursor = self.seq
+        return frames
+
+    def wait(self, client, timeout=None):
+        """Blocks until there is something newer than the client's cursor; False on timeout."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.seq != client.cursor, timeout)
+
+
+EVICTED_FRAME = b"event: evicted\ndata: {}\n\n"
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+def sse_token(headers, query):
+    """Resume token of a stream request: the Last-Event-ID header or the `since` parameter."""
+    return headers.get("last-event-id") or (query.get("since") or [None])[0]
+
+
+class SseServer:
+    """
+    Asyncio Server-Sent Events endpoint (GET /stream) for a StreamHub,
+    for many long-lived subscribers: an idle one costs a coroutine and a
+    socket, not a thread. Runs its own event loop in a background thread
+    next to the Flask app.
+
+    A subscriber whose socket stays unwritable for `write_timeout` seconds,
+    or that falls more than the hub's max_lag behind, gets an "evicted"
+    event (when possible) and is disconnected.
+    """
+
+    def __init__(self, hub, host="0.0.0.0", port=5001, heartbeat=15.0, write_timeout=10.0):
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.write_timeout = write_timeout
+        self.loop = None
+        self.changed = None
+        self.stopping = None
+        self.thread = None
+        self.tasks = set()  # subscriber handlers, finished before the loop shuts down
+        self.started = threading.Event()
+
+    def _wake(self):
+        # One event per publish wakes every waiting subscriber at once
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        return method, urlsplit(target), headers
+
+    async def _send(self, writer, data):
+        writer.write(data)
+        await asyncio.wait_for(writer.drain(), self.write_timeout)
+
+    async def handle(self, reader, writer):
+        client = None
+        self.tasks.add(asyncio.current_task())
+        try:
+            method, url, headers = await asyncio.wait_for(self._read_request(reader), self.write_timeout)
+            if method != "GET" or url.path != "/stream":
+                await self._send(writer, b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            client = self.hub.open(sse_token(headers, parse_qs(url.query)))
+            await self._send(writer, b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                                     b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n"
+                                     b"Access-Control-Allow-Origin: *\r\n\r\n")
+            while not self.stopping.is_set():
+                changed = self.changed
+                frames = self.hub.poll(client)
+                if frames is None:
+                    await self._send(writer, EVICTED_FRAME)
+                    return
+                if frames:
+                    await self._send(writer, b"".join(frames))
+                    continue
+                try:
+                    await asyncio.wait_for(changed.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    await self._send(writer, KEEPALIVE_FRAME)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            pass
+        finally:
+            if client is not None:
+                self.hub.close(client)
+            writer.close()
+            self.tasks.discard(asyncio.current_task())
+
+    def _publish_listener(self):
+        self.loop.call_soon_threadsafe(self._wake)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.changed = asyncio.Event()
+        self.stopping = asyncio.Event()
+        self.hub.listeners.append(self._publish_listener)
+        try:
+            server = await asyncio.start_server(self.handle, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+            self.started.set()
+            async with server:
+                await self.stopping.wait()
+                self._wake()
+                if self.tasks:
+                    await asyncio.wait(list(self.tasks), timeout=self.write_timeout)
+        finally:
+            self.hub.listeners.remove(self._publish_listener)
+
+    def start(self):
+        """Runs the server on its own event loop in a daemon thread; returns once it listens."""
+        self.thread = threading.Thread(target=asyncio.run, args=(self.serve(),), daemon=True)
+        self.thread.start()
+        self.started.wait()
+        return self
+
+    def stop(self):
+        if self.thread:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+            self.thread.join()
+            self.thread = None
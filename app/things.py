@@ -1,10 +1,27 @@
 import numpy as np
 import collections
+import inspect
+import logging
+import os
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt 
+import solvers
+from spatial import SpatialGrid
 
 
-def order_t(id1,id2):
-    return (id1,id2) if id1<id2 else (id2,id1)
+PARALLEL_MIN_POINTS = 200  # below this many points components are solved in-process
+ITERATION_LOG_EVERY = 50   # gradient iterations between two debug log lines
+MULTI_START_STARTS = 4       # descents run by the multistart engine
+MULTI_START_CHUNK = 25       # SMACOF iterations between two pruning rounds
+MULTI_START_PRUNE = 1.5      # starts above this multiple of the best stress are dropped
+MULTI_START_BUDGET = 5.0     # seconds shared by all starts of one solve
+
+log = logging.getLogger(__name__)
+
+_component_pool = None
+
 
 def parse_input_data(raw_data: list[tuple[str, list[tuple[str, float, float]]]]):
     """
@@ -20,155 +37,553 @@ def parse_input_data(raw_data: list[tuple[str, list[tuple[str, float, float]]]])
         - point_ids_list (list): Sorted list of unique point IDs.
         - id_to_idx (dict): Mapping from point ID to integer index.
         - idx_to_id (dict): Mapping from integer index to point ID.
-        - measurements (dict): {(idx1, idx2): (avg_distance, avg_variance)}
-                               for unique pairs of point indices.
+        - measurements (solvers.EdgeList): Sparse edge list with one entry
+                               (idx1 < idx2, avg_distance, avg_variance) per
+                               unique measured pair of point indices.
     """
-    all_point_ids = set()
-    temp_measurements = collections.defaultdict(list)
-
-    for source_id, connections in raw_data:
-        all_point_ids.add(source_id)
-        for target_id, dist, var in connections:
-            all_point_ids.add(target_id)
-            
-            pair_key = order_t(source_id, target_id)
-            temp_measurements[pair_key].append((dist, var))
-
-    point_ids_list = sorted(list(all_point_ids))
+    readings = [(source_id, target_id, dist, var)
+                for source_id, connections in raw_data for target_id, dist, var in connections]
+    point_ids_list = sorted({source_id for source_id, _ in raw_data} | {r[1] for r in readings})
     if len(point_ids_list) == 0:
-        return [], {}, {}, {}
-        
+        return [], {}, {}, solvers.EdgeList([], [], [], [])
+
     id_to_idx = {pid: i for i, pid in enumerate(point_ids_list)}
     idx_to_id = {i: pid for i, pid in enumerate(point_ids_list)}
 
-    measurements = {}
-    for (p_id1, p_id2), data_list in temp_measurements.items():
-        
-        avg_dist = np.mean([d for d, _ in data_list])
-        avg_var = np.mean([v for _, v in data_list])
-        
-        idx1, idx2 = id_to_idx[p_id1], id_to_idx[p_id2]
-        measurements[tuple(sorted((idx1, idx2)))] = (avg_dist, avg_var)
-        
+    # Only the interning is per reading, the per-pair averaging is vectorized
+    sources = np.fromiter((id_to_idx[r[0]] for r in readings), dtype=np.int64, count=len(readings))
+    targets = np.fromiter((id_to_idx[r[1]] for r in readings), dtype=np.int64, count=len(readings))
+    values = np.array([(r[2], r[3]) for r in readings], dtype=float).reshape(-1, 2)
+    measurements = solvers.aggregate_readings(sources, targets, values[:, 0], values[:, 1], len(point_ids_list))
     return point_ids_list, id_to_idx, idx_to_id, measurements
 
+def _parsed(input_structure):
+    """parse_input_data's result for raw input; an already parsed input (e.g. from measurements.Readings.parse) as is."""
+    if isinstance(input_structure, tuple) and len(input_structure) == 4 and isinstance(input_structure[3], solvers.EdgeList):
+        return input_structure
+    return parse_input_data(input_structure)
+
 def weigth(dist_need,distance,variance):
     return dist_need #/ (variance+1) / (distance+1)
 
-def step(points,distances,variances,step_size):
-    # new_points = np.zeros(points.shape)
-    avg_weight = 0
-    nn = 0
-    for i in range(2,points.shape[0]):
-        point = points[i]
-        
-        attraction = np.zeros(2)
-        for j in range(points.shape[0]):
-            if i == j:
-                continue
-            dist = distances[i,j]
-            if dist == 0:
+def step(points,edges,step_size):
+    """
+    Moves every non-anchor point along the sum of its pairwise attractions.
+
+    The first two points are anchors and never move. Only the measured pairs
+    in `edges` (a solvers.EdgeList) are visited, each one pulling on both of
+    its points, so a step costs O(edges) instead of O(N^2).
+
+    Returns:
+        The updated points and the mean absolute weight over measured pairs.
+    """
+    num_points = points.shape[0]
+    diff_p = points[edges.cols] - points[edges.rows]
+    cur_dist = np.linalg.norm(diff_p, axis=1)
+    weights = weigth(cur_dist - edges.dists, edges.dists, edges.variances)
+
+    if np.any(weights > 1000):
+        print(f"Warning: large weight {weights.max()}")
+    pull = weights[:, np.newaxis] * diff_p
+    attraction = np.empty_like(points)
+    for dim in range(points.shape[1]):
+        attraction[:, dim] = (np.bincount(edges.rows, pull[:, dim], minlength=num_points)
+                              - np.bincount(edges.cols, pull[:, dim], minlength=num_points))
+    attraction[:2] = 0
+
+    new_points = points + step_size * attraction
+
+    # Each pair counts once per free (non-anchor) endpoint
+    free_ends = (edges.rows >= 2).astype(int) + (edges.cols >= 2)
+    nn = free_ends.sum()
+    return new_points , np.sum(np.abs(weights) * free_ends) / nn if nn > 0 else 0
+
+def place_new_point(neighbor_coords, neighbor_dists, num_refinements=10):
+    """
+    Initial guess for a point that has no previous position, from the
+    positions of its already placed measured neighbors.
+
+    Starts at the neighbors' centroid (slightly jittered so a single neighbor
+    still gives a direction) and moves to the point that best agrees with the
+    measured distances to every neighbor.
+    """
+    point = neighbor_coords.mean(axis=0) + (np.random.rand(2) - 0.5) * 0.1 * np.mean(neighbor_dists)
+    for _ in range(num_refinements):
+        diff_p = point - neighbor_coords
+        cur_dist = np.maximum(np.linalg.norm(diff_p, axis=1), 1e-9)
+        point = np.mean(neighbor_coords + diff_p * (neighbor_dists / cur_dist)[:, np.newaxis], axis=0)
+    return point
+
+def initial_points(num_total_points, idx_to_id, measurements, initial_positions=None):
+    """
+    Builds the starting configuration of the solver.
+
+    Without `initial_positions` this is the cold start: random points with the
+    anchors at (0, 0) and (d, 0). With `initial_positions` ({id: (x, y)}, e.g.
+    the previous solve) known points keep their previous coordinates, new
+    points are placed from their measured neighbors, and the second anchor is
+    only moved along its current direction to match the measured anchor
+    distance. Ids missing from `idx_to_id` are ignored.
+    """
+    avg_dist = measurements.dists.mean() if len(measurements) else 1.0
+    points = np.random.rand(num_total_points, 2) * avg_dist
+
+    placed = np.zeros(num_total_points, dtype=bool)
+    if initial_positions:
+        for i in range(num_total_points):
+            if idx_to_id[i] in initial_positions:
+                points[i] = initial_positions[idx_to_id[i]]
+                placed[i] = True
+
+    anchor_pair = measurements.pair(0, 1)
+    if not placed.any():
+        points[0] = np.array([0,0])
+        if num_total_points > 1 and anchor_pair:
+            points[1] = np.array([anchor_pair[0],0])
+        return points
+
+    indptr, indices, dists = measurements.to_csr(num_total_points)
+
+    # Place new points breadth-first from the known ones, so a chain of new
+    # stations still gets positions next to the stations it was measured from
+    pending = collections.deque(i for i in range(num_total_points) if placed[i])
+    while pending:
+        i = pending.popleft()
+        for j in indices[indptr[i]:indptr[i + 1]]:
+            if placed[j]:
                 continue
-            other_point = points[j]
-            diff_p = other_point - point
-            
-            cur_dist = np.linalg.norm(diff_p)
-            
-            dist_need = cur_dist - dist
-            
-            attraction += (other_point - point) * weigth(dist_need,dist,variances[i,j])
-            if weigth(dist_need,dist,variances[i,j]) > 1000:
-                print(f"Warning: large weight {weigth(dist_need,dist,variances[i,j])}")
-            avg_weight += abs(weigth(dist_need,dist,variances[i,j]))
-            nn += 1
-        points[i] = point + step_size * attraction
-        
-    return points , avg_weight / nn if nn > 0 else 0
-def calculate_positions(point_ids_list, idx_to_id, measurements):
+            neighbors = indices[indptr[j]:indptr[j + 1]]
+            known = placed[neighbors]
+            points[j] = place_new_point(points[neighbors[known]], dists[indptr[j]:indptr[j + 1]][known])
+            placed[j] = True
+            pending.append(j)
+
+    if num_total_points > 1 and anchor_pair:
+        direction = points[1] - points[0]
+        norm = np.linalg.norm(direction)
+        direction = direction / norm if norm > 0 else np.array([1.0, 0.0])
+        points[1] = points[0] + direction * anchor_pair[0]
+    return points
+
+def place_in_frame(points, idx_to_id, initial_positions=None):
+    """
+    Moves a solution that is only defined up to a rigid motion onto the
+    previous positions when there are at least two of them, or else into the
+    anchor frame (first point at the origin, second on the x axis).
+    """
+    if initial_positions:
+        known = np.array([idx_to_id[i] in initial_positions for i in range(points.shape[0])])
+        if known.sum() >= 2:
+            reference = np.array([initial_positions[idx_to_id[i]] if known[i] else (0.0, 0.0)
+                                  for i in range(points.shape[0])], dtype=float)
+            return solvers.align_to_reference(points, reference, known)
+    return solvers.align_to_anchors(points)
+
+def gradient_engine(point_ids_list, idx_to_id, measurements, initial_positions=None,
+                    max_iterations=500, tolerance=1e-4, patience=10):
+    """
+    The original relaxation solver: repeated `step`s with an adaptive
+    learning rate, keeping the first two points fixed as anchors.
+
+    Args:
+        max_iterations: Upper bound on the number of steps.
+        tolerance: Stops once the mean weight changes by less than this
+                   fraction between iterations for `patience` iterations
+                   in a row.
+
+    Returns:
+        The solved points (array indexed like point_ids_list) and the number
+        of iterations run.
+    """
     num_total_points = len(point_ids_list)
-    
-    if num_total_points == 0:
-        return {}
-    
-    dist_mat = np.zeros((num_total_points, num_total_points))
-    var_mat = np.zeros((num_total_points, num_total_points))
-    
-    for (idx1, idx2), (dist, var) in measurements.items():
-        dist_mat[idx1, idx2] = dist
-        dist_mat[idx2, idx1] = dist
-        var_mat[idx1, idx2] = var
-        var_mat[idx2, idx1] = var
-        
-    avg_dist = np.mean(dist_mat)
-    points = np.random.rand(num_total_points, 2) * avg_dist
-    
-    points[0] = np.array([0,0])
-    if num_total_points > 1:
-        d = measurements[(0,1)][0]
-        points[1] = np.array([d,0])
+    points = initial_points(num_total_points, idx_to_id, measurements, initial_positions)
 
     lr = 0.01
     prev_weight = 1e9
-    for i in range(500):
-        print(f"Iteration {i} , learning rate {lr} , weight {prev_weight}")
-        points , avg_weight = step(points,dist_mat,var_mat,lr)
+    prev_points = points
+    stalled = 0
+    iterations = 0
+    for i in range(max_iterations):
+        if i % ITERATION_LOG_EVERY == 0:
+            log.debug("Iteration %d , learning rate %g , weight %g", i, lr, prev_weight)
+        iterations = i + 1
+        new_points , avg_weight = step(points,measurements,lr)
+        if not np.isfinite(avg_weight) or avg_weight > prev_weight*1.01:
+            # The last move overshot: take a third of it and slow down
+            lr /= 3
+            points = prev_points + (points - prev_points) / 3
+            continue
         if avg_weight < 1e-6:
             break
-        if avg_weight > prev_weight*1.01:
-            lr /= 3
-        elif avg_weight < prev_weight:
+        stalled = stalled + 1 if abs(prev_weight - avg_weight) <= tolerance * prev_weight else 0
+        if stalled >= patience:
+            break
+        if avg_weight < prev_weight:
             lr *= 1.1
         prev_weight = avg_weight
-        
-    
+        prev_points, points = points, new_points
+
+    return points, iterations
+
+def mds_engine(point_ids_list, idx_to_id, measurements, initial_positions=None):
+    """
+    Classical MDS on the shortest-path completed distances. A single
+    closed-form pass: cheap and free of local minima, but it ignores the
+    variances and bends paths that are not straight, so it is mostly useful
+    as an initializer.
+    """
+    points = solvers.classical_mds(len(point_ids_list), measurements)
+    return place_in_frame(points, idx_to_id, initial_positions), 1
+
+def smacof_engine(point_ids_list, idx_to_id, measurements, initial_positions=None,
+                  max_iterations=300, tolerance=1e-5):
+    """
+    Weighted SMACOF stress majorization, weighting every measured pair by the
+    inverse of its variance. Starts from the previous positions when given
+    (see initial_points) and from classical MDS otherwise.
+    """
+    num_total_points = len(point_ids_list)
+    if initial_positions:
+        points = initial_points(num_total_points, idx_to_id, measurements, initial_positions)
+    else:
+        points = solvers.classical_mds(num_total_points, measurements)
+    points, iterations = solvers.smacof(points, measurements, solvers.edge_weights(measurements.variances),
+                                        max_iterations, tolerance)
+    return place_in_frame(points, idx_to_id, initial_positions), iterations
+
+def _descend(points, measurements, weights, iterations, tolerance):
+    points, done = solvers.smacof(points, measurements, weights, iterations, tolerance)
+    return points, done, solvers.stress(points, measurements, weights)
+
+def multistart_engine(point_ids_list, idx_to_id, measurements, initial_positions=None,
+                      starts=MULTI_START_STARTS, time_budget=MULTI_START_BUDGET, seed=None,
+                      prune_ratio=MULTI_START_PRUNE, chunk_iterations=MULTI_START_CHUNK,
+                      max_iterations=300, tolerance=1e-5, parallel_min_points=PARALLEL_MIN_POINTS):
+    """
+    SMACOF from several starting configurations, keeping the lowest stress,
+    so a single start that lands in a folded or mirrored local minimum
+    (common on near-collinear lines) does not decide the layout.
+
+    The first start is the one smacof_engine would use; a warm start is
+    followed by classical MDS, which does not fold lines, and the remaining
+    starts are random configurations drawn from `seed` (independent streams
+    per start, so a fixed seed reproduces the result). The starts descend in rounds of
+    `chunk_iterations`; after every round the ones whose stress exceeds
+    `prune_ratio` times the best are dropped. With a `time_budget` (seconds,
+    None for no limit) the first round runs a single iteration to time one,
+    and later rounds are shortened to what the remaining budget allows, so
+    a round does not run far past it (a budget that cuts in makes the
+    result depend on timing). With at least
+    `parallel_min_points` points the rounds run on component_pool(),
+    unless this already is a pool worker.
+
+    Returns:
+        The points of the best start and the iterations run across all starts.
+    """
+    num_total_points = len(point_ids_list)
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    candidates = [solvers.classical_mds(num_total_points, measurements)]
+    if initial_positions:
+        candidates.insert(0, initial_points(num_total_points, idx_to_id, measurements, initial_positions))
+    scale = (measurements.dists.mean() if len(measurements) else 1.0) * np.sqrt(num_total_points)
+    candidates += [np.random.default_rng(child).random((num_total_points, 2)) * scale
+                   for child in np.random.SeedSequence(seed).spawn(max(starts - len(candidates), 0))]
+    candidates = candidates[:max(starts, 1)]
+    weights = solvers.edge_weights(measurements.variances)
+    stresses = [solvers.stress(points, measurements, weights) for points in candidates]
+
+    pool = None
+    if len(candidates) > 1 and num_total_points >= parallel_min_points and multiprocessing.parent_process() is None:
+        pool = component_pool()
+
+    active = list(range(len(candidates)))
+    done = [0] * len(candidates)
+    total_iterations = 0
+    seconds_per_iteration = None  # wall time of one iteration of a round, measured once a budget applies
+    while active and (deadline is None or time.perf_counter() < deadline):
+        chunk = chunk_iterations
+        if deadline is not None:
+            remaining = deadline - time.perf_counter()
+            chunk = 1 if seconds_per_iteration is None else \
+                max(1, min(chunk_iterations, int(remaining / seconds_per_iteration)))
+        jobs = [(candidates[i], measurements, weights, min(chunk, max_iterations - done[i]), tolerance)
+                for i in active]
+        round_start = time.perf_counter()
+        if pool is not None:
+            rounds = [future.result() for future in [pool.submit(_descend, *job) for job in jobs]]
+        else:
+            rounds = [_descend(*job) for job in jobs]
+        measuring = deadline is not None and seconds_per_iteration is None
+        seconds_per_iteration = (time.perf_counter() - round_start) / max(max(r[1] for r in rounds), 1)
+
+        still_running = []
+        for i, (points, iterations, cur_stress), job in zip(active, rounds, jobs):
+            candidates[i], stresses[i] = points, cur_stress
+            done[i] += iterations
+            total_iterations += iterations
+            if iterations == job[3] and done[i] < max_iterations:
+                still_running.append(i)
+        best = min(stresses)
+        if measuring:
+            # One iteration says little about where a start ends up
+            active = still_running
+            continue
+        active = [i for i in still_running if stresses[i] <= best * prune_ratio or stresses[i] == best]
+        log.debug("Multi-start round: best stress %g, %d of %d starts running", best, len(active), len(candidates))
+
+    best = int(np.argmin(stresses))
+    return place_in_frame(candidates[best], idx_to_id, initial_positions), total_iterations
+
+def line_engine(point_ids_list, idx_to_id, measurements, initial_positions=None):
+    """
+    Places every point on a straight line (see solvers.line_coordinates):
+    near-linear time, for plants whose lines are essentially 1-D and only
+    need an order and the distances along it.
+    """
+    coords, iterations = solvers.line_coordinates(len(point_ids_list), measurements)
+    points = np.c_[coords, np.zeros_like(coords)]
+    return place_in_frame(points, idx_to_id, initial_positions), max(iterations, 1)
+
+SOLVER_ENGINES = {
+    "gradient": gradient_engine,
+    "mds": mds_engine,
+    "smacof": smacof_engine,
+    "multistart": multistart_engine,
+    "line": line_engine,
+}
+
+def solve_positions(point_ids_list, idx_to_id, measurements, initial_positions=None, engine="gradient",
+                    engine_options=None):
+    """
+    Solves the point coordinates from the pairwise measurements with one of
+    the SOLVER_ENGINES.
+
+    Args:
+        initial_positions: Optional {id: (x, y)} used as a warm start (see
+                           initial_points), typically the previous solution.
+        engine: Key of SOLVER_ENGINES.
+        engine_options: Optional keyword arguments of the engine, e.g.
+                        {"seed": 7} for multistart_engine.
+
+    Returns:
+        A tuple ({id: np.array([x, y])}, solvers.SolveReport).
+    """
+    if engine not in SOLVER_ENGINES:
+        raise ValueError(f"Unknown solver engine '{engine}', expected one of {sorted(SOLVER_ENGINES)}")
+    engine_options = engine_options or {}
+    unknown = set(engine_options) - set(inspect.signature(SOLVER_ENGINES[engine]).parameters)
+    if unknown:
+        raise ValueError(f"Unknown options {sorted(unknown)} for solver engine '{engine}'")
+
+    num_total_points = len(point_ids_list)
+    if num_total_points == 0:
+        return {}, solvers.SolveReport(engine, 0, 0, 0.0, 0.0)
+
+    start = time.perf_counter()
+    points, iterations = SOLVER_ENGINES[engine](point_ids_list, idx_to_id, measurements, initial_positions,
+                                                **engine_options)
+    wall_time = time.perf_counter() - start
+
+    final_stress = solvers.stress(points, measurements, solvers.edge_weights(measurements.variances))
+    report = solvers.SolveReport(engine, num_total_points, iterations, final_stress, wall_time)
+
     results = {}
     for i in range(num_total_points):
         results[idx_to_id[i]] = points[i]
     
+    return results, report
+
+def calculate_positions(point_ids_list, idx_to_id, measurements, initial_positions=None, engine="gradient",
+                        engine_options=None):
+    """
+    Solves the point coordinates from the pairwise measurements, see
+    solve_positions. Returns {id: np.array([x, y])}.
+    """
+    results, _ = solve_positions(point_ids_list, idx_to_id, measurements, initial_positions, engine, engine_options)
     return results
 
-def build_graph(positions_dict):
+def split_components(point_ids_list, measurements):
+    """
+    Splits the measurements into their connected components, which can be
+    solved independently: stations that never hear each other have no
+    meaningful relative placement.
+
+    Each component gets its own anchor pair at local indices 0 and 1: its
+    lowest point index and that point's lowest-index measured neighbor.
+
+    Returns:
+        A list of (point_ids_list, idx_to_id, solvers.EdgeList) in local
+        indices, one per component.
+    """
+    num_points = len(point_ids_list)
+    labels = solvers.connected_components(num_points, measurements)
+    indptr, indices, _ = measurements.to_csr(num_points)
+
+    edge_labels = labels[measurements.rows]
+    edge_order = np.argsort(edge_labels, kind="stable")
+    edge_bounds = np.zeros(labels.max() + 2, dtype=np.int64)
+    np.cumsum(np.bincount(edge_labels, minlength=labels.max() + 1), out=edge_bounds[1:])
+    point_order = np.argsort(labels, kind="stable")
+    point_bounds = np.zeros(labels.max() + 2, dtype=np.int64)
+    np.cumsum(np.bincount(labels), out=point_bounds[1:])
+
+    local_index = np.empty(num_points, dtype=np.int64)
+    components = []
+    for label in range(labels.max() + 1):
+        members = point_order[point_bounds[label]:point_bounds[label + 1]]
+        if len(members) > 1:
+            second = indices[indptr[members[0]]:indptr[members[0] + 1]].min()
+            members = np.concatenate([members[:1], [second], members[1:][members[1:] != second]])
+        local_index[members] = np.arange(len(members))
+
+        edges = edge_order[edge_bounds[label]:edge_bounds[label + 1]]
+        rows, cols = local_index[measurements.rows[edges]], local_index[measurements.cols[edges]]
+        component_edges = solvers.EdgeList(np.minimum(rows, cols), np.maximum(rows, cols),
+                                           measurements.dists[edges], measurements.variances[edges])
+        ids = [point_ids_list[i] for i in members]
+        components.append((ids, dict(enumerate(ids)), component_edges))
+    return components
+
+def _solve_component(point_ids_list, idx_to_id, measurements, initial_positions, engine, engine_options):
+    return solve_positions(point_ids_list, idx_to_id, measurements, initial_positions, engine, engine_options)
+
+def component_pool():
+    """
+    Process pool shared by the component solves, created on first use.
+    Workers come from a forkserver: the master forks them while its MQTT
+    and scheduler threads hold locks, which a plain fork would copy.
+    """
+    global _component_pool
+    if _component_pool is None:
+        _component_pool = ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                              mp_context=multiprocessing.get_context("forkserver"))
+    return _component_pool
+
+def shutdown_component_pool():
+    """Stops the component_pool() workers; the next use starts a new pool."""
+    global _component_pool
+    if _component_pool is not None:
+        _component_pool.shutdown(wait=True, cancel_futures=True)
+        _component_pool = None
+
+def solve_components(point_ids_list, measurements, initial_positions=None, engine="gradient",
+                     parallel_min_points=PARALLEL_MIN_POINTS, engine_options=None):
+    """
+    Solves every connected component (see split_components) on its own and
+    in its own frame. With several components and at least
+    `parallel_min_points` points in total they are fanned out over
+    component_pool(), so the wall time follows the largest component.
+    `engine_options` are passed to every component's solve_positions.
+
+    Returns:
+        A tuple ({id: np.array([x, y])}, solvers.SolveReport, components)
+        where the report covers all components and the stress is measured
+        on `measurements` as a whole.
+    """
+    start = time.perf_counter()
+    components = split_components(point_ids_list, measurements)
+    jobs = []
+    for ids, idx_to_id, edges in components:
+        known = {pid: initial_positions[pid] for pid in ids if pid in initial_positions} if initial_positions else None
+        jobs.append((ids, idx_to_id, edges, known, engine, engine_options))
+
+    if len(components) > 1 and len(point_ids_list) >= parallel_min_points:
+        pool = component_pool()
+        solved = [future.result() for future in [pool.submit(_solve_component, *job) for job in jobs]]
+    else:
+        solved = [_solve_component(*job) for job in jobs]
+
+    results = {}
+    for component_results, _ in solved:
+        results.update(component_results)
+    points = np.array([results[pid] for pid in point_ids_list], dtype=float)
+    final_stress = solvers.stress(points, measurements, solvers.edge_weights(measurements.variances))
+    report = solvers.SolveReport(engine, len(point_ids_list), max(r.iterations for _, r in solved),
+                                 final_stress, time.perf_counter() - start)
+    return results, report, components
+
+def order_lines(input_structure, previous=None):
+    """
+    Left-to-right order of the stations of every line (connected component
+    of the measurements), from the same input as
+    solve_point_positions_and_graph (raw or parsed), without a 2-D solve.
+
+    Each line is placed along one axis (solvers.line_coordinates). Distances
+    cannot tell left from right, so the orientation is kept consistent
+    instead: a line that shares at least two stations with `previous` (an
+    earlier result of order_lines) keeps that result's direction, otherwise
+    its end with the lower station id is on the left.
+
+    Returns:
+        {"lines": [[ids left to right], ...],
+         "stations": {id: {"line", "order", "offset", "left", "right"}}}
+        with `offset` in metres from the left end and `left`/`right` the
+        adjacent station ids (None at the ends).
+    """
+    previous = (previous or {}).get("stations", {})
+    point_ids_list, _, _, measurements = _parsed(input_structure)
+    lines, stations = [], {}
+    if not point_ids_list:
+        return {"lines": lines, "stations": stations}
+
+    for ids, _, edges in split_components(point_ids_list, measurements):
+        coords, _ = solvers.line_coordinates(len(ids), edges)
+        known = [i for i, pid in enumerate(ids) if pid in previous]
+        if len(known) >= 2:
+            before = np.array([previous[ids[i]]["offset"] for i in known])
+            now = coords[known]
+            flip = np.dot(now - now.mean(), before - before.mean()) < 0
+        else:
+            ends = np.argsort(coords, kind="stable")[[0, -1]]
+            flip = ids[ends[0]] > ids[ends[1]]
+        if flip:
+            coords = -coords
+        coords = coords - coords.min()
+
+        order = np.lexsort((np.arange(len(ids)), coords))
+        line = [ids[i] for i in order]
+        for rank, i in enumerate(order):
+            stations[ids[i]] = {
+                "line": len(lines),
+                "order": rank,
+                "offset": float(coords[i]),
+                "left": line[rank - 1] if rank > 0 else None,
+                "right": line[rank + 1] if rank + 1 < len(line) else None,
+            }
+        lines.append(line)
+    return {"lines": lines, "stations": stations}
+
+def build_graph(positions_dict, k=2):
+    """
+    Connects every point to its `k` closest points (closeness is symmetric,
+    so a point can end up with more than `k` neighbors).
+
+    The nearest points are found through a spatial.SpatialGrid over the
+    solved coordinates instead of comparing every pair.
+
+    Returns:
+        Adjacency dict {id: [neighbor ids]} with every point as a key.
+    """
     point_ids = list(positions_dict.keys())
     num_points = len(point_ids)
 
     if num_points < 2:
         return {pid: [] for pid in point_ids}
 
-    coords_list = [np.array(positions_dict[pid]) for pid in point_ids]
-    
-    unique_edges = set()
+    coords = np.array([positions_dict[pid] for pid in point_ids], dtype=float)
+    nearest, _ = SpatialGrid(coords).knn_all(k)
 
-    for i in range(num_points):
-        p1_id = point_ids[i]
-        p1_coord = coords_list[i]
-        
-        distances_to_others = []
-        for j in range(num_points):
-            if i == j:
-                continue
-            p2_id = point_ids[j]
-            p2_coord = coords_list[j]
-            dist = np.linalg.norm(p1_coord - p2_coord)
-            distances_to_others.append((dist, p2_id))
-        
-        distances_to_others.sort() 
-
-        for k in range(min(2, len(distances_to_others))):
-            neighbor_id = distances_to_others[k][1]
-            edge = frozenset({p1_id, neighbor_id})
-            unique_edges.add(edge)
-
-    adj_list = collections.defaultdict(list)
-    for edge in unique_edges:
-        u, v = list(edge) 
-        adj_list[u].append(v)
-        adj_list[v].append(u)
-        
-    for pid in point_ids: # Ensure all points are keys
-        if pid not in adj_list:
-            adj_list[pid] = []
+    sources = np.repeat(np.arange(num_points), nearest.shape[1])
+    targets = nearest.ravel()
+    found = targets >= 0
+    pairs = np.unique(np.sort(np.c_[sources[found], targets[found]], axis=1), axis=0)
+
+    adj_list = {pid: [] for pid in point_ids}
+    for u, v in pairs:
+        adj_list[point_ids[u]].append(point_ids[v])
+        adj_list[point_ids[v]].append(point_ids[u])
             
-    return dict(adj_list)
+    return adj_list
 
 
 def visualize_graph(positions_dict, graph_adj_list, title="Point Configuration and Graph"):
@@ -213,27 +628,55 @@ def visualize_graph(positions_dict, graph_adj_list, title="Point Configuration a
     plt.show()
 
 # --- Main program flow ---
-def solve_point_positions_and_graph(input_structure, visualize=False): # Added visualize flag
+def solve_point_positions_and_graph(input_structure, visualize=False, initial_positions=None,
+                                    engine="gradient", return_report=False,
+                                    graph_neighbors=2, engine_options=None): # Added visualize flag
     """
     Main function to calculate positions, build the graph, and optionally visualize.
+
+    Each connected component of the measurements is solved independently
+    (see solve_components) and gets its own k-nearest graph.
+
+    `input_structure` may also be the result of parse_input_data (or of
+    measurements.Readings.parse), which is then used as is.
+
+    `initial_positions` ({id: (x, y)}) warm-starts the solver from a previous
+    solution; ids that no longer appear in `input_structure` are dropped.
+    `engine` selects one of SOLVER_ENGINES and `engine_options` are its
+    keyword arguments (see solve_positions); with `return_report` the
+    solvers.SolveReport, including the parse and graph build times, is
+    returned as a third element. `graph_neighbors` is
+    the k of the k-nearest connectivity graph.
     """
-    point_ids_list, id_to_idx, idx_to_id, measurements = parse_input_data(input_structure)
+    start = time.perf_counter()
+    point_ids_list, id_to_idx, idx_to_id, measurements = _parsed(input_structure)
+    parse_time = time.perf_counter() - start
     
     if not point_ids_list:
         print("No points found in input.")
-        return {}, {}
+        empty_report = solvers.SolveReport(engine, 0, 0, 0.0, 0.0)
+        return ({}, {}, empty_report) if return_report else ({}, {})
 
     # print(f"Point IDs: {point_ids_list}")
     # print(f"ID to Index mapping: {id_to_idx}") # Can be verbose
     # print(f"Measurements (by index): {measurements}") # Can be verbose
 
-    absolute_positions = calculate_positions(point_ids_list, idx_to_id, measurements)
+    absolute_positions, report, components = solve_components(point_ids_list, measurements,
+                                                              initial_positions, engine,
+                                                              engine_options=engine_options)
+    report.parse_time = parse_time
     
     print(f"\nCalculated Positions: {absolute_positions}")
+    print(f"Solver: {report} ({len(components)} components)")
     
-    connectivity_graph = build_graph(absolute_positions)
+    # Components are solved in unrelated frames, so they are never linked
+    start = time.perf_counter()
+    connectivity_graph = {}
+    for ids, _, _ in components:
+        connectivity_graph.update(build_graph({pid: absolute_positions[pid] for pid in ids}, graph_neighbors))
+    report.graph_time = time.perf_counter() - start
     
-    print(f"\nConnectivity Graph (2 closest neighbors): {connectivity_graph}")
+    print(f"\nConnectivity Graph ({graph_neighbors} closest neighbors): {connectivity_graph}")
     
     if visualize:
         try:
@@ -243,8 +686,26 @@ def solve_point_positions_and_graph(input_structure, visualize=False): # Added v
         except Exception as e:
             print(f"\nError during visualization: {e}")
 
+    if return_report:
+        return absolute_positions, connectivity_graph, report
     return absolute_positions, connectivity_graph
 
+def compare_engines(input_structure, engines=None):
+    """
+    Solves the same input with every engine and prints their reports, to pick
+    the fastest engine that converges for a given line size.
+
+    Returns:
+        {engine: solvers.SolveReport}
+    """
+    point_ids_list, _, idx_to_id, measurements = parse_input_data(input_structure)
+    reports = {}
+    for engine in engines or SOLVER_ENGINES:
+        _, reports[engine] = solve_positions(point_ids_list, idx_to_id, measurements, engine=engine)
+    for report in reports.values():
+        print(report)
+    return reports
+
 # --- Example Usage ---
 if __name__ == '__main__':
     example_input = [
@@ -282,4 +743,7 @@ if __name__ == '__main__':
     solve_point_positions_and_graph(example_input_single, visualize=True) # Will show one point
 
     print("\n--- Running Three Collinear Points Example ---")
-    solve_point_positions_and_graph(example_input_three_collinear, visualize=True)
\ No newline at end of file
+    solve_point_positions_and_graph(example_input_three_collinear, visualize=True)
+
+    print("\n--- Comparing Solver Engines (Example 2) ---")
+    compare_engines(example_input_2)
\ No newline at end of file
@@ -0,0 +1,196 @@
+import secrets
+import threading
+
+from mqtt_config import MOVE_THRESHOLD, SNAPSHOT_EVERY
+
+
+def graph_edges(graph):
+    """Undirected edges of an adjacency dict as a set of sorted (id, id) tuples."""
+    return {(u, v) if u < v else (v, u) for u, neighbors in graph.items() for v in neighbors if u != v}
+
+
+def new_epoch():
+    """Random u32 identifying one publisher instance, so a restarted one never reuses sequence numbers."""
+    return secrets.randbits(32)
+
+
+def edges_to_graph(nodes, edges):
+    graph = {node_id: [] for node_id in nodes}
+    for u, v in sorted(edges):
+        graph.setdefault(u, []).append(v)
+        graph.setdefault(v, []).append(u)
+    return graph
+
+
+class TopologyPublisher:
+    """
+    Turns successive solves into a stream of snapshots and deltas.
+
+    Every change gets the next sequence number. A change is published as a
+    delta holding only the positions that moved more than `move_threshold`
+    from what subscribers last received, the removed stations and the
+    added/removed edges; every `snapshot_every` changes, or when the delta
+    would not be much smaller than the full state, a full snapshot is sent
+    instead. Positions that move less than the threshold keep accumulating
+    until they cross it, so subscribers never drift further than that.
+
+    Every message carries the publisher's `epoch`, new for every instance
+    and on restore, so subscribers compare sequence numbers within one
+    publisher's lifetime only.
+
+    A publisher restored from a checkpoint (see restore) is `stale`: its
+    snapshots say so, and the next update is always a full snapshot.
+    """
+
+    def __init__(self, move_threshold=MOVE_THRESHOLD, snapshot_every=SNAPSHOT_EVERY, epoch=None):
+        self.move_threshold = move_threshold
+        self.snapshot_every = snapshot_every
+        self.epoch = new_epoch() if epoch is None else epoch
+        self.seq = 0
+        self.positions = {}   # id -> [x, y] as subscribers have them
+        self.edges = set()
+        self.deltas_since_snapshot = 0
+        self.stale = False
+
+    def snapshot(self):
+        """Current state as a snapshot message, without advancing the sequence."""
+        message = {"epoch": self.epoch, "seq": self.seq, "positions": dict(self.positions),
+                   "graph": edges_to_graph(self.positions, self.edges)}
+        if self.stale:
+            message["stale"] = True
+        return message
+
+    def restore(self, positions, edges):
+        """
+        Resumes from a checkpointed state, published as stale until the next
+        update. Subscribers may already hold later sequence numbers than the
+        checkpoint, so the restored state starts a new epoch at seq 1.
+        """
+        self.epoch = new_epoch()
+        self.seq = 1
+        self.positions = {node_id: list(pos) for node_id, pos in positions.items()}
+        self.edges = {tuple(edge) for edge in edges}
+        self.deltas_since_snapshot = 0
+        self.stale = True
+
+    def update(self, positions, graph):
+        """
+        Diffs a new solve against the published state.
+
+        Returns:
+            ("snapshot", message), ("delta", message) or None when no
+            position moved beyond the threshold and the graph is unchanged.
+        """
+        moved = {}
+        for node_id, (x, y) in positions.items():
+            old = self.positions.get(node_id)
+            if old is None or (x - old[0]) ** 2 + (y - old[1]) ** 2 > self.move_threshold ** 2:
+                moved[node_id] = [float(x), float(y)]
+        removed = sorted(set(self.positions) - set(positions))
+        edges = graph_edges(graph)
+        added_edges = sorted(edges - self.edges)
+        removed_edges = sorted(self.edges - edges)
+        if not (moved or removed or added_edges or removed_edges) and self.seq > 0 and not self.stale:
+            return None
+
+        self.seq += 1
+        for node_id in removed:
+            del self.positions[node_id]
+        self.positions.update(moved)
+        self.edges = edges
+
+        change_size = len(moved) + len(removed) + len(added_edges) + len(removed_edges)
+        if (self.seq == 1 or self.stale or self.deltas_since_snapshot + 1 >= self.snapshot_every
+                or change_size > (len(self.positions) + len(self.edges)) // 2):
+            self.deltas_since_snapshot = 0
+            self.stale = False
+            return "snapshot", self.snapshot()
+        self.deltas_since_snapshot += 1
+        return "delta", {"epoch": self.epoch, "seq": self.seq, "moved": moved, "removed": removed,
+                         "added_edges": [list(edge) for edge in added_edges],
+                         "removed_edges": [list(edge) for edge in removed_edges]}
+
+
+class TopologyView:
+    """
+    Subscriber side of the snapshot/delta stream.
+
+    Snapshots replace the state; a delta is applied only on top of the
+    sequence number right before it, in the same epoch. A snapshot from a
+    new epoch (a restarted master) always replaces the state, whatever its
+    sequence number. On a gap, or a delta from another epoch, the view
+    becomes `stale`, ignores deltas, and waits for a snapshot (the caller
+    should ask the master for one, see MasterNode.handle_resync). A
+    snapshot marked stale (the last topology of a restarted master) is
+    shown but keeps the view stale until the master publishes a fresh one.
+
+    The view is shared between the MQTT thread that applies messages and
+    the threads that render it: changes swap in new dicts and sets under a
+    lock (copy on write), and `version` grows with every applied change, so
+    a reader takes state() once and can skip rendering when the version it
+    last drew is still current.
+    """
+
+    def __init__(self):
+        self.epoch = None
+        self.seq = None
+        self.positions = {}
+        self.edges = set()
+        self.stale = True
+        self.version = 0  # bumped on every change (including turning stale), for renderers
+        self.changed = threading.Condition()
+
+    @property
+    def graph(self):
+        return edges_to_graph(*self.state()[1:3])
+
+    def state(self):
+        """Consistent (version, positions, edges, stale); treat the containers as read-only."""
+        with self.changed:
+            return self.version, self.positions, self.edges, self.stale
+
+    def wait_for_change(self, version, timeout=None):
+        """Blocks until the version differs from `version`; returns the current version."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def _publish(self):
+        self.version += 1
+        self.changed.notify_all()
+
+    def apply_snapshot(self, message):
+        positions = {node_id: list(pos) for node_id, pos in message["positions"].items()}
+        edges = graph_edges(message["graph"])
+        with self.changed:
+            epoch = message.get("epoch")
+            if not self.stale and self.seq is not None and epoch == self.epoch and message["seq"] < self.seq:
+                return False
+            self.epoch, self.seq = epoch, message["seq"]
+            self.positions, self.edges = positions, edges
+            self.stale = bool(message.get("stale", False))
+            self._publish()
+            return True
+
+    def apply_delta(self, message):
+        """Applies a delta; returns False when it cannot be applied (gap or stale view)."""
+        with self.changed:
+            same_epoch = message.get("epoch") == self.epoch
+            if same_epoch and self.seq is not None and message["seq"] <= self.seq:
+                return True  # already applied, e.g. redelivered with QoS 1
+            if self.stale or not same_epoch or message["seq"] != self.seq + 1:
+                if not self.stale:
+                    self.stale = True
+                    self._publish()
+                return False
+            # Built in full before anything is replaced, so a malformed delta leaves the view as it was
+            positions = dict(self.positions)
+            for node_id in message["removed"]:
+                positions.pop(node_id, None)
+            positions.update(message["moved"])
+            edges = ((self.edges - {tuple(edge) for edge in message["removed_edges"]})
+                     | {tuple(edge) for edge in message["added_edges"]})
+            self.positions, self.edges = positions, edges
+            self.seq = message["seq"]
+            self._publish()
+            return True
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from spatial import SpatialGrid
+
+KNN_TABLE_SIZE = 16    # nearest stations precomputed per station
+HOP_TABLE_CACHE = 256  # sources whose hop tables are kept, least recently used dropped first
+
+
+class TopologyIndex:
+    """
+    Read-only query structures over one published topology version.
+
+    Built once per version, off the request path:
+      - a SpatialGrid for "within R metres" and "k nearest" queries, plus a
+        table of every station's KNN_TABLE_SIZE nearest stations;
+      - the adjacency lists of the topology graph. Hop counts and BFS
+        predecessors are computed per source on its first hop query and
+        the last HOP_TABLE_CACHE sources are kept, so a repeated query is a
+        walk back through one row and memory stays O(N) per cached source
+        instead of O(N^2).
+
+    The order of the stations along their lines is not derived here: it is
+    the master's (topology/line_order), see line_neighbors.
+    """
+
+    def __init__(self, seq, positions, edges, hop_cache=HOP_TABLE_CACHE):
+        start = time.perf_counter()
+        self.seq = seq
+        self.ids = sorted(positions)
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        num_points = len(self.ids)
+        self.coords = np.array([positions[node_id] for node_id in self.ids], dtype=float).reshape(-1, 2)
+        self.grid = SpatialGrid(self.coords)
+
+        self.knn, self.knn_dists = self.grid.knn_all(min(KNN_TABLE_SIZE, max(num_points - 1, 0)))
+
+        self.adjacency = [[] for _ in range(num_points)]
+        for a, b in edges:
+            if a in self.index and b in self.index and a != b:
+                self.adjacency[self.index[a]].append(self.index[b])
+                self.adjacency[self.index[b]].append(self.index[a])
+        self.dtype = np.uint16 if num_points < np.iinfo(np.uint16).max else np.int32
+        self.unreachable = np.iinfo(self.dtype).max
+        self.hop_cache = hop_cache
+        self.hop_tables = OrderedDict()  # source index -> (hops, pred)
+        self.hop_lock = threading.Lock()
+        self.build_time = time.perf_counter() - start
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, node_id):
+        return node_id in self.index
+
+    def _hop_table(self, source):
+        """Hop counts and BFS predecessors from the station at index `source`."""
+        with self.hop_lock:
+            table = self.hop_tables.get(source)
+            if table is not None:
+                self.hop_tables.move_to_end(source)
+                return table
+        hops, pred = _bfs(self.adjacency, source, len(self.ids), self.unreachable)
+        table = (np.array(hops, dtype=self.dtype), np.array(pred, dtype=self.dtype))
+        with self.hop_lock:
+            self.hop_tables[source] = table
+            while len(self.hop_tables) > self.hop_cache:
+                self.hop_tables.popitem(last=False)
+        return table
+
+    def position(self, node_id):
+        return self.coords[self.index[node_id]].tolist()
+
+    def _results(self, indices, dists):
+        return [{"id": self.ids[i], "distance": float(d)} for i, d in zip(indices, dists)]
+
+    def within(self, point, radius, exclude=None):
+        """Stations within `radius` of a point or station id, nearest first."""
+        if isinstance(point, str):
+            exclude, point = point, self.coords[self.index[point]]
+        indices, dists = self.grid.query_radius(point, radius)
+        return [entry for entry in self._results(indices, dists) if entry["id"] != exclude]
+
+    def nearest(self, point, k):
+        """The k stations nearest to a point, or to a station id (excluding itself)."""
+        if isinstance(point, str):
+            i = self.index[point]
+            if k <= self.knn.shape[1]:
+                found = self.knn[i, :k] >= 0
+                return self._results(self.knn[i, :k][found], self.knn_dists[i, :k][found])
+            indices, dists = self.grid.query_knn(self.coords[i], k + 1)
+            return [entry for entry in self._results(indices, dists) if entry["id"] != point][:k]
+        return self._results(*self.grid.query_knn(point, k))
+
+    def hop_count(self, source, target):
+        """Hops between two stations, None when they are not connected."""
+        hops, _ = self._hop_table(self.index[source])
+        hops = hops[self.index[target]]
+        return None if hops == self.unreachable else int(hops)
+
+    def hop_path(self, source, target):
+        """Stations on a shortest hop path from `source` to `target` (both included), None when not connected."""
+        s, node = self.index[source], self.index[target]
+        hops, pred = self._hop_table(s)
+        if hops[node] == self.unreachable:
+            return None
+        path = [node]
+        while node != s:
+            node = int(pred[node])
+            path.append(node)
+        return [self.ids[i] for i in reversed(path)]
+
+
+def check_line_order(line_order):
+    """Raises ValueError unless `line_order` has the shape of a things.order_lines result."""
+    if not isinstance(line_order, dict):
+        raise ValueError("Line order is not an object")
+    lines, stations = line_order.get("lines"), line_order.get("stations")
+    if not isinstance(lines, list) or not all(isinstance(line, list) for line in lines):
+        raise ValueError("Line order has no list of lines")
+    if not isinstance(stations, dict):
+        raise ValueError("Line order has no stations")
+    for node_id, station in stations.items():
+        try:
+            line, rank = station["line"], station["order"]
+            valid = isinstance(line, int) and isinstance(rank, int) and 0 <= line < len(lines) \
+                and 0 <= rank < len(lines[line]) and lines[line][rank] == node_id
+        except (KeyError, TypeError):
+            valid = False
+        if not valid:
+            raise ValueError(f"Malformed line order entry for {node_id!r}")
+
+
+def line_neighbors(line_order, node_id):
+    """
+    Line of a station and its place along it, from a things.order_lines
+    result (the master's topology/line_order); None when it is not listed.
+    Upstream stations are to its left, nearest first.
+    """
+    station = line_order["stations"].get(node_id)
+    if station is None:
+        return None
+    line, rank = line_order["lines"][station["line"]], station["order"]
+    return {
+        "line": station["line"],
+        "order": rank,
+        "length": len(line),
+        "upstream": line[:rank][::-1],
+        "downstream": line[rank + 1:],
+    }
+
+
+def _bfs(adjacency, source, num_points, unreachable):
+    """Hop counts and predecessors from `source`."""
+    hops = [unreachable] * num_points
+    pred = [unreachable] * num_points
+    hops[source] = 0
+    pred[source] = source
+    frontier = [source]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for u in frontier:
+            for v in adjacency[u]:
+                if hops[v] == unreachable:
+                    hops[v] = depth
+                    pred[v] = u
+                    next_frontier.append(v)
+        frontier = next_frontier
+    return hops, pred
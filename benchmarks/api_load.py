@@ -0,0 +1,66 @@
+# benchmarks/api_load.py
+# Requests per second of the neighbors API before and after the in-memory
+# cache: python benchmarks/api_load.py [stations] [requests]
+import json
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask, jsonify
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import api
+
+def legacy_app(cache_file):
+    """The API as it was before the in-memory cache (JsonFileCache): the file is parsed on every request."""
+    app = Flask("legacy")
+
+    def load_neighbors():
+        if os.path.exists(cache_file):
+            with open(cache_file, "r") as f:
+                return json.load(f)
+        return {}
+
+    @app.route("/neighbors/<station>")
+    def get_neighbors(station):
+        data = load_neighbors()
+        if station in data:
+            return jsonify({"station": station, "left": data[station].get("left"),
+                            "right": data[station].get("right")})
+        return jsonify({"error": "Estação não encontrada"}), 404
+
+    @app.route("/neighbors")
+    def get_all():
+        return jsonify(load_neighbors())
+
+    return app
+
+def requests_per_second(client, path, num_requests, headers=None):
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        client.get(path, headers=headers)
+    return num_requests / (time.perf_counter() - start)
+
+def main(num_stations=200, num_requests=2000):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_file = os.path.join(tmpdir, "neighbors_cache.json")
+        with open(cache_file, "w") as f:
+            json.dump({f"station-{i}": {"left": f"AA:{i:04x}", "right": f"BB:{i:04x}"}
+                       for i in range(num_stations)}, f, indent=2)
+
+        api.neighbor_cache = api.JsonFileCache(cache_file)
+        before = legacy_app(cache_file).test_client()
+        after = api.app.test_client()
+        etag = after.get("/neighbors").headers["ETag"]
+
+        print(f"{num_stations} stations, {num_requests} requests per run")
+        for path in ("/neighbors", "/neighbors/station-7"):
+            print(f"GET {path}")
+            print(f"  before (parse per request): {requests_per_second(before, path, num_requests):8.0f} req/s")
+            print(f"  after (in-memory cache):    {requests_per_second(after, path, num_requests):8.0f} req/s")
+            print(f"  after, If-None-Match (304): "
+                  f"{requests_per_second(after, path, num_requests, {'If-None-Match': etag}):8.0f} req/s")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
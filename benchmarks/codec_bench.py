@@ -0,0 +1,40 @@
+# benchmarks/codec_bench.py
+# Payload size and encode/decode time of the JSON and binary formats of the
+# neighbors and topology topics: python benchmarks/codec_bench.py [stations] [repeats]
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+import codec
+
+def sample_payloads(num_stations, num_neighbors=8, seed=0):
+    rng = random.Random(seed)
+    ids = [f"STATION_{i:04d}" for i in range(num_stations)]
+    neighbors = [{"id": rng.choice(ids), "dist": round(rng.uniform(0.5, 20), 2), "var": round(rng.uniform(0.01, 2), 4)}
+                 for _ in range(num_neighbors)]
+    positions = {pid: [rng.uniform(-100, 100), rng.uniform(-100, 100)] for pid in ids}
+    graph = {pid: rng.sample(ids, 2) for pid in ids}
+    return {
+        "neighbors": lambda fmt: codec.encode_neighbors(ids[0], neighbors, fmt),
+        "snapshot": lambda fmt: codec.encode_snapshot(1, positions, graph, fmt),
+    }
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+def main(num_stations=500, repeats=200):
+    print(f"{num_stations} stations, {repeats} repeats, times in microseconds")
+    print(f"{'payload':<10} {'format':<7} {'bytes':>8} {'encode':>9} {'decode':>9}")
+    for name, encode in sample_payloads(num_stations).items():
+        for fmt in codec.PAYLOAD_FORMATS:
+            payload = encode(fmt)
+            print(f"{name:<10} {fmt:<7} {len(payload):>8} {timed(lambda: encode(fmt), repeats):>9.1f} "
+                  f"{timed(lambda: codec.decode(payload), repeats):>9.1f}")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,237 @@
+# benchmarks/fleet_load.py
+# Load test of MasterNode's ingest path: a simulated fleet of StationNodes on
+# a synthetic plant reports noisy RSSI-derived tables through an in-process
+# broker. Measures ingest throughput, change-to-publish latency and memory,
+# and exits with status 1 when a run regresses past its thresholds:
+#   python benchmarks/fleet_load.py --stations 1000 --baseline fleet_baseline.json
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+from ble import SimulatedAdvertisementSource
+from codec import decode
+from loopback import LoopbackBroker
+from master_node import MasterNode
+from station_node import StationNode
+from topology import TopologyView
+
+MASTER_ID = "MASTER"
+BLE_RANGE = 8.0      # metres a station can hear
+MAX_NEIGHBORS = 8    # stations kept per table, the closest ones
+SAMPLES_PER_REPORT = 5
+
+def plant_layout(num_stations, per_line=25, spacing=3.0, line_gap=12.0, jitter=0.3, seed=0):
+    """Stations along parallel production lines: {station id: (x, y)}."""
+    rng = random.Random(seed)
+    return {f"S{i:05d}": ((i % per_line) * spacing + rng.gauss(0, jitter),
+                          (i // per_line) * line_gap + rng.gauss(0, jitter))
+            for i in range(num_stations)}
+
+def hearing(layout, ble_range=BLE_RANGE, max_neighbors=MAX_NEIGHBORS):
+    """{station: {neighbor: true distance}} for the closest stations within range."""
+    ids = list(layout)
+    coords = np.array([layout[sid] for sid in ids])
+    heard = {}
+    for i, sid in enumerate(ids):
+        dists = np.linalg.norm(coords - coords[i], axis=1)
+        closest = [j for j in np.argsort(dists)[1:max_neighbors + 1] if dists[j] <= ble_range]
+        heard[sid] = {ids[j]: max(float(dists[j]), 0.1) for j in closest}
+    return heard
+
+class SimulatedFleet:
+    """
+    Real StationNodes without BLE or scan threads: each report feeds
+    SAMPLES_PER_REPORT simulated advertisements per neighbor into the node's
+    RSSI tracker and publishes its table through the loopback broker.
+    """
+
+    def __init__(self, broker, layout, noise_db=2.0, payload_format="json", seed=0):
+        self.broker = broker
+        self.layout = dict(layout)
+        self.nodes = {}
+        self.sources = {}
+        for k, (sid, neighbors) in enumerate(hearing(self.layout).items()):
+            source = SimulatedAdvertisementSource(neighbors, noise_db=noise_db, seed=seed * 100003 + k)
+            node = StationNode(sid, ble_source=source, continuous_scan=False,
+                               payload_format=payload_format, client=broker.client())
+            node.known_master = MASTER_ID
+            self.nodes[sid] = node
+            self.sources[sid] = source
+
+    def report(self, sid):
+        node, source = self.nodes[sid], self.sources[sid]
+        for _ in range(SAMPLES_PER_REPORT):
+            source.advertise(node.on_advertisement)
+        node.publish_neighbors()
+
+    def move(self, sid, dx, dy):
+        """Moves a station; returns the stations whose tables change."""
+        x, y = self.layout[sid]
+        self.layout[sid] = (x + dx, y + dy)
+        affected = [sid] + list(self.sources[sid].distances)
+        for other in affected:
+            for neighbor in self.sources[other].distances:
+                self.sources[other].distances[neighbor] = max(math.dist(self.layout[other], self.layout[neighbor]), 0.1)
+        return affected
+
+class Probe:
+    """Dashboard-like subscriber timing when a station's published position moves."""
+
+    def __init__(self, broker):
+        self.view = TopologyView()
+        self.client = broker.client()
+        self.client.on_message = self.on_message
+        self.client.subscribe("topology/snapshot")
+        self.client.subscribe("topology/delta")
+        self.client.loop_start()
+
+    def on_message(self, client, userdata, msg):
+        message = decode(msg.payload)
+        if msg.topic == "topology/snapshot":
+            self.view.apply_snapshot(message)
+        else:
+            self.view.apply_delta(message)
+
+    def wait_for(self, predicate, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            version, positions, _, _ = self.view.state()
+            if predicate(positions):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.view.wait_for_change(version, timeout=remaining)
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run(num_stations=500, rounds=3, moves=3, move_distance=3.0, report_rate=2.0, noise_db=2.0,
+        payload_format="json", debounce=0.2, max_delay=1.0, timeout=60.0, seed=0):
+    """
+    Runs the load test and returns its measurements:
+      ingest_rate          tables handled per second by the master while every station reports `rounds` times
+      latency_median/max   seconds from a station moving to the probe seeing its new position, while
+                           the moved station and its neighbors report every 1/report_rate seconds
+      peak_rss_mb          peak resident memory of the process (fleet, broker and master)
+    """
+    broker = LoopbackBroker()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        fleet = SimulatedFleet(broker, plant_layout(num_stations, seed=seed), noise_db, payload_format, seed)
+        master = MasterNode(debounce=debounce, max_delay=max_delay, payload_format=payload_format,
+                            client=broker.client())
+        master.connect()
+        probe = Probe(broker)
+        try:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for sid in fleet.nodes:
+                    fleet.report(sid)
+            master.client.drain()
+            master.drain()
+            ingest_time = time.perf_counter() - start
+            if not probe.wait_for(lambda positions: len(positions) >= num_stations, timeout):
+                raise RuntimeError("Master never published the full topology")
+
+            rng = random.Random(seed)
+            latencies = []
+            for _ in range(moves):
+                sid = rng.choice(list(fleet.nodes))
+                before = probe.view.state()[1][sid]
+                affected = fleet.move(sid, move_distance, 0.0)
+                moved_at = time.perf_counter()
+                stop = threading.Event()
+
+                def keep_reporting():
+                    while not stop.is_set():
+                        for other in affected:
+                            fleet.report(other)
+                        stop.wait(1 / report_rate)
+
+                reporter = threading.Thread(target=keep_reporting)
+                reporter.start()
+                seen = probe.wait_for(lambda positions: math.dist(positions.get(sid, before), before) > move_distance / 2,
+                                      timeout)
+                stop.set()
+                reporter.join()
+                latencies.append(time.perf_counter() - moved_at if seen else math.inf)
+                master.client.drain()
+                master.drain()
+        finally:
+            master.stop()
+            probe.client.loop_stop()
+
+    return {
+        "stations": num_stations,
+        "ingest_rate": rounds * num_stations / ingest_time,
+        "latency_median": statistics.median(latencies) if latencies else 0.0,
+        "latency_max": max(latencies) if latencies else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def check(results, min_ingest_rate=None, max_latency=None, max_memory_mb=None, baseline=None, tolerance=0.25):
+    """
+    Failures of a run against absolute thresholds and, optionally, a previous
+    run's results (`baseline`): throughput may drop and latency and memory
+    may grow by at most `tolerance` of the baseline.
+    """
+    failures = []
+    if min_ingest_rate is not None and results["ingest_rate"] < min_ingest_rate:
+        failures.append(f"ingest rate {results['ingest_rate']:.0f}/s below {min_ingest_rate:.0f}/s")
+    if max_latency is not None and results["latency_max"] > max_latency:
+        failures.append(f"latency {results['latency_max']:.2f} s above {max_latency:.2f} s")
+    if max_memory_mb is not None and results["peak_rss_mb"] > max_memory_mb:
+        failures.append(f"memory {results['peak_rss_mb']:.0f} MB above {max_memory_mb:.0f} MB")
+    if baseline:
+        if results["ingest_rate"] < baseline["ingest_rate"] * (1 - tolerance):
+            failures.append(f"ingest rate {results['ingest_rate']:.0f}/s regressed from {baseline['ingest_rate']:.0f}/s")
+        for key in ("latency_median", "peak_rss_mb"):
+            if results[key] > baseline[key] * (1 + tolerance):
+                failures.append(f"{key} {results[key]:.2f} regressed from {baseline[key]:.2f}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--moves", type=int, default=3)
+    parser.add_argument("--report-rate", type=float, default=2.0, help="reports per second of a moving station")
+    parser.add_argument("--noise-db", type=float, default=2.0)
+    parser.add_argument("--format", choices=("json", "binary"), default="json")
+    parser.add_argument("--min-ingest-rate", type=float)
+    parser.add_argument("--max-latency", type=float)
+    parser.add_argument("--max-memory-mb", type=float)
+    parser.add_argument("--baseline", help="results JSON of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save", help="write the results JSON here, e.g. to use as the next baseline")
+    args = parser.parse_args()
+
+    results = run(args.stations, args.rounds, args.moves, report_rate=args.report_rate,
+                  noise_db=args.noise_db, payload_format=args.format)
+    print(json.dumps(results, indent=2))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check(results, args.min_ingest_rate, args.max_latency, args.max_memory_mb, baseline, args.tolerance)
+    for failure in failures:
+        print("REGRESSION:", failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,194 @@
 # listener.py
 import json
+import os
+import sys
+import threading
+import time
 import paho.mqtt.client as mqtt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+from atomic_file import write_atomic
+
 MQTT_BROKER = "192.168.0.101"
 MQTT_PORT = 1883
 MQTT_TOPIC = "neighbors/update"
+LINE_ORDER_TOPIC = "topology/line_order"  # retained left/right neighbors published by the master
 CACHE_FILE = "neighbors_cache.json"
-neighbors = {}
+FLUSH_INTERVAL = 0.5    # seconds an update may wait before it is written
+FLUSH_MAX_PENDING = 50  # updates that force a write without waiting
+STATION_TTL = 300.0     # seconds a silent station stays in the cache, None: forever
+MAX_STATIONS = 5000     # stations kept at most, the least recently updated are dropped
+
+class CachePersister:
+    """
+    Write-behind persistence of the neighbors table.
+
+    Updates are merged in memory and a background thread writes the whole
+    table at most every `flush_interval` seconds, or as soon as
+    `max_pending` updates are waiting. Each write goes to a temporary file
+    that is atomically renamed over the cache file, so readers never see a
+    half-written file and MQTT callbacks never wait on the disk.
+
+    Stations not updated for `ttl` seconds are dropped from the table, and
+    at most `max_stations` are kept (the least recently updated go first).
+    Stations loaded from the file count as updated at startup.
+
+    The master's line order (set_line_order) is kept apart and wins over
+    the scanners' reports, which cannot tell left from right: a station it
+    covers is written with the master's left/right neighbors.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, max_pending=FLUSH_MAX_PENDING,
+                 ttl=STATION_TTL, max_stations=MAX_STATIONS, clock=time.monotonic):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_stations = max_stations
+        self.clock = clock
+        self.neighbors = self._load()
+        now = clock()
+        self.received = {station: now for station in self.neighbors}  # least recently updated first
+        self.line_order = {}  # station -> entry of the master's last line order
+        self.pending = 0
+        self.writes = 0
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def update(self, station, entry):
+        with self.condition:
+            self.received.pop(station, None)
+            if self.max_stations is not None:
+                while len(self.received) >= self.max_stations:
+                    oldest = next(iter(self.received))
+                    del self.received[oldest]
+                    del self.neighbors[oldest]
+            self.received[station] = self.clock()
+            self.neighbors[station] = entry
+            self.pending += 1
+            # Wake the writer to start the flush timer, or to flush right away
+            if self.pending == 1 or self.pending >= self.max_pending:
+                self.condition.notify()
+
+    def set_line_order(self, stations):
+        """Replaces the master's line order, {station: {"left", "right", ...}}."""
+        with self.condition:
+            self.line_order = dict(stations)
+            self.pending += 1
+            if self.pending == 1 or self.pending >= self.max_pending:
+                self.condition.notify()
+
+    def snapshot(self):
+        with self.condition:
+            return {**self.neighbors, **self.line_order}
+
+    def expire(self, now=None):
+        """Drops the stations not updated for more than ttl seconds; returns them."""
+        with self.condition:
+            if self.ttl is None:
+                return []
+            now = self.clock() if now is None else now
+            expired = []
+            for station, received in self.received.items():
+                if now - received <= self.ttl:
+                    break
+                expired.append(station)
+            for station in expired:
+                del self.received[station]
+                del self.neighbors[station]
+            if expired:
+                self.pending += 1
+            return expired
+
+    def _time_until_expiry(self):
+        if self.ttl is None or not self.received:
+            return None
+        return max(next(iter(self.received.values())) + self.ttl - self.clock(), 0)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending == 0:
+                    self.condition.wait(self._time_until_expiry())
+                    self.expire()
+                if not self.running:
+                    return
+                # Give the burst time to settle unless enough changes piled up
+                self.condition.wait_for(lambda: not self.running or self.pending >= self.max_pending,
+                                        timeout=self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self.condition:
+            if self.pending == 0:
+                return
+            data = json.dumps({**self.neighbors, **self.line_order}, separators=(",", ":"))
+            self.pending = 0
+
+        try:
+            write_atomic(self.path, data, prefix=".neighbors_cache.")
+            self.writes += 1
+        except OSError as e:
+            print("Erro ao gravar cache:", e)
+            with self.condition:
+                self.pending += 1  # retry on the next flush
+
+persister = CachePersister(CACHE_FILE)
 
 def on_connect(client, userdata, flags, rc):
     print("Conectado ao broker MQTT")
     client.subscribe(MQTT_TOPIC)
+    client.subscribe(LINE_ORDER_TOPIC, qos=1)
 
 def on_message(client, userdata, msg):
-    global neighbors
     try:
         payload = json.loads(msg.payload.decode())
+        if msg.topic == LINE_ORDER_TOPIC:
+            persister.set_line_order(payload.get("stations", {}))
+            print(f"Ordem das linhas atualizada: {len(payload.get('lines', []))} linhas")
+            return
         station = payload.get("station")
-        neighbors[station] = {
+        entry = {
             "left": payload.get("left_neighbor"),
             "right": payload.get("right_neighbor")
         }
-        print(f"Atualizado {station}:", neighbors[station])
-
-        with open(CACHE_FILE, "w") as f:
-            json.dump(neighbors, f, indent=2)
+        persister.update(station, entry)
+        print(f"Atualizado {station}:", entry)
 
     except Exception as e:
         print("Erro ao processar mensagem:", e)
 
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-client.connect(MQTT_BROKER, MQTT_PORT, 60)
-client.loop_forever()
+def main():
+    persister.start()
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    try:
+        client.loop_forever()
+    finally:
+        persister.stop()
+
+if __name__ == "__main__":
+    main()
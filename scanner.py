@@ -1,5 +1,8 @@
 # scanner.py
 import asyncio
+import collections
+import random
+import threading
 import time
 import socket
 import json
@@ -9,7 +12,162 @@ from bleak import BleakScanner
 MQTT_BROKER = "192.168.0.101"
 MQTT_PORT = 1883
 MQTT_TOPIC = "neighbors/update"
+MQTT_QOS = 1
 HOSTNAME = socket.gethostname()
+OUTBOX_SIZE = 100         # reports kept while disconnected, oldest dropped first
+RECONNECT_MIN_DELAY = 1   # seconds, jittered on every disconnect
+RECONNECT_MAX_DELAY = 60
+
+class MqttReporter:
+    """
+    One long-lived MQTT connection for the scan reports.
+
+    The paho network loop runs in the background and reconnects on its own
+    with exponential backoff; the first delay is re-jittered on every
+    disconnect so scanners that lost the broker together do not come back
+    in lockstep. Reports produced while disconnected wait in a bounded
+    outbox and are published in order on reconnect.
+    """
+
+    def __init__(self, broker, port, topic=MQTT_TOPIC, outbox_size=OUTBOX_SIZE,
+                 min_delay=RECONNECT_MIN_DELAY, max_delay=RECONNECT_MAX_DELAY):
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.outbox = collections.deque(maxlen=outbox_size)
+        self.inflight = {}  # mid -> time the report was handed to paho
+        self.early_acks = {}  # mid -> time of an ack that arrived before its publish call returned
+        self.flushing = False  # the outbox is being published after a (re)connect
+        self.lock = threading.RLock()
+        self.connected = False
+        self.has_connected = False
+        self.counters = {
+            "published": 0,
+            "acknowledged": 0,
+            "queued": 0,
+            "dropped": 0,
+            "connects": 0,
+            "reconnects": 0,
+            "disconnects": 0,
+            "publish_latency_total": 0.0,
+            "publish_latency_max": 0.0,
+        }
+
+        self.client = mqtt.Client()
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_publish = self.on_publish
+
+    def start(self):
+        self._jitter_reconnect_delay()
+        self.client.connect_async(self.broker, self.port, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def _jitter_reconnect_delay(self):
+        self.client.reconnect_delay_set(min_delay=self.min_delay * random.uniform(0.5, 1.5),
+                                        max_delay=self.max_delay)
+
+    def send(self, payload):
+        message = json.dumps(payload)
+        with self.lock:
+            # Behind a reconnect flush the report waits its turn in the outbox
+            if not self.connected or self.flushing:
+                self._enqueue(message)
+                return
+        if not self._publish(message):
+            with self.lock:
+                self._enqueue(message)
+
+    def _enqueue(self, message):
+        if len(self.outbox) == self.outbox.maxlen:
+            self.counters["dropped"] += 1
+        self.outbox.append(message)
+        self.counters["queued"] += 1
+
+    def _publish(self, message):
+        """
+        Hands a report to paho; returns False when paho refuses it. Called
+        without self.lock: paho holds its own message lock while calling
+        on_publish, which takes self.lock, so holding both here could deadlock.
+        """
+        sent_at = time.monotonic()
+        info = self.client.publish(self.topic, message, qos=MQTT_QOS)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            return False
+        with self.lock:
+            self.counters["published"] += 1
+            acked_at = self.early_acks.pop(info.mid, None)
+            if acked_at is None:
+                self.inflight[info.mid] = sent_at
+            else:
+                self._record_ack(acked_at - sent_at)
+        return True
+
+    def _flush(self):
+        """Publishes the outbox in order, one report at a time, until it is empty or the connection drops."""
+        while True:
+            with self.lock:
+                if not self.connected or not self.outbox:
+                    self.flushing = False
+                    return
+                message = self.outbox.popleft()
+            if not self._publish(message):
+                with self.lock:
+                    self.outbox.appendleft(message)
+                    self.flushing = False
+                return
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"Conexão MQTT recusada (rc={rc})")
+            return
+        with self.lock:
+            self.connected = True
+            self.counters["connects"] += 1
+            if self.has_connected:
+                self.counters["reconnects"] += 1
+            self.has_connected = True
+            self.flushing = True
+        self._flush()
+        print("Conectado ao broker MQTT")
+
+    def on_disconnect(self, client, userdata, rc):
+        with self.lock:
+            self.connected = False
+            self.counters["disconnects"] += 1
+        self._jitter_reconnect_delay()
+        print(f"Desconectado do broker MQTT (rc={rc})")
+
+    def on_publish(self, client, userdata, mid):
+        with self.lock:
+            sent_at = self.inflight.pop(mid, None)
+            if sent_at is None:
+                # Acknowledged before _publish could record it
+                self.early_acks[mid] = time.monotonic()
+                return
+            self._record_ack(time.monotonic() - sent_at)
+
+    def _record_ack(self, latency):
+        self.counters["acknowledged"] += 1
+        self.counters["publish_latency_total"] += latency
+        self.counters["publish_latency_max"] = max(self.counters["publish_latency_max"], latency)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["outbox"] = len(self.outbox)
+            stats["inflight"] = len(self.inflight)
+        acknowledged = stats["acknowledged"]
+        stats["publish_latency_avg"] = stats["publish_latency_total"] / acknowledged if acknowledged else 0.0
+        return stats
+
+reporter = MqttReporter(MQTT_BROKER, MQTT_PORT)
 
 async def scan_ble():
     devices = await BleakScanner.discover()
@@ -29,9 +187,6 @@ def choose_neighbors(devices):
     return left, right
 
 def send_to_mqtt(left, right):
-    client = mqtt.Client()
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-
     payload = {
         "station": HOSTNAME,
         "left_neighbor": left["mac"] if left else None,
@@ -39,16 +194,17 @@ def send_to_mqtt(left, right):
         "timestamp": time.time()
     }
 
-    client.publish(MQTT_TOPIC, json.dumps(payload))
-    client.disconnect()
+    reporter.send(payload)
     print(f"Enviado via MQTT: {json.dumps(payload, indent=2)}")
 
 async def main_loop():
+    reporter.start()
     while True:
         try:
             devices = await scan_ble()
             left, right = choose_neighbors(devices)
             send_to_mqtt(left, right)
+            print("Estatísticas MQTT:", reporter.stats())
         except Exception as e:
             print("Erro:", e)
         await asyncio.sleep(60)
@@ -0,0 +1,225 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import api
+from metrics import Metrics
+from topology import edges_to_graph
+from topology_index_test import two_lines
+
+
+class TestNeighborsApi(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "neighbors_cache.json")
+        self.write({"st1": {"left": "AA:01", "right": "AA:02"}})
+        self.original_cache = api.neighbor_cache
+        api.neighbor_cache = api.JsonFileCache(self.path)
+        self.client = api.app.test_client()
+
+    def tearDown(self):
+        api.neighbor_cache = self.original_cache
+        self.tmpdir.cleanup()
+
+    def write(self, data, mtime_ns=None):
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_get_all_and_station(self):
+        self.assertEqual(self.client.get("/neighbors").get_json(), {"st1": {"left": "AA:01", "right": "AA:02"}})
+        self.assertEqual(self.client.get("/neighbors/st1").get_json(),
+                         {"station": "st1", "left": "AA:01", "right": "AA:02"})
+        self.assertEqual(self.client.get("/neighbors/missing").status_code, 404)
+
+    def test_file_is_parsed_once_while_unchanged(self):
+        self.client.get("/neighbors")
+        cached = api.neighbor_cache.current
+        self.client.get("/neighbors")
+        self.client.get("/neighbors/st1")
+        self.assertIs(api.neighbor_cache.current, cached)
+
+    def test_reloads_when_file_changes(self):
+        self.write({"st1": {"left": "AA:01", "right": "AA:02"}}, mtime_ns=1_000_000_000)
+        first = self.client.get("/neighbors")
+        self.write({"st2": {"left": None, "right": "AA:03"}}, mtime_ns=2_000_000_000)
+        second = self.client.get("/neighbors")
+        self.assertEqual(second.get_json(), {"st2": {"left": None, "right": "AA:03"}})
+        self.assertNotEqual(first.headers["ETag"], second.headers["ETag"])
+
+    def test_if_none_match_gets_304(self):
+        first = self.client.get("/neighbors")
+        self.assertIn("Last-Modified", first.headers)
+        again = self.client.get("/neighbors", headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.data, b"")
+        station = self.client.get("/neighbors/st1", headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(station.status_code, 304)
+
+    def test_stale_etag_gets_full_body(self):
+        response = self.client.get("/neighbors", headers={"If-None-Match": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("st1", response.get_json())
+
+    def test_half_written_file_keeps_last_good_copy(self):
+        self.client.get("/neighbors")
+        with open(self.path, "w") as f:
+            f.write('{"st1": {"left"')
+        self.assertEqual(self.client.get("/neighbors").get_json(), {"st1": {"left": "AA:01", "right": "AA:02"}})
+
+
+class TestMetricsApi(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "master_metrics.json")
+        self.original_cache = api.metrics_cache
+        api.metrics_cache = api.JsonFileCache(self.path)
+        self.client = api.app.test_client()
+
+        metrics = Metrics()
+        metrics.inc("messages_total", {"topic": "neighbors"}, 3)
+        metrics.inc("decode_failures_total", {"topic": "neighbors"})
+        metrics.observe("solve_seconds", 0.25)
+        metrics.observe("solve_seconds", 0.75)
+        metrics.set("solver_stress", 0.01)
+        metrics.set("last_publish_timestamp", 1000.0)
+        metrics.write(self.path)
+
+    def tearDown(self):
+        api.metrics_cache = self.original_cache
+        self.tmpdir.cleanup()
+
+    def test_prometheus_text(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertIn("# TYPE topology_messages_total counter", lines)
+        self.assertIn('topology_messages_total{topic="neighbors"} 3', lines)
+        self.assertIn('topology_decode_failures_total{topic="neighbors"} 1', lines)
+        self.assertIn("topology_solve_seconds_count 2", lines)
+        self.assertIn("topology_solve_seconds_sum 1.0", lines)
+        self.assertIn("topology_solve_seconds_max 0.75", lines)
+        self.assertTrue(any(line.startswith("topology_last_publish_age_seconds ") for line in lines))
+
+    def test_json_includes_last_publish_age(self):
+        metrics = self.client.get("/metrics.json").get_json()
+        gauges = {gauge["name"]: gauge["value"] for gauge in metrics["gauges"]}
+        self.assertGreater(gauges["last_publish_age_seconds"], 0)
+        self.assertEqual(gauges["solver_stress"], 0.01)
+        self.assertEqual(metrics["timings"][0]["count"], 2)
+
+    def test_missing_metrics_file(self):
+        os.remove(self.path)
+        api.metrics_cache = api.JsonFileCache(self.path)
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+        self.assertEqual(self.client.get("/metrics.json").get_json()["gauges"], [])
+
+    def test_label_escaping(self):
+        self.assertEqual(api.prometheus_labels({"topic": 'a"b\\c'}), '{topic="a\\"b\\\\c"}')
+
+
+class TestTopologyApi(unittest.TestCase):
+    def setUp(self):
+        self.original_service = api.topology_service
+        api.topology_service = api.TopologyService()
+        positions, edges = two_lines()
+        api.topology_service.view.apply_snapshot({"seq": 3, "positions": positions,
+                                                  "graph": edges_to_graph(positions, edges)})
+        api.topology_service.refresh()
+        self.client = api.app.test_client()
+
+    def tearDown(self):
+        api.topology_service = self.original_service
+
+    def test_summary_and_station(self):
+        self.assertEqual(self.client.get("/topology").get_json()["stations"], 10)
+        station = self.client.get("/topology/stations/L0S3").get_json()
+        self.assertEqual(station["position"], [9.0, 0.0])
+        self.assertIsNone(station["line"])
+        self.assertEqual(self.client.get("/topology/stations/missing").status_code, 404)
+
+    def test_station_follows_published_line_order(self):
+        line_order = {"lines": [["L0S4", "L0S3", "L0S2", "L0S1", "L0S0"]],
+                      "stations": {f"L0S{i}": {"line": 0, "order": 4 - i} for i in range(5)}}
+        api.topology_service.on_message(None, None, SimpleNamespace(topic=api.TOPICS["LINE_ORDER"],
+                                                                   payload=json.dumps(line_order).encode()))
+        self.assertEqual(self.client.get("/topology").get_json()["lines"], 1)
+        station = self.client.get("/topology/stations/L0S3").get_json()
+        self.assertEqual((station["line"], station["order"]), (0, 1))
+        self.assertEqual(station["upstream"], ["L0S4"])
+        self.assertEqual(station["downstream"], ["L0S2", "L0S1", "L0S0"])
+
+    def test_spatial_queries(self):
+        within = self.client.get("/topology/within?station=L0S2&radius=3.5").get_json()
+        self.assertEqual([entry["id"] for entry in within["stations"]], ["L0S1", "L0S3"])
+        nearest = self.client.get("/topology/nearest?x=12&y=12&k=2").get_json()
+        self.assertEqual([entry["id"] for entry in nearest["stations"]], ["L1S4", "L1S3"])
+        self.assertEqual(self.client.get("/topology/nearest?station=L0S0&k=0").status_code, 400)
+        self.assertEqual(self.client.get("/topology/within?radius=2").status_code, 400)
+        self.assertEqual(self.client.get("/topology/within?station=nope&radius=2").status_code, 404)
+
+    def test_path(self):
+        path = self.client.get("/topology/path?from=L1S0&to=L1S2").get_json()
+        self.assertEqual((path["hops"], path["path"]), (2, ["L1S0", "L1S1", "L1S2"]))
+        self.assertEqual(self.client.get("/topology/path?from=L0S0&to=L1S0").status_code, 404)
+
+    def test_line_order(self):
+        self.assertEqual(self.client.get("/topology/lines").status_code, 404)
+        line_order = {"lines": [["L0S0", "L0S1"]],
+                      "stations": {"L0S0": {"line": 0, "order": 0, "offset": 0.0, "left": None, "right": "L0S1"},
+                                   "L0S1": {"line": 0, "order": 1, "offset": 3.0, "left": "L0S0", "right": None}}}
+        api.topology_service.on_message(None, None, SimpleNamespace(topic=api.TOPICS["LINE_ORDER"],
+                                                                   payload=json.dumps(line_order).encode()))
+        self.assertEqual(self.client.get("/topology/lines").get_json(), line_order)
+        self.assertIn(("neighbors", {"kind": "line_order", **line_order}),
+                      api.topology_service.stream_snapshot())
+
+    def test_index_follows_deltas(self):
+        service = api.topology_service
+        index = service.index
+        self.assertFalse(service.refresh())
+        service.view.apply_delta({"seq": 4, "moved": {"L0S0": [0.0, 1.0]}, "removed": ["L1S4"],
+                                  "added_edges": [], "removed_edges": [["L1S3", "L1S4"]]})
+        self.assertTrue(service.refresh())
+        self.assertIsNot(service.index, index)
+        self.assertEqual(service.index.position("L0S0"), [0.0, 1.0])
+        self.assertNotIn("L1S4", service.index)
+
+    def test_malformed_messages_are_dropped(self):
+        service = api.topology_service
+        version = service.view.version
+        bad = [(api.TOPICS["TOPOLOGY_SNAPSHOT"], {}), (api.NEIGHBORS_TOPIC, [1, 2]),
+               (api.TOPICS["LINE_ORDER"], None), (api.TOPICS["LINE_ORDER"], {"lines": [["A"]], "stations": {"A": {}}}),
+               (api.TOPICS["TOPOLOGY_DELTA"], {"seq": 4, "moved": {"L0S0": [0.0, 1.0]}, "removed": []})]
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            for topic, message in bad:
+                service.on_message(None, None, SimpleNamespace(topic=topic, payload=json.dumps(message).encode()))
+        self.assertEqual(out.getvalue().count("Erro ao processar mensagem"), len(bad))
+        self.assertIsNone(service.line_order)
+        self.assertEqual((service.view.seq, service.view.version), (3, version))
+        self.assertEqual(service.view.positions["L0S0"], [0.0, 0.0])
+
+    def test_stream_sends_state_then_changes(self):
+        response = self.client.get("/stream", buffered=False)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        chunks = iter(response.response)
+        first = next(chunks).decode()
+        self.assertIn("event: neighbors", first)
+        self.assertIn('"kind":"snapshot","seq":3', first)
+
+        update = {"station": "st1", "left_neighbor": "AA:01", "right_neighbor": None}
+        api.topology_service.on_message(None, None, SimpleNamespace(topic=api.NEIGHBORS_TOPIC,
+                                                                   payload=json.dumps(update).encode()))
+        self.assertIn('data: {"kind":"update","station":"st1","left":"AA:01","right":null}', next(chunks).decode())
+        response.close()
+        self.assertEqual(api.topology_service.hub.clients, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from atomic_file import write_atomic
+
+
+class TestWriteAtomic(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "state.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_writes_text_and_bytes(self):
+        write_atomic(self.path, '{"a":1}')
+        with open(self.path) as f:
+            self.assertEqual(f.read(), '{"a":1}')
+        write_atomic(self.path, b"\x00\x01")
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), b"\x00\x01")
+        self.assertEqual(os.listdir(self.tmpdir.name), ["state.json"])
+
+    def test_failed_rename_keeps_previous_file(self):
+        write_atomic(self.path, "old")
+        with mock.patch("os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                write_atomic(self.path, "new")
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "old")
+        self.assertEqual(os.listdir(self.tmpdir.name), ["state.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
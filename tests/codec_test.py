@@ -0,0 +1,83 @@
+import json
+import unittest
+
+import codec
+
+NEIGHBORS = [{"id": "MASTER_N1", "dist": 2.5, "var": 0.125}, {"id": "NODE_çé", "dist": 7.25, "var": 1.5}]
+POSITIONS = {"N1": [0.0, 0.0], "N2": [10.0, 0.0], "N3": [10.0, -7.5]}
+GRAPH = {"N1": ["N2"], "N2": ["N1", "N3"], "N3": ["N2"], "N4": []}
+
+
+class TestCodec(unittest.TestCase):
+    def test_binary_round_trip(self):
+        self.assertEqual(codec.decode(codec.encode_neighbors("N2", NEIGHBORS, "binary")),
+                         {"from": "N2", "data": NEIGHBORS})
+        self.assertEqual(codec.decode(codec.encode_snapshot(3, POSITIONS, GRAPH, "binary")),
+                         {"seq": 3, "positions": POSITIONS, "graph": GRAPH})
+
+    def test_empty_payloads(self):
+        self.assertEqual(codec.decode(codec.encode_snapshot(0, {}, {}, "binary")),
+                         {"seq": 0, "positions": {}, "graph": {}})
+        self.assertEqual(codec.decode(codec.encode_neighbors("N2", [], "binary")), {"from": "N2", "data": []})
+
+    def test_json_is_still_accepted(self):
+        legacy = json.dumps({"from": "N2", "data": NEIGHBORS})
+        self.assertEqual(codec.decode(legacy), {"from": "N2", "data": NEIGHBORS})
+        self.assertEqual(codec.decode(legacy.encode()), {"from": "N2", "data": NEIGHBORS})
+        self.assertEqual(codec.encode_neighbors("N2", NEIGHBORS), legacy.encode())
+
+    def test_binary_is_smaller(self):
+        positions = {f"STATION_{i:04d}": [i / 7, -i / 3] for i in range(200)}
+        self.assertLess(len(codec.encode_snapshot(1, positions, {}, "binary")),
+                        len(codec.encode_snapshot(1, positions, {}, "json")) / 2)
+        self.assertTrue(codec.is_binary(codec.encode_snapshot(1, positions, {}, "binary")))
+        self.assertFalse(codec.is_binary(codec.encode_snapshot(1, positions, {}, "json")))
+
+    def test_rejects_bad_payloads(self):
+        payload = codec.encode_snapshot(3, POSITIONS, GRAPH, "binary")
+        with self.assertRaises(ValueError):
+            codec.decode(payload[:-3])
+        with self.assertRaises(ValueError):
+            codec.decode(bytes([0x80 | 7]) + payload[1:])
+        with self.assertRaises(ValueError):
+            codec.encode_snapshot(3, POSITIONS, GRAPH, "xml")
+        with self.assertRaises(ValueError):
+            codec.encode_snapshot(3, {"bad\0id": [0, 0]}, {}, "binary")
+
+    def test_truncated_bodies_are_rejected(self):
+        payloads = [codec.encode_neighbors("N2", NEIGHBORS, "binary"),
+                    codec.encode_snapshot(3, POSITIONS, {}, "binary"),
+                    codec.encode_delta(4, POSITIONS, [], [], [], "binary")]
+        for payload in payloads:
+            for cut in (1, 4, 9):
+                with self.subTest(kind=payload[1], cut=cut), self.assertRaises(ValueError):
+                    codec.decode(payload[:-cut])
+        with self.assertRaises(ValueError):
+            codec.decode(payloads[0] + b"\0" * 10)
+
+    def test_stale_snapshot_flag(self):
+        for fmt in codec.PAYLOAD_FORMATS:
+            message = codec.decode(codec.encode_snapshot(3, POSITIONS, GRAPH, fmt, stale=True))
+            self.assertEqual(message, {"seq": 3, "positions": POSITIONS, "graph": GRAPH, "stale": True})
+            self.assertNotIn("stale", codec.decode(codec.encode_snapshot(3, POSITIONS, GRAPH, fmt)))
+
+    def test_epoch_round_trip(self):
+        for fmt in codec.PAYLOAD_FORMATS:
+            with self.subTest(fmt=fmt):
+                message = codec.decode(codec.encode_snapshot(3, POSITIONS, GRAPH, fmt, stale=True, epoch=2 ** 32 - 1))
+                self.assertEqual(message, {"epoch": 2 ** 32 - 1, "seq": 3, "positions": POSITIONS, "graph": GRAPH,
+                                           "stale": True})
+                delta = codec.decode(codec.encode_delta(4, {"A": [1.0, 2.0]}, ["B"], [], [["A", "C"]], fmt, epoch=7))
+                self.assertEqual((delta["epoch"], delta["seq"], delta["removed"]), (7, 4, ["B"]))
+                self.assertNotIn("epoch", codec.decode(codec.encode_delta(4, {}, [], [], [], fmt)))
+
+    def test_peek_sender(self):
+        for fmt in codec.PAYLOAD_FORMATS:
+            self.assertEqual(codec.peek_sender(codec.encode_neighbors("NODE_çé", NEIGHBORS, fmt)), "NODE_çé")
+        self.assertEqual(codec.peek_sender('{"data": [], "from": "N\\"1"}'), 'N"1')
+        self.assertIsNone(codec.peek_sender(codec.encode_snapshot(3, POSITIONS, GRAPH, "binary")))
+        self.assertIsNone(codec.peek_sender(b"{not json"))
+
+
+if __name__ == "__main__":
+    unittest.main()
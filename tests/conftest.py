@@ -1,3 +1,4 @@
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
\ No newline at end of file
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
@@ -0,0 +1,65 @@
+import math
+import threading
+import unittest
+
+from benchmarks import fleet_load
+from loopback import LoopbackBroker
+
+
+class TestLoopbackBroker(unittest.TestCase):
+    def test_wildcards_and_retained_messages(self):
+        broker = LoopbackBroker()
+        received = []
+        done = threading.Event()
+
+        def on_message(client, userdata, msg):
+            received.append((msg.topic, msg.payload))
+            if len(received) == 3:
+                done.set()
+
+        publisher = broker.client()
+        publisher.publish("topology/snapshot", b"s1", retain=True)
+        subscriber = broker.client()
+        subscriber.on_message = on_message
+        subscriber.subscribe("station/+/neighbors")
+        subscriber.subscribe("topology/#")
+        subscriber.loop_start()
+        publisher.publish("station/N1/neighbors", "t1")
+        publisher.publish("station/N1/version", "ignored")
+        publisher.publish("topology/delta", b"d2")
+        self.assertTrue(done.wait(2))
+        subscriber.drain()
+        subscriber.loop_stop()
+        self.assertEqual(received, [("topology/snapshot", b"s1"), ("station/N1/neighbors", b"t1"),
+                                    ("topology/delta", b"d2")])
+
+
+class TestFleetLoad(unittest.TestCase):
+    def test_plant_layout_and_hearing(self):
+        layout = fleet_load.plant_layout(60, per_line=20)
+        heard = fleet_load.hearing(layout)
+        self.assertEqual(len(layout), 60)
+        for sid, neighbors in heard.items():
+            self.assertLessEqual(len(neighbors), fleet_load.MAX_NEIGHBORS)
+            for other, dist in neighbors.items():
+                self.assertAlmostEqual(dist, math.dist(layout[sid], layout[other]))
+                self.assertLessEqual(dist, fleet_load.BLE_RANGE)
+
+    def test_small_run_measures_everything(self):
+        results = fleet_load.run(num_stations=30, rounds=2, moves=1, report_rate=10.0, timeout=30)
+        self.assertEqual(results["stations"], 30)
+        self.assertGreater(results["ingest_rate"], 0)
+        self.assertTrue(math.isfinite(results["latency_max"]))
+        self.assertGreater(results["peak_rss_mb"], 0)
+
+    def test_check_flags_regressions(self):
+        results = {"ingest_rate": 800.0, "latency_median": 1.5, "latency_max": 2.0, "peak_rss_mb": 100.0}
+        baseline = {"ingest_rate": 1000.0, "latency_median": 1.0, "latency_max": 1.2, "peak_rss_mb": 95.0}
+        self.assertEqual(fleet_load.check(results, baseline=baseline, tolerance=0.25),
+                         ["latency_median 1.50 regressed from 1.00"])
+        self.assertEqual(len(fleet_load.check(results, min_ingest_rate=900, max_latency=1.0, max_memory_mb=50)), 3)
+        self.assertEqual(fleet_load.check(results, min_ingest_rate=500, max_latency=5.0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import threading
+import time
+import unittest
+
+from ingest import COALESCED, DELAYED, DROPPED, QUEUED, IngestQueue
+
+
+class TestIngestQueue(unittest.TestCase):
+    def test_latest_message_per_key_in_arrival_order(self):
+        queue = IngestQueue(maxsize=10)
+        self.assertEqual(queue.put("A", 1), QUEUED)
+        self.assertEqual(queue.put("B", 1), QUEUED)
+        self.assertEqual(queue.put("A", 2), COALESCED)
+        self.assertEqual(queue.put(None, "x"), QUEUED)
+        self.assertEqual(queue.put(None, "y"), QUEUED)
+        self.assertEqual(len(queue), 4)
+        items = []
+        for _ in range(4):
+            key, item = queue.get()
+            items.append(item)
+            queue.task_done(key)
+        self.assertEqual(items, [2, 1, "x", "y"])
+        self.assertTrue(queue.join(timeout=0))
+
+    def test_key_being_processed_is_not_handed_out_again(self):
+        queue = IngestQueue(maxsize=10)
+        queue.put("A", 1)
+        key, _ = queue.get()
+        queue.put("A", 2)
+        queue.put("B", 1)
+        self.assertEqual(queue.get(), ("B", 1))
+        queue.task_done("B")
+        got = []
+        worker = threading.Thread(target=lambda: got.append(queue.get()))
+        worker.start()
+        time.sleep(0.05)
+        self.assertEqual(got, [])
+        queue.task_done(key)
+        worker.join(1)
+        self.assertEqual(got, [("A", 2)])
+
+    def test_full_queue_delays_then_drops(self):
+        queue = IngestQueue(maxsize=1, block_timeout=0.05)
+        queue.put("A", 1)
+        self.assertEqual(queue.put("A", 2), COALESCED)
+        start = time.monotonic()
+        self.assertEqual(queue.put("B", 1), DROPPED)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+        threading.Timer(0.01, lambda: queue.task_done(queue.get()[0])).start()
+        self.assertEqual(queue.put("B", 2), DELAYED)
+        self.assertEqual(queue.get(), ("B", 2))
+
+    def test_close_wakes_workers(self):
+        queue = IngestQueue()
+        got = []
+        worker = threading.Thread(target=lambda: got.append(queue.get()))
+        worker.start()
+        queue.close()
+        worker.join(1)
+        self.assertEqual(got, [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
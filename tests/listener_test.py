@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+import listener
+
+
+class TestCachePersister(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "neighbors_cache.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_burst_is_written_once(self):
+        persister = listener.CachePersister(self.path, flush_interval=0.2, max_pending=1000)
+        persister.start()
+        for i in range(100):
+            persister.update(f"st{i}", {"left": None, "right": f"AA:{i:02d}"})
+        self.assertFalse(os.path.exists(self.path))
+        time.sleep(0.5)
+        self.assertEqual(persister.writes, 1)
+        self.assertEqual(len(self.read()), 100)
+        persister.stop()
+
+    def test_max_pending_forces_early_write(self):
+        persister = listener.CachePersister(self.path, flush_interval=60, max_pending=5)
+        persister.start()
+        for i in range(5):
+            persister.update(f"st{i}", {"left": None, "right": None})
+        deadline = time.time() + 2
+        while not os.path.exists(self.path) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.read()), 5)
+        persister.stop()
+
+    def test_stop_flushes_pending_updates(self):
+        persister = listener.CachePersister(self.path, flush_interval=60)
+        persister.start()
+        persister.update("st1", {"left": "AA:01", "right": None})
+        persister.stop()
+        self.assertEqual(self.read(), {"st1": {"left": "AA:01", "right": None}})
+
+    def test_write_is_atomic_and_leaves_no_temp_files(self):
+        persister = listener.CachePersister(self.path)
+        persister.update("st1", {"left": None, "right": None})
+        persister.flush()
+        self.assertEqual(os.listdir(self.tmpdir.name), ["neighbors_cache.json"])
+
+    def test_existing_cache_is_loaded(self):
+        with open(self.path, "w") as f:
+            json.dump({"st9": {"left": None, "right": "AA:09"}}, f)
+        persister = listener.CachePersister(self.path)
+        self.assertEqual(persister.snapshot(), {"st9": {"left": None, "right": "AA:09"}})
+
+    def test_silent_stations_expire(self):
+        now = [0.0]
+        persister = listener.CachePersister(self.path, ttl=10, clock=lambda: now[0])
+        persister.update("st1", {"left": None, "right": None})
+        now[0] = 3.0
+        persister.update("st2", {"left": None, "right": None})
+        now[0] = 8.0
+        persister.update("st1", {"left": "AA:02", "right": None})
+        now[0] = 14.0
+        self.assertEqual(persister.expire(), ["st2"])
+        self.assertEqual(list(persister.snapshot()), ["st1"])
+
+    def test_expiry_is_written_by_the_writer(self):
+        persister = listener.CachePersister(self.path, flush_interval=0.05, ttl=0.1)
+        persister.update("st1", {"left": None, "right": None})
+        persister.flush()
+        persister.start()
+        deadline = time.time() + 2
+        while self.read() and time.time() < deadline:
+            time.sleep(0.02)
+        persister.stop()
+        self.assertEqual(self.read(), {})
+
+    def test_station_cap_drops_least_recently_updated(self):
+        persister = listener.CachePersister(self.path, max_stations=2)
+        for station in ("st1", "st2", "st1", "st3"):
+            persister.update(station, {"left": None, "right": None})
+        self.assertEqual(set(persister.snapshot()), {"st1", "st3"})
+
+
+class TestOnMessage(unittest.TestCase):
+    def test_message_is_merged_without_touching_disk(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "neighbors_cache.json")
+            original = listener.persister
+            listener.persister = listener.CachePersister(path)
+            try:
+                payload = {"station": "st1", "left_neighbor": "AA:01", "right_neighbor": "AA:02"}
+                listener.on_message(None, None, SimpleNamespace(topic=listener.MQTT_TOPIC,
+                                                                payload=json.dumps(payload).encode()))
+                self.assertEqual(listener.persister.snapshot(), {"st1": {"left": "AA:01", "right": "AA:02"}})
+                self.assertFalse(os.path.exists(path))
+            finally:
+                listener.persister = original
+
+    def test_line_order_wins_over_scanner_reports(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "neighbors_cache.json")
+            original = listener.persister
+            listener.persister = listener.CachePersister(path)
+            try:
+                line_order = {"lines": [["st1", "st2"]],
+                              "stations": {"st1": {"line": 0, "order": 0, "offset": 0.0, "left": None, "right": "st2"},
+                                           "st2": {"line": 0, "order": 1, "offset": 1.2, "left": "st1", "right": None}}}
+                listener.on_message(None, None, SimpleNamespace(topic=listener.LINE_ORDER_TOPIC,
+                                                                payload=json.dumps(line_order).encode()))
+                for station in ("st1", "st3"):
+                    payload = {"station": station, "left_neighbor": "AA:01", "right_neighbor": "AA:02"}
+                    listener.on_message(None, None, SimpleNamespace(topic=listener.MQTT_TOPIC,
+                                                                    payload=json.dumps(payload).encode()))
+                snapshot = listener.persister.snapshot()
+                self.assertEqual(snapshot["st1"]["right"], "st2")
+                self.assertEqual(snapshot["st2"]["left"], "st1")
+                self.assertEqual(snapshot["st3"], {"left": "AA:01", "right": "AA:02"})
+                listener.persister.flush()
+                with open(path) as f:
+                    self.assertEqual(json.load(f), snapshot)
+            finally:
+                listener.persister = original
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,406 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+import codec
+from checkpoint import write_checkpoint
+from master_node import MasterNode, table_changed
+from rollout import Rollout
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+        self.event = threading.Event()
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, codec.decode(payload)))
+        self.event.set()
+
+
+def square_tables(shift=0.0):
+    """Neighbor tables of four stations on a 1 m square, A moved `shift` metres away from B."""
+    diag = 2 ** 0.5
+    return {
+        "A": [{"id": "B", "dist": 1.0 + shift, "var": 0.05}, {"id": "C", "dist": diag, "var": 0.05}],
+        "B": [{"id": "C", "dist": 1.0, "var": 0.05}, {"id": "D", "dist": diag, "var": 0.05}],
+        "C": [{"id": "D", "dist": 1.0, "var": 0.05}, {"id": "A", "dist": diag, "var": 0.05}],
+        "D": [{"id": "A", "dist": 1.0, "var": 0.05}],
+    }
+
+
+def send_tables(master, tables):
+    for station, table in tables.items():
+        master.handle_neighbors(json.dumps({"from": station, "data": table}))
+
+
+def counter(master, name, **labels):
+    for entry in master.metrics.snapshot()["counters"]:
+        if entry["name"] == name and entry["labels"] == labels:
+            return entry["value"]
+    return 0
+
+
+class TestTableChanged(unittest.TestCase):
+    def test_small_moves_are_not_changes(self):
+        old = square_tables()["A"]
+        self.assertFalse(table_changed(old, square_tables(0.05)["A"], tolerance=0.1))
+        self.assertTrue(table_changed(old, square_tables(0.5)["A"], tolerance=0.1))
+
+    def test_new_or_lost_neighbors_are_changes(self):
+        old = square_tables()["A"]
+        self.assertTrue(table_changed(old, old[:1]))
+        self.assertTrue(table_changed(old, old + [{"id": "D", "dist": 1.0, "var": 0.05}]))
+        self.assertTrue(table_changed(None, old))
+
+
+class TestDirtyTracking(unittest.TestCase):
+    def setUp(self):
+        self.master = MasterNode(tolerance=0.1, debounce=0.05, max_delay=1.0, line_order=False)
+        self.master.client = FakeClient()
+
+    def test_solve_skipped_without_changes(self):
+        self.assertFalse(self.master.reconstruct_topology())
+        send_tables(self.master, square_tables())
+        self.assertEqual(self.master.dirty, {"A", "B", "C", "D"})
+        self.assertTrue(self.master.reconstruct_topology())
+        self.assertEqual(len(self.master.client.published), 1)
+
+        send_tables(self.master, square_tables(0.05))
+        self.assertEqual(self.master.dirty, set())
+        self.assertFalse(self.master.reconstruct_topology())
+        self.assertEqual(len(self.master.client.published), 1)
+
+    def test_only_moved_station_is_dirty(self):
+        send_tables(self.master, square_tables())
+        self.master.reconstruct_topology()
+        send_tables(self.master, square_tables(0.5))
+        self.assertEqual(self.master.dirty, {"A"})
+
+    def test_drift_accumulates_against_last_solve(self):
+        send_tables(self.master, square_tables())
+        self.master.reconstruct_topology()
+        for shift in (0.05, 0.1, 0.15):
+            send_tables(self.master, square_tables(shift))
+        self.assertEqual(self.master.dirty, {"A"})
+
+
+class TestBinaryPayloads(unittest.TestCase):
+    def test_binary_and_json_stations_mix(self):
+        master = MasterNode(payload_format="binary", line_order=False)
+        master.client = FakeClient()
+        for station, table in square_tables().items():
+            fmt = "binary" if station in "AC" else "json"
+            master.on_message(None, None, SimpleNamespace(topic=f"station/{station}/neighbors",
+                                                          payload=codec.encode_neighbors(station, table, fmt)))
+        self.assertEqual(master.measurements_raw["A"][0]["id"], "B")
+        self.assertEqual(master.dirty, {"A", "B", "C", "D"})
+        self.assertTrue(master.reconstruct_topology())
+        (topic, snapshot), = master.client.published
+        self.assertEqual(topic, "topology/snapshot")
+        self.assertEqual(set(snapshot["positions"]), {"A", "B", "C", "D"})
+        self.assertEqual(set(snapshot["graph"]), {"A", "B", "C", "D"})
+
+
+class TestMalformedTables(unittest.TestCase):
+    def test_table_with_missing_fields_is_rejected_before_storing(self):
+        master = MasterNode(tolerance=0.1)
+        master.client = FakeClient()
+        send_tables(master, square_tables())
+        payload = json.dumps({"from": "A", "data": [{"id": "B", "dist": 1.0}]}).encode()
+        master.on_message(None, None, SimpleNamespace(topic="station/A/neighbors", payload=payload))
+        self.assertEqual(counter(master, "decode_failures_total", topic="neighbors"), 1)
+        self.assertEqual(master.measurements_raw["A"], square_tables()["A"])
+        self.assertEqual(master.measurements_raw.readings().parse()[0], ["A", "B", "C", "D"])
+
+
+class TestTopologyPublishing(unittest.TestCase):
+    def setUp(self):
+        self.master = MasterNode(tolerance=0.1, line_order=False)
+        self.master.client = FakeClient()
+
+    def test_snapshot_then_delta_for_a_moved_station(self):
+        send_tables(self.master, square_tables())
+        self.master.reconstruct_topology()
+        send_tables(self.master, square_tables(0.5))
+        self.master.reconstruct_topology()
+        topics = [topic for topic, _ in self.master.client.published]
+        self.assertEqual(topics, ["topology/snapshot", "topology/delta"])
+        _, delta = self.master.client.published[1]
+        self.assertEqual(delta["seq"], 2)
+        self.assertTrue(delta["moved"])
+
+    def test_resync_republishes_snapshot_rate_limited(self):
+        self.master.handle_resync()
+        self.assertEqual(self.master.client.published, [])
+        send_tables(self.master, square_tables())
+        self.master.reconstruct_topology()
+        self.master.on_message(None, None, SimpleNamespace(topic="topology/resync", payload=b"{}"))
+        self.master.handle_resync()
+        topics = [topic for topic, _ in self.master.client.published]
+        self.assertEqual(topics, ["topology/snapshot", "topology/snapshot"])
+        self.assertEqual(self.master.client.published[1][1]["seq"], 1)
+
+
+    def test_line_order_is_published_when_it_changes(self):
+        master = MasterNode(tolerance=0.1, line_order=True)
+        master.client = FakeClient()
+        line = {"A": [{"id": "B", "dist": 1.0, "var": 0.05}, {"id": "C", "dist": 2.0, "var": 0.05}],
+                "B": [{"id": "C", "dist": 1.0, "var": 0.05}],
+                "C": [{"id": "D", "dist": 1.0, "var": 0.05}]}
+        send_tables(master, line)
+        master.reconstruct_topology()
+        send_tables(master, dict(line, C=[{"id": "D", "dist": 1.5, "var": 0.05}]))
+        master.reconstruct_topology()
+        topics = [topic for topic, _ in master.client.published]
+        self.assertEqual(topics, ["topology/line_order", "topology/snapshot", "topology/delta"])
+        line_order = master.client.published[0][1]
+        self.assertEqual(line_order["lines"], [["A", "B", "C", "D"]])
+        self.assertEqual((line_order["stations"]["B"]["left"], line_order["stations"]["B"]["right"]), ("A", "C"))
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.master = MasterNode(tolerance=0.1)
+        self.master.client = FakeClient()
+
+    def counter(self, name, **labels):
+        return counter(self.master, name, **labels)
+
+    def test_messages_and_decode_failures_per_topic(self):
+        for station, table in square_tables().items():
+            payload = json.dumps({"from": station, "data": table}).encode()
+            self.master.on_message(None, None, SimpleNamespace(topic=f"station/{station}/neighbors", payload=payload))
+        self.master.on_message(None, None, SimpleNamespace(topic="station/A/neighbors", payload=b"{not json"))
+        self.master.on_message(None, None, SimpleNamespace(topic="station/A/version", payload=b"{}"))
+        self.assertEqual(self.counter("messages_total", topic="neighbors"), 5)
+        self.assertEqual(self.counter("decode_failures_total", topic="neighbors"), 1)
+        self.assertEqual(self.counter("message_errors_total", topic="version"), 1)
+
+    def test_solve_timings_and_publish(self):
+        send_tables(self.master, square_tables())
+        self.master.reconstruct_topology()
+        snapshot = self.master.metrics.snapshot()
+        timings = {timing["name"]: timing for timing in snapshot["timings"]}
+        for name in ("parse_seconds", "solve_seconds", "graph_seconds", "reconstruct_seconds"):
+            self.assertEqual(timings[name]["count"], 1)
+        gauges = {gauge["name"]: gauge["value"] for gauge in snapshot["gauges"]}
+        self.assertEqual(gauges["stations"], 4)
+        self.assertGreaterEqual(gauges["solver_iterations"], 1)
+        self.assertLess(gauges["solver_stress"], 0.05)
+        self.assertAlmostEqual(gauges["last_publish_timestamp"], time.time(), delta=5)
+        self.assertEqual(self.counter("publishes_total", kind="snapshot"), 1)
+
+
+class TestIngestWorkers(unittest.TestCase):
+    def setUp(self):
+        self.master = MasterNode(tolerance=0.1, ingest_workers=1, ingest_queue_size=2)
+        self.master.client = FakeClient()
+        self.master.start_workers()
+
+    def tearDown(self):
+        self.master.stop_workers()
+
+    def receive(self, station, table):
+        payload = json.dumps({"from": station, "data": table}).encode()
+        self.master.on_message(None, None, SimpleNamespace(topic="station/MASTER/neighbors", payload=payload))
+
+    def counter(self, name, **labels):
+        return counter(self.master, name, **labels)
+
+    def test_only_latest_waiting_table_is_applied(self):
+        with self.master.lock:
+            # The worker blocks on the first table, the next ones wait in the queue
+            self.receive("A", square_tables(0.0)["A"])
+            time.sleep(0.05)
+            for shift in (0.3, 0.6, 0.9):
+                self.receive("A", square_tables(shift)["A"])
+        self.assertTrue(self.master.drain(timeout=2))
+        self.assertEqual(self.master.measurements_raw["A"], square_tables(0.9)["A"])
+        self.assertEqual(self.counter("ingest_coalesced_total", topic="neighbors"), 2)
+
+    def test_full_queue_drops_and_counts(self):
+        with self.master.lock:
+            self.receive("A", square_tables()["A"])
+            time.sleep(0.05)
+            for station in ("B", "C", "D"):
+                self.receive(station, square_tables()[station])
+        self.assertTrue(self.master.drain(timeout=2))
+        self.assertEqual(set(self.master.measurements_raw), {"A", "B", "C"})
+        self.assertEqual(self.counter("ingest_dropped_total", topic="neighbors"), 1)
+        self.assertEqual(self.counter("ingest_backpressure_total"), 1)
+
+
+class TestExpiry(unittest.TestCase):
+    def setUp(self):
+        self.master = MasterNode(tolerance=0.1, ttl=30, max_stations=10)
+        self.master.client = FakeClient()
+
+    def test_silent_stations_leave_the_topology(self):
+        send_tables(self.master, square_tables())
+        self.master.handle_version(json.dumps({"id": "A", "version": "1.0"}))
+        self.master.reconstruct_topology()
+        later = time.monotonic() + 60
+        self.master.measurements_raw.put("B", square_tables()["B"], now=later)
+        self.assertEqual(sorted(self.master.expire_stations(now=later)), ["A", "C", "D"])
+        self.assertEqual(list(self.master.measurements_raw), ["B"])
+        self.assertEqual(len(self.master.versions), 0)
+        self.assertTrue(self.master.reconstruct_topology())
+        self.assertEqual(set(self.master.positions), {"B", "C", "D"})
+
+    def test_everyone_gone_publishes_empty_topology(self):
+        send_tables(self.master, square_tables())
+        self.master.reconstruct_topology()
+        self.master.expire_stations(now=time.monotonic() + 60)
+        self.assertTrue(self.master.reconstruct_topology())
+        topic, message = self.master.client.published[-1]
+        self.assertEqual(message["positions"], {})
+
+    def test_station_cap_evicts_least_recent(self):
+        self.master = MasterNode(tolerance=0.1, max_stations=3)
+        send_tables(self.master, square_tables())
+        self.assertEqual(list(self.master.measurements_raw), ["B", "C", "D"])
+        self.assertIn("A", self.master.dirty)
+
+
+class TestVersionRollout(unittest.TestCase):
+    def setUp(self):
+        self.master = MasterNode()
+        self.master.client = FakeClient()
+        self.master.rollout = Rollout(wave_size=3, max_in_flight=2, wave_interval=0)
+        for i, version in enumerate(["1.9.0", "1.9.0", "1.9.0", "1.10.0"]):
+            self.report(f"S{i}", version)
+
+    def report(self, station, version):
+        self.master.handle_version(json.dumps({"id": station, "version": version}))
+
+    def commands(self):
+        self.master.client.published.clear()
+        self.master.verify_versions()
+        return [topic for topic, _ in self.master.client.published]
+
+    def test_commands_are_staged_and_never_duplicated(self):
+        self.assertEqual(self.commands(), ["station/S0/update", "station/S1/update"])
+        self.assertEqual(self.master.client.published[-1][1]["required_version"], "1.10.0")
+        self.assertEqual(self.commands(), [])
+        self.report("S0", "1.10.0")
+        self.assertEqual(self.commands(), ["station/S2/update"])
+        self.assertEqual(counter(self.master, "updates_acked_total"), 1)
+        self.assertEqual(counter(self.master, "update_commands_total"), 3)
+
+    def test_malformed_version_is_a_decode_failure(self):
+        self.master.on_message(None, None, SimpleNamespace(topic="station/S9/version",
+                                                           payload=b'{"id": "S9", "version": "latest"}'))
+        self.assertNotIn("S9", self.master.versions)
+        self.assertEqual(counter(self.master, "decode_failures_total", topic="version"), 1)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "checkpoint.json.z")
+        self.master = MasterNode(tolerance=0.1)
+        self.master.client = FakeClient()
+        send_tables(self.master, square_tables())
+        self.master.handle_version(json.dumps({"id": "A", "version": "1.2.0"}))
+        self.master.reconstruct_topology()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def restarted(self, **kwargs):
+        master = MasterNode(tolerance=0.1, **kwargs)
+        master.client = FakeClient()
+        return master
+
+    def test_restart_republishes_stale_topology_then_solves_warm(self):
+        self.assertTrue(self.master.save_checkpoint(self.path))
+        master = self.restarted()
+        self.assertTrue(master.restore_checkpoint(self.path))
+        self.assertEqual(dict(master.measurements_raw.items()), square_tables())
+        self.assertEqual(master.versions["A"], "1.2.0")
+        self.assertEqual(master.positions, self.master.positions)
+
+        master.publish_topology("snapshot", master.topology.snapshot())
+        message = master.client.published[-1][1]
+        self.assertTrue(message["stale"])
+        self.assertEqual(message["seq"], 1)
+        self.assertNotEqual(message["epoch"], self.master.topology.epoch)
+        self.assertEqual(message["positions"], self.master.topology.positions)
+
+        send_tables(master, {"A": square_tables()["A"]})
+        self.assertTrue(master.reconstruct_topology())
+        topic, message = master.client.published[-1]
+        self.assertEqual((topic, message["seq"]), ("topology/snapshot", 2))
+        self.assertNotIn("stale", message)
+
+    def test_stations_silent_since_the_checkpoint_expire(self):
+        state = self.master.checkpoint_state()
+        for entry in state["measurements"]:
+            entry[2] -= 0 if entry[0] == "A" else 3600
+        write_checkpoint(self.path, state)
+        master = self.restarted(ttl=60)
+        master.restore_checkpoint(self.path)
+        self.assertEqual(list(master.measurements_raw), ["A"])
+
+    def test_malformed_entries_are_skipped(self):
+        state = self.master.checkpoint_state()
+        state["measurements"].append(["E", [{"id": "A", "dist": 1.0}], state["saved_at"]])
+        state["versions"].append(["E", "not-a-version", state["saved_at"]])
+        write_checkpoint(self.path, state)
+        master = self.restarted()
+        self.assertTrue(master.restore_checkpoint(self.path))
+        self.assertEqual(dict(master.measurements_raw.items()), square_tables())
+        self.assertEqual(dict(master.versions.items()), {"A": "1.2.0"})
+
+    def test_missing_or_corrupt_checkpoint_is_ignored(self):
+        master = self.restarted()
+        self.assertFalse(master.restore_checkpoint(self.path))
+        with open(self.path, "wb") as f:
+            f.write(b"not a checkpoint")
+        self.assertFalse(master.restore_checkpoint(self.path))
+        self.assertEqual(master.topology.seq, 0)
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.master = MasterNode(tolerance=0.1, debounce=0.1, max_delay=2.0)
+        self.master.client = FakeClient()
+        self.master.start_scheduler()
+
+    def tearDown(self):
+        self.master.stop_scheduler()
+
+    def test_burst_is_solved_once_after_it_settles(self):
+        start = time.monotonic()
+        for shift in (0.0, 0.3, 0.6):
+            send_tables(self.master, square_tables(shift))
+            time.sleep(0.02)
+        self.assertTrue(self.master.client.event.wait(2))
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        time.sleep(0.3)
+        self.assertEqual(self.master.solves, 1)
+        self.assertEqual(self.master.dirty, set())
+
+    def test_idle_scheduler_does_not_solve(self):
+        time.sleep(0.3)
+        self.assertEqual(self.master.solves, 0)
+        self.assertEqual(self.master.client.published, [])
+
+    def test_constant_updates_are_solved_by_max_delay(self):
+        self.master.max_delay = 0.3
+        deadline = time.monotonic() + 1.0
+        shift = 0.0
+        while time.monotonic() < deadline and self.master.solves == 0:
+            shift += 0.2
+            send_tables(self.master, {"A": square_tables(shift)["A"]})
+            time.sleep(0.03)
+        self.assertGreaterEqual(self.master.solves, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import random
+import unittest
+
+import numpy as np
+
+import things
+from measurements import MeasurementStore, NeighborTables, aged_variance
+
+
+class TestMeasurementStore(unittest.TestCase):
+    def test_entries_expire_after_ttl(self):
+        store = MeasurementStore(ttl=10)
+        store.put("A", 1, now=0)
+        store.put("B", 2, now=5)
+        store.put("A", 3, now=8)
+        self.assertEqual(store.next_expiry(), 15)
+        self.assertEqual(store.expire(now=16), ["B"])
+        self.assertEqual(store.items(), [("A", 3)])
+        self.assertEqual(store.received("A"), 8)
+        self.assertEqual(store.expire(now=18), [])
+
+    def test_cap_evicts_least_recently_received(self):
+        store = MeasurementStore(max_stations=2)
+        store.put("A", 1, now=0)
+        store.put("B", 1, now=1)
+        self.assertEqual(store.put("A", 2, now=2), [])
+        self.assertEqual(store.put("C", 1, now=3), ["B"])
+        self.assertEqual(set(store), {"A", "C"})
+
+    def test_without_ttl_nothing_expires(self):
+        store = MeasurementStore()
+        store.put("A", 1, now=0)
+        self.assertIsNone(store.next_expiry())
+        self.assertEqual(store.expire(now=1e9), [])
+        self.assertEqual(store["A"], 1)
+
+    def test_aged_variance_doubles_every_halflife(self):
+        self.assertEqual(aged_variance(0.5, 30, None), 0.5)
+        self.assertAlmostEqual(aged_variance(0.5, 30, 30), 1.0)
+        self.assertAlmostEqual(aged_variance(0.5, 60, 30), 2.0)
+
+
+def random_table(rng, station, stations=30):
+    return [{"id": f"S{j}", "dist": rng.uniform(1, 5), "var": rng.uniform(0.01, 0.1)}
+            for j in rng.sample(range(stations), rng.randint(1, 6)) if f"S{j}" != station]
+
+
+def raw_input(store, now=None, halflife=None):
+    """The tables of `store` in parse_input_data's input format, aged like the master used to."""
+    return [(station, [(entry["id"], entry["dist"], aged_variance(entry["var"], now - received, halflife)
+                        if now is not None else entry["var"]) for entry in table])
+            for station, (table, received) in store.snapshot().items()]
+
+
+class TestNeighborTables(unittest.TestCase):
+    def assert_parsed_equal(self, parsed, expected):
+        self.assertEqual(parsed[:3], expected[:3])
+        for column in ("rows", "cols", "dists", "variances"):
+            np.testing.assert_allclose(getattr(parsed[3], column), getattr(expected[3], column))
+
+    def test_parse_matches_parse_input_data(self):
+        rng = random.Random(0)
+        store = NeighborTables(max_stations=20, capacity=8)
+        for step in range(400):
+            station = f"S{rng.randrange(30)}"
+            if step % 7 == 0:
+                store.pop(station)
+            else:
+                store.put(station, random_table(rng, station), now=step)
+        # About 1200 readings were written: dead blocks and ids are reclaimed
+        self.assertLessEqual(len(store.live), 512)
+        self.assertLessEqual(len(store.ids), 30)
+        self.assert_parsed_equal(store.readings().parse(), things.parse_input_data(raw_input(store)))
+
+    def test_variances_are_aged_by_receive_time(self):
+        rng = random.Random(1)
+        store = NeighborTables()
+        for step, station in enumerate(["A", "B", "C", "A"]):
+            store.put(station, random_table(rng, station, 5), now=10 * step)
+        self.assert_parsed_equal(store.readings().parse(now=45, halflife=20),
+                                 things.parse_input_data(raw_input(store, now=45, halflife=20)))
+
+    def test_expired_and_evicted_tables_leave_the_columns(self):
+        store = NeighborTables(ttl=10, max_stations=2)
+        store.put("A", [{"id": "B", "dist": 1.0, "var": 0.1}], now=0)
+        store.put("B", [{"id": "C", "dist": 2.0, "var": 0.1}], now=5)
+        self.assertEqual(store.put("C", [{"id": "D", "dist": 3.0, "var": 0.1}], now=6), ["A"])
+        self.assertEqual(store.expire(now=16), ["B"])
+        point_ids_list, _, _, measurements = store.readings().parse()
+        self.assertEqual(point_ids_list, ["C", "D"])
+        self.assertEqual(list(measurements.dists), [3.0])
+
+    def test_malformed_table_leaves_store_unchanged(self):
+        store = NeighborTables()
+        store.put("A", [{"id": "B", "dist": 1.0, "var": 0.1}], now=0)
+        for table in ([{"id": "B", "dist": 1.0}], [{"id": "C", "dist": "far", "var": 0.1}], [None]):
+            with self.subTest(table=table):
+                with self.assertRaises(ValueError):
+                    store.put("A", table, now=1)
+                self.assertEqual(store.items(), [("A", [{"id": "B", "dist": 1.0, "var": 0.1}])])
+                self.assertEqual(store.readings().parse()[0], ["A", "B"])
+
+    def test_empty_store(self):
+        self.assertEqual(NeighborTables().readings().parse()[:3], ([], {}, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
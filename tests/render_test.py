@@ -0,0 +1,44 @@
+import unittest
+
+import matplotlib.pyplot as plt
+
+from render import FigureRenderer, chart_data, edge_segments
+
+
+POSITIONS = {"A": [0.0, 0.0], "B": [1.0, 0.0], "C": [1.0, 1.0]}
+EDGES = {("A", "B"), ("B", "C"), ("C", "Z")}
+
+
+class TestRender(unittest.TestCase):
+    def test_edge_segments_skip_unknown_stations(self):
+        segments = edge_segments(POSITIONS, EDGES)
+        self.assertEqual(segments.shape, (2, 2, 2))
+        self.assertEqual(edge_segments({}, set()).shape, (0, 2, 2))
+
+    def test_renderer_reuses_one_figure(self):
+        renderer = FigureRenderer(size=(2, 2), dpi=50)
+        figure = renderer.figure
+        open_figures = len(plt.get_fignums())
+        for step in range(5):
+            positions = dict(POSITIONS, D=[step, 2.0])
+            png = renderer.render(positions, EDGES | {("C", "D")})
+            self.assertTrue(png.startswith(b"\x89PNG"))
+        self.assertIs(renderer.figure, figure)
+        self.assertEqual(len(figure.axes), 1)
+        self.assertEqual(len(plt.get_fignums()), open_figures)
+        self.assertEqual(renderer.renders, 5)
+
+    def test_renders_large_graph_without_labels(self):
+        renderer = FigureRenderer(size=(2, 2), dpi=50, labels_up_to=2)
+        renderer.render(POSITIONS, EDGES)
+        self.assertEqual(len(renderer.figure.axes[0].texts), 0)
+
+    def test_chart_data(self):
+        nodes, links = chart_data(POSITIONS, EDGES)
+        self.assertEqual({node["id"] for node in nodes}, {"A", "B", "C"})
+        self.assertEqual(len(links), 2)
+        self.assertEqual(set(links[0]), {"x", "y", "x2", "y2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
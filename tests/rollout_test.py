@@ -0,0 +1,77 @@
+import unittest
+
+from rollout import Rollout, parse_version
+
+
+def fleet(size, version="1.9.0"):
+    return {f"S{i:03d}": version for i in range(size)}
+
+
+class TestParseVersion(unittest.TestCase):
+    def test_components_compare_as_numbers(self):
+        self.assertGreater(parse_version("1.10.0"), parse_version("1.9.0"))
+        self.assertEqual(parse_version("v2.0"), parse_version("2.0.0"))
+        self.assertEqual(parse_version("1.2.3+build7"), parse_version("1.2.3"))
+
+    def test_pre_releases_sort_before_their_release(self):
+        ordered = ["1.0.0-alpha", "1.0.0-alpha.1", "1.0.0-alpha.beta", "1.0.0-beta.2", "1.0.0-beta.11",
+                   "1.0.0-rc.1", "1.0.0"]
+        self.assertEqual(sorted(ordered, key=parse_version), ordered)
+
+    def test_rejects_malformed_versions(self):
+        for text in ("", "latest", "1..2", "1.2.x"):
+            with self.assertRaises(ValueError):
+                parse_version(text)
+
+
+class TestRollout(unittest.TestCase):
+    def setUp(self):
+        self.rollout = Rollout(wave_size=4, max_in_flight=2, wave_interval=30, timeout=100, max_attempts=2)
+        self.versions = fleet(10)
+        self.versions["S009"] = "1.10.0"
+        for station, version in self.versions.items():
+            self.rollout.report(station, version)
+
+    def update(self, station):
+        self.versions[station] = "1.10.0"
+        return self.rollout.report(station, "1.10.0")
+
+    def test_concurrency_is_limited_and_commands_not_repeated(self):
+        self.assertEqual(self.rollout.target, "1.10.0")
+        first = self.rollout.due(self.versions, now=0)
+        self.assertEqual([station for station, _ in first], ["S000", "S001"])
+        self.assertEqual(self.rollout.due(self.versions, now=1), [])
+        self.assertTrue(self.update("S000"))
+        self.assertEqual([station for station, _ in self.rollout.due(self.versions, now=2)], ["S002"])
+
+    def test_waves_wait_for_resolution_and_interval(self):
+        sent = []
+        now = 0
+        while len(sent) < 4:
+            for station, _ in self.rollout.due(self.versions, now=now):
+                sent.append(station)
+                self.update(station)
+            now += 1
+        self.assertEqual(self.rollout.due(self.versions, now=now), [])  # wave done, interval not over
+        self.assertEqual(len(self.rollout.due(self.versions, now=30)), 2)
+
+    def test_timeouts_free_slots_and_give_up_after_max_attempts(self):
+        rollout = Rollout(wave_size=100, max_in_flight=1, timeout=10, max_attempts=2)
+        rollout.report("A", "2.0.0")
+        versions = {"A": "2.0.0", "B": "1.0.0"}
+        self.assertEqual(rollout.due(versions, now=0), [("B", "1.0.0")])
+        self.assertEqual(rollout.due(versions, now=5), [])
+        self.assertEqual(rollout.due(versions, now=11), [("B", "1.0.0")])
+        self.assertEqual(rollout.due(versions, now=22), [])
+        self.assertEqual(rollout.failed, {"B"})
+        self.assertEqual(rollout.timed_out, 2)
+
+    def test_newer_version_restarts_the_rollout(self):
+        self.rollout.due(self.versions, now=0)
+        self.rollout.report("S005", "2.0.0")
+        self.assertEqual(self.rollout.in_flight, {})
+        self.assertEqual(len(self.rollout.due(self.versions, now=1)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+
+import paho.mqtt.client as mqtt
+
+import scanner
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+        self.next_mid = 0
+
+    def publish(self, topic, payload, qos=0):
+        self.next_mid += 1
+        self.published.append((topic, json.loads(payload)))
+        return SimpleNamespace(rc=mqtt.MQTT_ERR_SUCCESS, mid=self.next_mid)
+
+    def reconnect_delay_set(self, min_delay, max_delay):
+        self.delays = (min_delay, max_delay)
+
+
+class TestMqttReporter(unittest.TestCase):
+    def setUp(self):
+        self.reporter = scanner.MqttReporter("localhost", 1883, outbox_size=3)
+        self.client = FakeClient()
+        self.reporter.client = self.client
+
+    def test_reports_wait_in_outbox_while_disconnected(self):
+        self.reporter.send({"n": 1})
+        self.reporter.send({"n": 2})
+        self.assertEqual(self.client.published, [])
+        self.reporter.on_connect(self.client, None, {}, 0)
+        self.assertEqual([payload["n"] for _, payload in self.client.published], [1, 2])
+        self.assertEqual(self.reporter.stats()["outbox"], 0)
+
+    def test_outbox_drops_oldest_reports_when_full(self):
+        for n in range(5):
+            self.reporter.send({"n": n})
+        self.reporter.on_connect(self.client, None, {}, 0)
+        self.assertEqual([payload["n"] for _, payload in self.client.published], [2, 3, 4])
+        self.assertEqual(self.reporter.stats()["dropped"], 2)
+
+    def test_connected_reports_are_published_immediately(self):
+        self.reporter.on_connect(self.client, None, {}, 0)
+        self.reporter.send({"n": 1})
+        self.assertEqual(self.client.published, [(scanner.MQTT_TOPIC, {"n": 1})])
+
+    def test_reconnects_are_counted_and_delay_rejittered(self):
+        self.reporter.on_connect(self.client, None, {}, 0)
+        self.reporter.on_disconnect(self.client, None, 7)
+        self.reporter.on_connect(self.client, None, {}, 0)
+        stats = self.reporter.stats()
+        self.assertEqual((stats["connects"], stats["reconnects"], stats["disconnects"]), (2, 1, 1))
+        min_delay, max_delay = self.client.delays
+        self.assertTrue(0.5 * scanner.RECONNECT_MIN_DELAY <= min_delay <= 1.5 * scanner.RECONNECT_MIN_DELAY)
+        self.assertEqual(max_delay, scanner.RECONNECT_MAX_DELAY)
+
+    def test_refused_connection_keeps_reports_queued(self):
+        self.reporter.send({"n": 1})
+        self.reporter.on_connect(self.client, None, {}, 5)
+        self.assertEqual(self.client.published, [])
+        self.assertEqual(self.reporter.stats()["outbox"], 1)
+
+    def test_publish_latency_is_measured_on_ack(self):
+        self.reporter.on_connect(self.client, None, {}, 0)
+        self.reporter.send({"n": 1})
+        self.assertEqual(self.reporter.stats()["inflight"], 1)
+        self.reporter.on_publish(self.client, None, self.client.next_mid)
+        stats = self.reporter.stats()
+        self.assertEqual((stats["acknowledged"], stats["inflight"]), (1, 0))
+        self.assertGreaterEqual(stats["publish_latency_max"], 0.0)
+        self.assertEqual(stats["publish_latency_avg"], stats["publish_latency_total"])
+
+
+class AckingClient(FakeClient):
+    """Acknowledges every publish from another thread before publish returns, like a fast broker."""
+
+    def __init__(self, reporter):
+        super().__init__()
+        self.reporter = reporter
+
+    def publish(self, topic, payload, qos=0):
+        info = super().publish(topic, payload, qos)
+        # Would block forever if publish were called with reporter.lock held
+        acker = threading.Thread(target=self.reporter.on_publish, args=(self, None, info.mid))
+        acker.start()
+        acker.join(timeout=2)
+        self.blocked = acker.is_alive()
+        return info
+
+
+class TestPublishLocking(unittest.TestCase):
+    def setUp(self):
+        self.reporter = scanner.MqttReporter("localhost", 1883)
+        self.client = AckingClient(self.reporter)
+        self.reporter.client = self.client
+
+    def test_publish_runs_outside_reporter_lock(self):
+        self.reporter.send({"n": 1})
+        self.reporter.on_connect(self.client, None, {}, 0)
+        self.assertFalse(self.client.blocked)
+        self.reporter.send({"n": 2})
+        self.assertFalse(self.client.blocked)
+        stats = self.reporter.stats()
+        self.assertEqual((stats["published"], stats["acknowledged"], stats["inflight"]), (2, 2, 0))
+        self.assertEqual(self.reporter.early_acks, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
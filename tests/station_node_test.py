@@ -0,0 +1,96 @@
+import json
+import time
+import unittest
+
+from ble import RssiTracker, SimulatedAdvertisementSource, distance_variance
+from station_node import StationNode
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0):
+        self.published.append((topic, json.loads(payload)))
+
+
+def make_node(source, **kwargs):
+    node = StationNode("N2", ble_source=source, **kwargs)
+    node.client = FakeClient()
+    return node
+
+
+class TestRssiTracker(unittest.TestCase):
+    def test_converges_to_mean_and_spread(self):
+        tracker = RssiTracker(alpha=0.1)
+        for i in range(500):
+            tracker.update("A", -60 + (2 if i % 2 else -2), timestamp=i)
+        stats = tracker.snapshot(now=500)["A"]
+        self.assertAlmostEqual(stats.mean, -60, delta=0.5)
+        self.assertAlmostEqual(stats.variance, 4.0, delta=0.5)
+        self.assertEqual(stats.count, 500)
+
+    def test_stale_devices_are_forgotten(self):
+        tracker = RssiTracker(max_age=10)
+        tracker.update("old", -70, timestamp=0)
+        tracker.update("new", -70, timestamp=15)
+        self.assertEqual(set(tracker.snapshot(now=20)), {"new"})
+        self.assertNotIn("old", tracker.devices)
+
+    def test_distance_variance_grows_with_distance_and_noise(self):
+        self.assertGreater(distance_variance(4.0, 4.0), distance_variance(1.0, 4.0))
+        self.assertGreater(distance_variance(2.0, 9.0), distance_variance(2.0, 1.0))
+        self.assertGreater(distance_variance(1.0, 0.0), 0)
+
+
+class TestStationNodeScanning(unittest.TestCase):
+    def test_simulated_stream_yields_smoothed_distances(self):
+        source = SimulatedAdvertisementSource({"MASTER_N1": 2.0, "NODE_N3": 5.0}, noise_db=1.0, seed=1)
+        node = make_node(source)
+        for _ in range(300):
+            source.advertise(node.on_advertisement)
+        table = {entry["id"]: entry for entry in node.neighbor_table()}
+        self.assertAlmostEqual(table["MASTER_N1"]["dist"], 2.0, delta=0.4)
+        self.assertAlmostEqual(table["NODE_N3"]["dist"], 5.0, delta=1.0)
+
+    def test_variance_reflects_signal_noise(self):
+        quiet = SimulatedAdvertisementSource({"A": 3.0}, noise_db=0.5, seed=2)
+        noisy = SimulatedAdvertisementSource({"B": 3.0}, noise_db=4.0, seed=3)
+        node = make_node(quiet)
+        for _ in range(300):
+            quiet.advertise(node.on_advertisement)
+            noisy.advertise(node.on_advertisement)
+        table = {entry["id"]: entry for entry in node.neighbor_table()}
+        self.assertGreater(table["B"]["var"], 5 * table["A"]["var"])
+
+    def test_master_discovered_from_advertisement(self):
+        source = SimulatedAdvertisementSource({"MASTER_N1": 1.0}, seed=4)
+        node = make_node(source)
+        self.assertIsNone(node.known_master)
+        source.advertise(node.on_advertisement)
+        self.assertEqual(node.known_master, "N1")
+
+        node.publish_neighbors()
+        topic, payload = node.client.published[-1]
+        self.assertEqual(topic, "station/N1/neighbors")
+        self.assertEqual(payload["from"], "N2")
+        self.assertEqual([entry["id"] for entry in payload["data"]], ["MASTER_N1"])
+
+    def test_background_scan_runs_until_stopped(self):
+        source = SimulatedAdvertisementSource({"MASTER_N1": 1.0, "NODE_N3": 2.0}, interval=0.01, seed=5)
+        node = make_node(source)
+        node.start_scanning()
+        try:
+            deadline = time.time() + 2
+            while time.time() < deadline and node.rssi.devices.get("NODE_N3") is None:
+                time.sleep(0.01)
+            time.sleep(0.05)
+        finally:
+            node.stop_scanning()
+        self.assertIsNone(node.scan_thread)
+        self.assertGreater(node.rssi.devices["NODE_N3"].count, 1)
+        self.assertEqual(node.known_master, "N1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import json
+import socket
+import unittest
+
+from stream import SseServer, StreamHub
+
+
+def events(frames):
+    """(id, event, data) of SSE frames."""
+    parsed = []
+    for frame in b"".join(frames).decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines() if ": " in line and not line.startswith(":"))
+        if fields:
+            parsed.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+class TestStreamHub(unittest.TestCase):
+    def setUp(self):
+        self.hub = StreamHub(buffer_size=8, max_lag=4, snapshot=lambda: [("topology", {"kind": "snapshot"})])
+
+    def test_new_client_gets_state_then_live_events(self):
+        self.hub.publish("topology", {"seq": 1})
+        client = self.hub.open()
+        self.hub.publish("neighbors", {"station": "st1"})
+        received = events(self.hub.poll(client))
+        self.assertEqual([(event, data) for _, event, data in received],
+                         [("topology", {"kind": "snapshot"}), ("neighbors", {"station": "st1"})])
+        self.assertEqual(received[-1][0], self.hub.token(2))
+        self.assertEqual(self.hub.poll(client), [])
+
+    def test_resume_replays_missed_events(self):
+        client = self.hub.open()
+        self.hub.poll(client)
+        self.hub.publish("topology", {"seq": 1})
+        token = events(self.hub.poll(client))[-1][0]
+        self.hub.publish("topology", {"seq": 2})
+        self.hub.publish("topology", {"seq": 3})
+        resumed = self.hub.open(token)
+        self.assertEqual([data for _, _, data in events(self.hub.poll(resumed))], [{"seq": 2}, {"seq": 3}])
+
+    def test_unknown_or_expired_token_gets_fresh_state(self):
+        for token in ("other-1", "garbage", self.hub.token(0)):
+            self.hub.publish("topology", {})
+        for _ in range(5):
+            self.hub.publish("topology", {})
+        for token in ("other-1", "garbage", self.hub.token(1)):
+            client = self.hub.open(token)
+            self.assertEqual(events(self.hub.poll(client))[0][2], {"kind": "snapshot"})
+
+    def test_slow_client_is_evicted(self):
+        client = self.hub.open()
+        for seq in range(5):
+            self.hub.publish("topology", {"seq": seq})
+        self.assertIsNone(self.hub.poll(client))
+        self.assertEqual(self.hub.evicted, 1)
+
+
+class TestSseServer(unittest.TestCase):
+    def setUp(self):
+        self.hub = StreamHub(snapshot=lambda: [("neighbors", {"kind": "snapshot", "stations": {}})])
+        self.server = SseServer(self.hub, host="127.0.0.1", port=0, heartbeat=0.2).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def connect(self, path="/stream", headers=""):
+        sock = socket.create_connection(("127.0.0.1", self.server.port), timeout=2)
+        sock.sendall(f"GET {path} HTTP/1.1\r\nHost: test\r\n{headers}\r\n".encode())
+        return sock
+
+    def read_until(self, sock, marker):
+        data = b""
+        while marker not in data:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def test_subscribers_receive_published_events(self):
+        sockets = [self.connect() for _ in range(3)]
+        for sock in sockets:
+            self.assertIn(b"200 OK", self.read_until(sock, b'"stations"'))
+        self.hub.publish("topology", {"kind": "delta", "seq": 7})
+        for sock in sockets:
+            self.assertIn(b'data: {"kind":"delta","seq":7}', self.read_until(sock, b'"seq":7}'))
+            sock.close()
+
+    def test_resume_with_last_event_id(self):
+        self.hub.publish("topology", {"seq": 1})
+        self.hub.publish("topology", {"seq": 2})
+        sock = self.connect(headers=f"Last-Event-ID: {self.hub.token(1)}\r\n")
+        data = self.read_until(sock, b'"seq":2}')
+        sock.close()
+        self.assertNotIn(b'"seq":1}', data)
+        self.assertNotIn(b'"stations"', data)
+
+    def test_idle_stream_gets_keepalives_and_unknown_paths_404(self):
+        sock = self.connect()
+        self.assertIn(b": keepalive", self.read_until(sock, b": keepalive"))
+        sock.close()
+        sock = self.connect("/other")
+        self.assertIn(b"404", self.read_until(sock, b"\r\n\r\n"))
+        sock.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,568 @@
+import contextlib
+import io
+import time
+import unittest
+
+import numpy as np
+
+import solvers
+import things
+
+# Same inputs as the examples in things.py's __main__ block
+EXAMPLES = {
+    "example_input": [
+        ('A', [('B', 1.0, 0.01), ('C', 2.0, 0.05), ('D', 1.5, 0.02)]),
+        ('B', [('A', 1.05, 0.015), ('C', 1.2, 0.03), ('E', 2.5, 0.1)]),
+        ('C', [('A', 1.95, 0.04), ('B', 1.15, 0.025)]),
+        ('D', [('A', 1.55, 0.025), ('E', 1.0, 0.01)]),
+        ('E', [('B', 2.4, 0.09), ('D', 0.95, 0.015)])
+    ],
+    "example_input_2": [
+        ('N1', [('N2', 10.0, 0.1), ('N3', 14.14, 0.2)]),
+        ('N2', [('N1', 10.2, 0.1), ('N3', 10.0, 0.1)]),
+        ('N3', [('N1', 13.9, 0.15), ('N2', 9.8, 0.12), ('N4', 7.07, 0.1)]),
+        ('N4', [('N3', 7.0, 0.1)])
+    ],
+    "example_input_minimal": [('P1', [('P2', 5.0, 0.01)])],
+    "example_input_single": [('S1', [])],
+    "example_input_three_collinear": [
+        ('X', [('Y', 1.0, 0.01)]),
+        ('Y', [('X', 1.0, 0.01), ('Z', 1.0, 0.01)]),
+        ('Z', [('Y', 1.0, 0.01), ('X', 1.0, 0.01)])
+    ],
+}
+
+
+def loop_step(points, distances, variances, step_size, simultaneous=False):
+    """
+    Reference copy of the original per-pair loop implementation of things.step.
+    The loop moves the points one after the other; with `simultaneous` every
+    pull is computed from the points as they were before the step, which is
+    what the vectorized step does.
+    """
+    before = points.copy()
+    points = points.copy()
+    avg_weight = 0
+    nn = 0
+    for i in range(2, points.shape[0]):
+        point = points[i]
+        attraction = np.zeros(2)
+        for j in range(points.shape[0]):
+            if i == j:
+                continue
+            dist = distances[i, j]
+            if dist == 0:
+                continue
+            other_point = before[j] if simultaneous else points[j]
+            diff_p = other_point - point
+            cur_dist = np.linalg.norm(diff_p)
+            dist_need = cur_dist - dist
+            attraction += (other_point - point) * things.weigth(dist_need, dist, variances[i, j])
+            avg_weight += abs(things.weigth(dist_need, dist, variances[i, j]))
+            nn += 1
+        points[i] = point + step_size * attraction
+    return points, avg_weight / nn if nn > 0 else 0
+
+
+def dense_matrices(num_points, measurements):
+    dist_mat = np.zeros((num_points, num_points))
+    var_mat = np.zeros((num_points, num_points))
+    for (idx1, idx2), (dist, var) in measurements.items():
+        dist_mat[idx1, idx2] = dist_mat[idx2, idx1] = dist
+        var_mat[idx1, idx2] = var_mat[idx2, idx1] = var
+    return dist_mat, var_mat
+
+
+def dense_loop_step(points, edges, step_size):
+    """loop_step behind the edge-list signature of things.step."""
+    dist_mat, var_mat = dense_matrices(points.shape[0], edges)
+    return loop_step(points, dist_mat, var_mat, step_size)
+
+
+def solve_with_step(raw_data, step_fn, seed):
+    point_ids_list, _, idx_to_id, measurements = things.parse_input_data(raw_data)
+    original_step = things.step
+    things.step = step_fn
+    np.random.seed(seed)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            positions = things.calculate_positions(point_ids_list, idx_to_id, measurements)
+    finally:
+        things.step = original_step
+    return positions, measurements, point_ids_list
+
+
+def mean_residual(positions, measurements, point_ids_list):
+    coords = np.array([positions[pid] for pid in point_ids_list])
+    return np.mean([abs(np.linalg.norm(coords[i] - coords[j]) - dist)
+                    for (i, j), (dist, _) in measurements.items()])
+
+
+def grid_layout_input(num_points=24, moved=None, seed=0):
+    """Synthetic station grid where every station measures its 6 closest stations."""
+    rng = np.random.default_rng(seed)
+    coords = np.c_[np.arange(num_points) % 6 * 3.0, np.arange(num_points) // 6 * 3.0]
+    coords += rng.normal(0, 0.3, coords.shape)
+    if moved is not None:
+        coords[moved] += 0.5
+    raw_data = []
+    for i in range(num_points):
+        dists = np.linalg.norm(coords - coords[i], axis=1)
+        raw_data.append((f"S{i:02d}", [(f"S{j:02d}", float(dists[j]), 0.05)
+                                       for j in np.argsort(dists)[1:7]]))
+    return raw_data
+
+
+def count_iterations(raw_data, initial_positions=None):
+    calls = []
+    original_step = things.step
+
+    def counting_step(*args, **kwargs):
+        calls.append(1)
+        return original_step(*args, **kwargs)
+
+    point_ids_list, _, idx_to_id, measurements = things.parse_input_data(raw_data)
+    things.step = counting_step
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            positions = things.calculate_positions(point_ids_list, idx_to_id, measurements, initial_positions)
+    finally:
+        things.step = original_step
+    return positions, len(calls)
+
+
+class TestVectorizedStep(unittest.TestCase):
+    def setUp(self):
+        point_ids_list, _, _, self.measurements = things.parse_input_data(EXAMPLES["example_input"])
+        self.dist_mat, self.var_mat = dense_matrices(len(point_ids_list), self.measurements)
+        self.points = np.random.default_rng(0).random((len(point_ids_list), 2)) * 2
+
+    def test_anchors_stay_fixed(self):
+        new_points, _ = things.step(self.points.copy(), self.measurements, 0.01)
+        np.testing.assert_array_equal(new_points[:2], self.points[:2])
+
+    def test_first_free_point_matches_loop(self):
+        # The loop updates points in place, so only the first free point sees
+        # exactly the same neighbours in both implementations.
+        new_points, _ = things.step(self.points.copy(), self.measurements, 0.01)
+        loop_points, _ = loop_step(self.points.copy(), self.dist_mat, self.var_mat, 0.01)
+        np.testing.assert_allclose(new_points[2], loop_points[2])
+
+    def test_single_free_point_matches_loop(self):
+        point_ids_list, _, _, measurements = things.parse_input_data(EXAMPLES["example_input_three_collinear"])
+        dist_mat, var_mat = dense_matrices(len(point_ids_list), measurements)
+        points = np.array([[0.0, 0.0], [1.0, 0.0], [0.3, 0.7]])
+        new_points, weight = things.step(points.copy(), measurements, 0.05)
+        loop_points, loop_weight = loop_step(points.copy(), dist_mat, var_mat, 0.05)
+        np.testing.assert_allclose(new_points, loop_points)
+        self.assertAlmostEqual(weight, loop_weight)
+
+    def test_unmeasured_pairs_are_skipped(self):
+        keep = (self.measurements.rows != 2) & (self.measurements.cols != 2)
+        edges = solvers.EdgeList(self.measurements.rows[keep], self.measurements.cols[keep],
+                                 self.measurements.dists[keep], self.measurements.variances[keep])
+        new_points, _ = things.step(self.points.copy(), edges, 0.01)
+        np.testing.assert_array_equal(new_points[2], self.points[2])
+
+    def test_mean_weight_matches_loop_from_same_points(self):
+        # The loop counts every measured pair once per free endpoint
+        _, weight = things.step(self.points.copy(), self.measurements, 0.0)
+        _, loop_weight = loop_step(self.points.copy(), self.dist_mat, self.var_mat, 0.0)
+        self.assertAlmostEqual(weight, loop_weight)
+
+    def test_examples_follow_loop_steps(self):
+        for name, raw_data in EXAMPLES.items():
+            with self.subTest(example=name):
+                point_ids_list, _, _, measurements = things.parse_input_data(raw_data)
+                dist_mat, var_mat = dense_matrices(len(point_ids_list), measurements)
+                points = loop_points = np.random.default_rng(1).random((len(point_ids_list), 2)) * 5
+                for _ in range(25):
+                    points, weight = things.step(points, measurements, 0.05)
+                    loop_points, loop_weight = loop_step(loop_points, dist_mat, var_mat, 0.05, simultaneous=True)
+                    np.testing.assert_allclose(points, loop_points, rtol=1e-12, atol=1e-12)
+                    self.assertAlmostEqual(weight, loop_weight, places=12)
+
+    def test_examples_fit_measurements_like_loop(self):
+        for name, raw_data in EXAMPLES.items():
+            if name == "example_input_single":
+                continue  # nothing measured to fit
+            with self.subTest(example=name):
+                loop_result = solve_with_step(raw_data, dense_loop_step, seed=1)
+                vector_result = solve_with_step(raw_data, things.step, seed=1)
+                self.assertLess(mean_residual(*loop_result), 1e-4)
+                self.assertLess(mean_residual(*vector_result), 1e-4)
+
+
+class TestWarmStart(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.previous, _ = count_iterations(grid_layout_input())
+
+    def test_warm_start_needs_fewer_iterations(self):
+        # On the master's default engine: the gradient engine stops in a different
+        # local minimum per random start, so its iteration counts do not compare
+        for num_points in (24, 60, 120):
+            for seed in range(4):
+                with self.subTest(num_points=num_points, seed=seed), contextlib.redirect_stdout(io.StringIO()):
+                    previous, _ = things.solve_point_positions_and_graph(
+                        grid_layout_input(num_points, seed=seed), engine="smacof")
+                    moved = grid_layout_input(num_points, moved=10, seed=seed)
+                    _, _, cold = things.solve_point_positions_and_graph(moved, engine="smacof", return_report=True)
+                    _, _, warm = things.solve_point_positions_and_graph(moved, engine="smacof", return_report=True,
+                                                                        initial_positions=previous)
+                    self.assertLess(warm.iterations, cold.iterations)
+                    self.assertLess(warm.stress, cold.stress * 1.25)  # same minimum, up to the tolerance
+
+    def test_known_points_start_from_previous_positions(self):
+        point_ids_list, _, idx_to_id, measurements = things.parse_input_data(grid_layout_input())
+        points = things.initial_points(len(point_ids_list), idx_to_id, measurements, self.previous)
+        for i in range(2, len(point_ids_list)):
+            np.testing.assert_array_equal(points[i], self.previous[idx_to_id[i]])
+
+    def test_new_point_is_placed_next_to_its_neighbors(self):
+        raw_data = grid_layout_input()
+        previous = {pid: pos for pid, pos in self.previous.items() if pid != "S23"}
+        point_ids_list, id_to_idx, idx_to_id, measurements = things.parse_input_data(raw_data)
+        points = things.initial_points(len(point_ids_list), idx_to_id, measurements, previous)
+        new_idx = id_to_idx["S23"]
+        for (idx1, idx2), (dist, _) in measurements.items():
+            if new_idx in (idx1, idx2):
+                self.assertAlmostEqual(np.linalg.norm(points[idx1] - points[idx2]), dist, delta=1.5)
+
+    def test_stale_points_are_dropped(self):
+        previous = dict(self.previous, GONE=np.array([100.0, 100.0]))
+        positions, _ = count_iterations(grid_layout_input(), previous)
+        self.assertNotIn("GONE", positions)
+        self.assertEqual(set(positions), set(self.previous))
+
+
+class TestSolverEngines(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        point_ids_list, _, self.idx_to_id, self.measurements = things.parse_input_data(grid_layout_input())
+        self.point_ids_list = point_ids_list
+
+    def solve(self, engine, initial_positions=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return things.solve_positions(self.point_ids_list, self.idx_to_id, self.measurements,
+                                          initial_positions, engine)
+
+    def test_every_engine_reports(self):
+        for engine in things.SOLVER_ENGINES:
+            with self.subTest(engine=engine):
+                positions, report = self.solve(engine)
+                self.assertEqual(set(positions), set(self.point_ids_list))
+                self.assertEqual(report.engine, engine)
+                self.assertEqual(report.num_points, len(self.point_ids_list))
+                self.assertGreaterEqual(report.iterations, 1)
+                self.assertGreaterEqual(report.wall_time, 0)
+                self.assertTrue(np.isfinite(report.stress))
+
+    def test_smacof_fits_consistent_measurements(self):
+        positions, report = self.solve("smacof")
+        self.assertLess(report.stress, 1e-4)
+        self.assertLess(mean_residual(positions, self.measurements, self.point_ids_list), 1e-3)
+
+    def test_smacof_is_not_worse_than_mds_initializer(self):
+        _, mds_report = self.solve("mds")
+        _, smacof_report = self.solve("smacof")
+        self.assertLessEqual(smacof_report.stress, mds_report.stress)
+
+    def test_solution_is_in_anchor_frame(self):
+        positions, _ = self.solve("smacof")
+        np.testing.assert_allclose(positions[self.idx_to_id[0]], [0, 0], atol=1e-9)
+        self.assertAlmostEqual(positions[self.idx_to_id[1]][1], 0, places=9)
+        self.assertGreater(positions[self.idx_to_id[1]][0], 0)
+
+    def test_warm_started_smacof_stays_in_previous_frame(self):
+        previous, _ = self.solve("smacof")
+        shifted = {pid: pos + np.array([5.0, -3.0]) for pid, pos in previous.items()}
+        positions, _ = self.solve("smacof", shifted)
+        for pid in positions:
+            np.testing.assert_allclose(positions[pid], shifted[pid], atol=1e-2)
+
+    def test_unknown_engine_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.solve("simulated-annealing")
+
+    def test_report_is_returned_on_request(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            positions, graph, report = things.solve_point_positions_and_graph(
+                EXAMPLES["example_input_2"], engine="mds", return_report=True)
+        self.assertEqual(report.engine, "mds")
+        self.assertEqual(set(graph), set(positions))
+
+
+class TestSparseMeasurements(unittest.TestCase):
+    def setUp(self):
+        self.point_ids_list, self.id_to_idx, _, self.measurements = things.parse_input_data(EXAMPLES["example_input"])
+
+    def test_parse_keeps_one_averaged_edge_per_pair(self):
+        edges = self.measurements
+        self.assertEqual(len(edges), 6)
+        self.assertTrue(np.all(edges.rows < edges.cols))
+        dist, var = edges.pair(self.id_to_idx["B"], self.id_to_idx["A"])
+        self.assertAlmostEqual(dist, 1.025)
+        self.assertAlmostEqual(var, 0.0125)
+        self.assertIsNone(edges.pair(self.id_to_idx["C"], self.id_to_idx["E"]))
+
+    def test_csr_lists_every_neighbor_both_ways(self):
+        indptr, indices, dists = self.measurements.to_csr(len(self.point_ids_list))
+        a = self.id_to_idx["A"]
+        neighbors = dict(zip(indices[indptr[a]:indptr[a + 1]], dists[indptr[a]:indptr[a + 1]]))
+        self.assertEqual(set(neighbors), {self.id_to_idx[pid] for pid in "BCD"})
+        self.assertAlmostEqual(neighbors[self.id_to_idx["D"]], 1.525)
+
+    def test_large_layout_uses_landmark_mds(self):
+        np.random.seed(0)
+        raw_data = grid_layout_input(num_points=solvers.FULL_MDS_MAX_POINTS + 40)
+        point_ids_list, _, idx_to_id, measurements = things.parse_input_data(raw_data)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, report = things.solve_positions(point_ids_list, idx_to_id, measurements, engine="smacof")
+        self.assertLess(report.stress, 1e-3)
+
+
+def brute_force_graph(positions_dict, k):
+    """Reference copy of the original all-pairs build_graph, with k instead of 2."""
+    point_ids = list(positions_dict.keys())
+    unique_edges = set()
+    for p1_id in point_ids:
+        distances_to_others = sorted((np.linalg.norm(np.array(positions_dict[p1_id]) - positions_dict[p2_id]), p2_id)
+                                     for p2_id in point_ids if p2_id != p1_id)
+        for _, neighbor_id in distances_to_others[:k]:
+            unique_edges.add(frozenset({p1_id, neighbor_id}))
+    return unique_edges
+
+
+def graph_edges(adj_list):
+    return {frozenset({u, v}) for u, neighbors in adj_list.items() for v in neighbors}
+
+
+class TestBuildGraph(unittest.TestCase):
+    def test_matches_all_pairs_graph(self):
+        rng = np.random.default_rng(3)
+        layouts = {
+            "plane": rng.random((150, 2)) * 40,
+            "line": np.c_[np.sort(rng.random(60)) * 100, rng.random(60) * 0.01],
+            "clusters": np.vstack([rng.random((30, 2)), rng.random((30, 2)) + 500]),
+        }
+        for name, coords in layouts.items():
+            positions = {f"P{i}": coords[i] for i in range(len(coords))}
+            for k in (1, 2, 4):
+                with self.subTest(layout=name, k=k):
+                    self.assertEqual(graph_edges(things.build_graph(positions, k)),
+                                     brute_force_graph(positions, k))
+
+    def test_adjacency_is_symmetric_with_every_point_as_key(self):
+        positions = {"A": [0, 0], "B": [1, 0], "C": [5, 0], "D": [5, 1]}
+        graph = things.build_graph(positions, k=1)
+        self.assertEqual(set(graph), set(positions))
+        for u, neighbors in graph.items():
+            for v in neighbors:
+                self.assertIn(u, graph[v])
+
+    def test_k_larger_than_point_count(self):
+        graph = things.build_graph({"A": [0, 0], "B": [1, 0], "C": [0, 1]}, k=5)
+        self.assertEqual(graph_edges(graph), {frozenset("AB"), frozenset("AC"), frozenset("BC")})
+
+    def test_single_point(self):
+        self.assertEqual(things.build_graph({"A": [0, 0]}), {"A": []})
+
+
+def line_input(num_points=25, reach=2):
+    """Stations 1 m apart on a straight line, each measuring the ones within `reach` places."""
+    raw_data = []
+    for i in range(num_points):
+        neighbors = [(f"S{j:02d}", float(abs(i - j)), 0.01)
+                     for j in range(max(i - reach, 0), min(i + reach + 1, num_points)) if j != i]
+        raw_data.append((f"S{i:02d}", neighbors))
+    return raw_data
+
+
+class TestMultiStart(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.point_ids_list, _, self.idx_to_id, self.measurements = things.parse_input_data(line_input())
+        # Second half of the line folded back onto the first
+        self.folded = {pid: np.array([i if i < 13 else 24 - i, 0.3 if i >= 13 else 0.0])
+                       for i, pid in enumerate(self.point_ids_list)}
+
+    def solve(self, engine, initial_positions=None):
+        return things.solve_positions(self.point_ids_list, self.idx_to_id, self.measurements,
+                                      initial_positions, engine)
+
+    def test_escapes_folded_warm_start(self):
+        _, smacof_report = self.solve("smacof", self.folded)
+        positions, report = self.solve("multistart", self.folded)
+        self.assertGreater(smacof_report.stress, 1e-3)
+        self.assertLess(report.stress, 1e-6)
+        self.assertLess(mean_residual(positions, self.measurements, self.point_ids_list), 1e-3)
+
+    def test_fixed_seed_is_reproducible(self):
+        runs = [things.multistart_engine(self.point_ids_list, self.idx_to_id, self.measurements, self.folded,
+                                         starts=4, seed=7, time_budget=None, prune_ratio=float("inf"),
+                                         parallel_min_points=parallel_min_points)
+                for parallel_min_points in (10 ** 6, 10 ** 6, 0)]
+        for points, iterations in runs[1:]:
+            np.testing.assert_array_equal(points, runs[0][0])
+            self.assertEqual(iterations, runs[0][1])
+
+    def test_poor_starts_are_pruned(self):
+        kwargs = dict(starts=6, seed=1, time_budget=None)
+        _, kept = things.multistart_engine(self.point_ids_list, self.idx_to_id, self.measurements, self.folded,
+                                           prune_ratio=float("inf"), **kwargs)
+        _, pruned = things.multistart_engine(self.point_ids_list, self.idx_to_id, self.measurements, self.folded,
+                                             **kwargs)
+        self.assertLess(pruned, kept)
+
+    def test_time_budget_stops_descent(self):
+        _, iterations = things.multistart_engine(self.point_ids_list, self.idx_to_id, self.measurements,
+                                                 self.folded, time_budget=0)
+        self.assertEqual(iterations, 0)
+
+    def test_time_budget_limits_round_length(self):
+        point_ids_list, _, idx_to_id, measurements = things.parse_input_data(shuffled_line_input()[0])
+        start = time.perf_counter()
+        _, iterations = things.multistart_engine(point_ids_list, idx_to_id, measurements, time_budget=0.3,
+                                                 chunk_iterations=10 ** 6, max_iterations=10 ** 6, tolerance=-1)
+        self.assertLess(time.perf_counter() - start, 1.5)
+        self.assertGreater(iterations, 0)
+
+    def test_options_through_solve_positions(self):
+        options = {"seed": 3, "starts": 3, "time_budget": None}
+        runs = [things.solve_positions(self.point_ids_list, self.idx_to_id, self.measurements, self.folded,
+                                       "multistart", options) for _ in range(2)]
+        for pid in self.point_ids_list:
+            np.testing.assert_array_equal(runs[0][0][pid], runs[1][0][pid])
+        with self.assertRaises(ValueError):
+            things.solve_positions(self.point_ids_list, self.idx_to_id, self.measurements, engine="smacof",
+                                   engine_options={"seed": 3})
+
+
+def shuffled_line_input(num_points=40, seed=0):
+    """A slightly wavy line with noisy readings, station ids in random order along it."""
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(0.8, 1.5, num_points))
+    y = rng.normal(0, 0.1, num_points)
+    names = [f"S{i:02d}" for i in rng.permutation(num_points)]
+    raw_data = []
+    for i in range(num_points):
+        neighbors = [(names[j], float(np.hypot(x[i] - x[j], y[i] - y[j]) + rng.normal(0, 0.03)), 0.001)
+                     for j in range(max(i - 3, 0), min(i + 4, num_points)) if j != i]
+        raw_data.append((names[i], neighbors))
+    return raw_data, names
+
+
+class TestLineOrder(unittest.TestCase):
+    def test_recovers_order_along_line(self):
+        raw_data, names = shuffled_line_input()
+        result = things.order_lines(raw_data)
+        self.assertEqual(len(result["lines"]), 1)
+        line = result["lines"][0]
+        self.assertIn(line, (names, names[::-1]))
+        # Without history the end with the lower id is on the left
+        self.assertLess(line[0], line[-1])
+        stations = result["stations"]
+        self.assertEqual((stations[line[0]]["left"], stations[line[0]]["right"]), (None, line[1]))
+        self.assertEqual((stations[line[5]]["left"], stations[line[5]]["right"]), (line[4], line[6]))
+        self.assertEqual(stations[line[-1]]["right"], None)
+        self.assertEqual(stations[line[0]]["offset"], 0.0)
+        self.assertEqual([stations[pid]["order"] for pid in line], list(range(len(line))))
+
+    def test_keeps_previous_orientation(self):
+        raw_data, _ = shuffled_line_input()
+        first = things.order_lines(raw_data)
+        flipped = {"stations": {pid: dict(entry, offset=-entry["offset"])
+                                for pid, entry in first["stations"].items()}}
+        self.assertEqual(things.order_lines(raw_data, first)["lines"], first["lines"])
+        self.assertEqual(things.order_lines(raw_data, flipped)["lines"], [first["lines"][0][::-1]])
+
+    def test_every_component_is_a_line(self):
+        raw_data = [('A', [('B', 1.0, 0.01), ('C', 2.0, 0.01)]), ('B', [('C', 1.0, 0.01)]),
+                    ('D', [('E', 1.0, 0.01)]), ('S', [])]
+        result = things.order_lines(raw_data)
+        self.assertEqual(result["lines"], [['A', 'B', 'C'], ['D', 'E'], ['S']])
+        self.assertEqual(result["stations"]["S"], {"line": 2, "order": 0, "offset": 0.0,
+                                                   "left": None, "right": None})
+        self.assertEqual(things.order_lines([]), {"lines": [], "stations": {}})
+
+    def test_line_engine_fits_straight_line(self):
+        point_ids_list, _, idx_to_id, measurements = things.parse_input_data(line_input())
+        positions, report = things.solve_positions(point_ids_list, idx_to_id, measurements, engine="line")
+        self.assertLess(report.stress, 1e-6)
+        np.testing.assert_allclose([positions[pid][1] for pid in point_ids_list], 0, atol=1e-9)
+
+
+def plant_input(lines=3, stations_per_line=24):
+    """Several disconnected grids whose station ids interleave in sorted order."""
+    raw_data = []
+    for line in range(lines):
+        for station, neighbors in grid_layout_input(stations_per_line, seed=line):
+            raw_data.append((f"{station}L{line}", [(f"{n}L{line}", d, v) for n, d, v in neighbors]))
+    return raw_data
+
+
+class TestComponents(unittest.TestCase):
+    def test_split_keeps_every_point_and_edge(self):
+        point_ids_list, _, _, measurements = things.parse_input_data(plant_input())
+        components = things.split_components(point_ids_list, measurements)
+        self.assertEqual(len(components), 3)
+        self.assertEqual(sorted(pid for ids, _, _ in components for pid in ids), point_ids_list)
+        self.assertEqual(sum(len(edges) for _, _, edges in components), len(measurements))
+        for ids, idx_to_id, edges in components:
+            self.assertEqual(len({pid[-2:] for pid in ids}), 1)
+            self.assertTrue((edges.rows < edges.cols).all())
+            self.assertIsNotNone(edges.pair(0, 1))
+
+    def test_anchor_pair_is_measured(self):
+        raw_data = [('A', [('C', 1.0, 0.01)]), ('B', [('D', 2.0, 0.01)]), ('C', [('E', 1.0, 0.01)])]
+        point_ids_list, _, _, measurements = things.parse_input_data(raw_data)
+        components = things.split_components(point_ids_list, measurements)
+        self.assertEqual([ids for ids, _, _ in components], [['A', 'C', 'E'], ['B', 'D']])
+
+    def test_self_readings_are_ignored(self):
+        raw_data = [('A', [('A', 0.0, 0.01), ('B', 1.0, 0.01), ('C', 1.0, 0.01)]), ('B', [('C', 1.0, 0.01)])]
+        point_ids_list, _, _, measurements = things.parse_input_data(raw_data)
+        self.assertTrue((measurements.rows != measurements.cols).all())
+        components = things.split_components(point_ids_list, measurements)
+        self.assertEqual([ids for ids, _, _ in components], [['A', 'B', 'C']])
+        with contextlib.redirect_stdout(io.StringIO()):
+            positions, report, _ = things.solve_components(point_ids_list, measurements, engine="smacof")
+        self.assertLess(report.stress, 1e-6)
+        self.assertAlmostEqual(float(np.linalg.norm(positions['A'] - positions['C'])), 1.0, places=4)
+
+    def test_components_solved_in_own_frames(self):
+        raw_data = plant_input()
+        point_ids_list, _, _, measurements = things.parse_input_data(raw_data)
+        for parallel_min_points in (0, 10 ** 6):
+            with self.subTest(parallel_min_points=parallel_min_points):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    positions, report, components = things.solve_components(
+                        point_ids_list, measurements, engine="smacof", parallel_min_points=parallel_min_points)
+                self.assertLess(report.stress, 0.05)
+                self.assertEqual(report.num_points, len(point_ids_list))
+                for ids, _, _ in components:
+                    np.testing.assert_allclose(positions[ids[0]], [0, 0], atol=1e-9)
+                    self.assertAlmostEqual(positions[ids[1]][1], 0, places=9)
+
+    def test_graph_never_links_components(self):
+        raw_data = [('A', [('B', 1.0, 0.01)]), ('C', [('D', 1.0, 0.01)]), ('S', [])]
+        with contextlib.redirect_stdout(io.StringIO()):
+            positions, graph = things.solve_point_positions_and_graph(raw_data, engine="smacof")
+        self.assertEqual(set(positions), {'A', 'B', 'C', 'D', 'S'})
+        self.assertEqual(graph_edges(graph), {frozenset("AB"), frozenset("CD")})
+        self.assertEqual(graph['S'], [])
+
+    def test_pool_uses_forkserver_and_shuts_down(self):
+        pool = things.component_pool()
+        try:
+            self.assertEqual(pool._mp_context.get_start_method(), "forkserver")
+            self.assertIs(things.component_pool(), pool)
+        finally:
+            things.shutdown_component_pool()
+        self.assertIsNone(things._component_pool)
+        things.shutdown_component_pool()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import math
+import unittest
+
+from topology_index import TopologyIndex, line_neighbors
+
+
+def two_lines():
+    """Two lines of five stations 3 m apart, 12 m between lines; each station linked to the next."""
+    positions, edges = {}, set()
+    for line in range(2):
+        for i in range(5):
+            positions[f"L{line}S{i}"] = [i * 3.0, line * 12.0]
+            if i:
+                edges.add((f"L{line}S{i - 1}", f"L{line}S{i}"))
+    return positions, edges
+
+
+class TestTopologyIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = TopologyIndex(4, *two_lines())
+
+    def test_within_radius(self):
+        self.assertEqual([entry["id"] for entry in self.index.within("L0S2", 3.5)], ["L0S1", "L0S3"])
+        found = self.index.within((6.0, 6.0), 6.0)
+        self.assertEqual({entry["id"] for entry in found}, {"L0S2", "L1S2"})
+        self.assertEqual(found[0]["distance"], 6.0)
+
+    def test_nearest(self):
+        self.assertEqual([entry["id"] for entry in self.index.nearest("L0S0", 2)], ["L0S1", "L0S2"])
+        self.assertEqual(len(self.index.nearest("L0S0", 50)), 9)
+        nearest = self.index.nearest((0.0, 11.0), 1)[0]
+        self.assertEqual(nearest["id"], "L1S0")
+        self.assertTrue(math.isclose(nearest["distance"], 1.0))
+
+    def test_hop_paths(self):
+        self.assertEqual(self.index.hop_path("L0S4", "L0S1"), ["L0S4", "L0S3", "L0S2", "L0S1"])
+        self.assertEqual(self.index.hop_count("L0S0", "L0S4"), 4)
+        self.assertEqual(self.index.hop_path("L0S0", "L0S0"), ["L0S0"])
+        self.assertIsNone(self.index.hop_path("L0S0", "L1S0"))
+
+    def test_hop_tables_are_built_per_source(self):
+        index = TopologyIndex(4, *two_lines(), hop_cache=2)
+        self.assertEqual(len(index.hop_tables), 0)
+        index.hop_path("L0S0", "L0S4")
+        index.hop_count("L0S0", "L0S2")
+        index.hop_count("L1S0", "L1S2")
+        self.assertEqual(len(index.hop_tables), 2)
+        index.hop_count("L0S0", "L0S1")
+        index.hop_count("L1S4", "L1S0")
+        self.assertEqual([index.ids[i] for i in index.hop_tables], ["L0S0", "L1S4"])
+        self.assertEqual(index.hop_path("L1S0", "L1S2"), ["L1S0", "L1S1", "L1S2"])
+
+    def test_line_neighbors(self):
+        line_order = {"lines": [["L1S4", "L1S3", "L1S2"]],
+                      "stations": {"L1S4": {"line": 0, "order": 0}, "L1S3": {"line": 0, "order": 1},
+                                   "L1S2": {"line": 0, "order": 2}}}
+        line = line_neighbors(line_order, "L1S3")
+        self.assertEqual((line["line"], line["order"], line["length"]), (0, 1, 3))
+        self.assertEqual(line["upstream"], ["L1S4"])
+        self.assertEqual(line["downstream"], ["L1S2"])
+        self.assertEqual(line_neighbors(line_order, "L1S2")["upstream"], ["L1S3", "L1S4"])
+        self.assertIsNone(line_neighbors(line_order, "L0S0"))
+
+    def test_empty_topology(self):
+        index = TopologyIndex(None, {}, set())
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.nearest((0.0, 0.0), 3), [])
+        self.assertEqual(index.within((0.0, 0.0), 3), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
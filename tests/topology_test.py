@@ -0,0 +1,189 @@
+import threading
+import unittest
+
+import codec
+from topology import TopologyPublisher, TopologyView, graph_edges
+
+
+def line_topology(num_points, shift=None):
+    positions = {f"S{i:03d}": [float(i), 0.0] for i in range(num_points)}
+    if shift:
+        for node_id, (dx, dy) in shift.items():
+            positions[node_id] = [positions[node_id][0] + dx, positions[node_id][1] + dy]
+    graph = {f"S{i:03d}": [f"S{j:03d}" for j in (i - 1, i + 1) if 0 <= j < num_points]
+             for i in range(num_points)}
+    return positions, graph
+
+
+def deliver(view, update, fmt="json"):
+    """Sends an update through the codec like the MQTT path does."""
+    kind, message = update
+    if kind == "snapshot":
+        payload = codec.encode_snapshot(message["seq"], message["positions"], message["graph"], fmt,
+                                        epoch=message["epoch"])
+        return view.apply_snapshot(codec.decode(payload)), len(payload)
+    payload = codec.encode_delta(message["seq"], message["moved"], message["removed"],
+                                 message["added_edges"], message["removed_edges"], fmt, epoch=message["epoch"])
+    return view.apply_delta(codec.decode(payload)), len(payload)
+
+
+class TestTopologyStream(unittest.TestCase):
+    def test_view_follows_publisher(self):
+        for fmt in codec.PAYLOAD_FORMATS:
+            with self.subTest(fmt=fmt):
+                publisher, view = TopologyPublisher(move_threshold=0.05, snapshot_every=100), TopologyView()
+                positions, graph = line_topology(10)
+                deliver(view, publisher.update(positions, graph), fmt)
+
+                positions, graph = line_topology(10, shift={"S003": (0.0, 1.0)})
+                del positions["S009"], graph["S009"]
+                graph["S008"] = ["S007"]
+                graph["S000"].append("S005")
+                graph["S005"].append("S000")
+                kind, message = publisher.update(positions, graph)
+                self.assertEqual(kind, "delta")
+                self.assertEqual(set(message["moved"]), {"S003"})
+                self.assertEqual(message["removed"], ["S009"])
+                self.assertTrue(deliver(view, (kind, message), fmt)[0])
+
+                self.assertEqual(set(view.positions), set(positions))
+                self.assertEqual(view.positions["S003"], [3.0, 1.0])
+                self.assertEqual(view.edges, graph_edges(graph))
+                self.assertEqual(view.seq, 2)
+
+    def test_unchanged_solve_publishes_nothing(self):
+        publisher = TopologyPublisher(move_threshold=0.05)
+        positions, graph = line_topology(5)
+        publisher.update(positions, graph)
+        self.assertIsNone(publisher.update(line_topology(5, shift={"S001": (0.01, 0.0)})[0], graph))
+        self.assertEqual(publisher.seq, 1)
+
+    def test_small_moves_accumulate_until_threshold(self):
+        publisher = TopologyPublisher(move_threshold=0.05)
+        positions, graph = line_topology(5)
+        publisher.update(positions, graph)
+        self.assertIsNone(publisher.update(line_topology(5, shift={"S001": (0.03, 0.0)})[0], graph))
+        kind, message = publisher.update(line_topology(5, shift={"S001": (0.06, 0.0)})[0], graph)
+        self.assertEqual((kind, list(message["moved"])), ("delta", ["S001"]))
+
+    def test_gap_marks_view_stale_until_snapshot(self):
+        publisher, view = TopologyPublisher(snapshot_every=100), TopologyView()
+        deliver(view, publisher.update(*line_topology(20)))
+        publisher.update(*line_topology(20, shift={"S001": (0.0, 1.0)}))  # lost
+        update = publisher.update(*line_topology(20, shift={"S001": (0.0, 1.0), "S002": (0.0, 1.0)}))
+        self.assertFalse(deliver(view, update)[0])
+        self.assertTrue(view.stale)
+        self.assertTrue(view.apply_delta(update[1]) is False)
+
+        self.assertTrue(view.apply_snapshot(publisher.snapshot()))
+        self.assertFalse(view.stale)
+        self.assertEqual(view.positions["S002"], [2.0, 1.0])
+        self.assertTrue(deliver(view, publisher.update(*line_topology(20, shift={"S004": (1.0, 1.0)})))[0])
+
+    def test_redelivered_delta_is_ignored(self):
+        publisher, view = TopologyPublisher(snapshot_every=100), TopologyView()
+        deliver(view, publisher.update(*line_topology(20)))
+        update = publisher.update(*line_topology(20, shift={"S001": (0.0, 1.0)}))
+        deliver(view, update)
+        version = view.version
+        self.assertTrue(deliver(view, update)[0])
+        self.assertEqual(view.version, version)
+
+    def test_restored_publisher_is_stale_until_next_update(self):
+        positions, graph = line_topology(5)
+        publisher, view = TopologyPublisher(snapshot_every=100), TopologyView()
+        publisher.restore(positions, graph_edges(graph))
+        self.assertTrue(view.apply_snapshot(publisher.snapshot()))
+        self.assertEqual((view.seq, view.stale, view.positions), (1, True, positions))
+
+        kind, message = publisher.update(positions, graph)  # unchanged, still republished fresh
+        self.assertEqual((kind, message["seq"]), ("snapshot", 2))
+        self.assertTrue(view.apply_snapshot(message))
+        self.assertFalse(view.stale)
+        self.assertIsNone(publisher.update(positions, graph))
+
+    def test_restarted_publisher_resets_view(self):
+        view = TopologyView()
+        before = TopologyPublisher(snapshot_every=100)
+        deliver(view, before.update(*line_topology(5)))
+        for step in range(1, 6):
+            self.assertTrue(deliver(view, before.update(*line_topology(5, shift={"S002": (0.0, step)})))[0])
+        self.assertEqual(view.seq, 6)
+
+        # A new instance counts from 1 again: its snapshot replaces the state
+        # and its deltas are applied although their seq is not above 6
+        after = TopologyPublisher(snapshot_every=100)
+        self.assertTrue(deliver(view, after.update(*line_topology(5, shift={"S002": (0.0, 9.0)})))[0])
+        self.assertEqual((view.epoch, view.seq, view.positions["S002"]), (after.epoch, 1, [2.0, 9.0]))
+        self.assertTrue(deliver(view, after.update(*line_topology(5, shift={"S002": (0.0, 20.0)})))[0])
+        self.assertEqual((view.seq, view.positions["S002"]), (2, [2.0, 20.0]))
+        self.assertFalse(view.stale)
+
+        # A late delta of the old instance cannot be applied on the new state
+        self.assertFalse(view.apply_delta(dict(before.update(*line_topology(5))[1], seq=3)))
+        self.assertTrue(view.stale)
+
+    def test_restore_starts_a_new_epoch(self):
+        publisher, view = TopologyPublisher(snapshot_every=100), TopologyView()
+        for step in range(4):
+            deliver(view, publisher.update(*line_topology(5, shift={"S001": (0.0, step)})))
+        epoch = publisher.epoch
+        positions, graph = line_topology(5)
+        publisher.restore(positions, graph_edges(graph))
+        self.assertNotEqual(publisher.epoch, epoch)
+        self.assertTrue(deliver(view, ("snapshot", publisher.snapshot()))[0])
+        self.assertEqual((view.seq, view.positions["S001"]), (1, [1.0, 0.0]))
+
+    def test_periodic_snapshots(self):
+        publisher = TopologyPublisher(snapshot_every=3)
+        kinds = [publisher.update(*line_topology(20, shift={"S001": (0.0, step)}))[0] for step in range(7)]
+        self.assertEqual(kinds, ["snapshot", "delta", "delta", "snapshot", "delta", "delta", "snapshot"])
+
+    def test_delta_size_follows_change_not_fleet(self):
+        publisher, view = TopologyPublisher(snapshot_every=100), TopologyView()
+        _, snapshot_size = deliver(view, publisher.update(*line_topology(500)), "binary")
+        _, delta_size = deliver(view, publisher.update(*line_topology(500, shift={"S100": (0.0, 1.0)})), "binary")
+        self.assertLess(delta_size * 50, snapshot_size)
+
+
+class TestTopologyViewThreads(unittest.TestCase):
+    def test_state_is_consistent_while_deltas_apply(self):
+        publisher, view = TopologyPublisher(move_threshold=0.0, snapshot_every=10 ** 6), TopologyView()
+        view.apply_snapshot(publisher.update(*line_topology(50))[1])
+        updates = [publisher.update(*line_topology(50, shift={f"S{i:03d}": (0.0, 1.0)}))[1] for i in range(50)]
+        errors = []
+
+        def read():
+            for _ in range(200):
+                version, positions, edges, _ = view.state()
+                if len(positions) != 50 or len(edges) != 49:
+                    errors.append(version)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for update in updates:
+            view.apply_delta(update)
+        reader.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(view.seq, 51)
+
+    def test_wait_for_change(self):
+        view = TopologyView()
+        publisher = TopologyPublisher()
+        self.assertEqual(view.wait_for_change(0, timeout=0.01), 0)
+        timer = threading.Timer(0.05, view.apply_snapshot, [publisher.update(*line_topology(3))[1]])
+        timer.start()
+        self.assertEqual(view.wait_for_change(0, timeout=2), 1)
+        timer.join()
+
+    def test_turning_stale_bumps_version(self):
+        publisher, view = TopologyPublisher(snapshot_every=100), TopologyView()
+        view.apply_snapshot(publisher.update(*line_topology(20))[1])
+        publisher.update(*line_topology(20, shift={"S001": (0.0, 1.0)}))
+        view.apply_delta(publisher.update(*line_topology(20, shift={"S002": (0.0, 1.0)}))[1])
+        version, _, _, stale = view.state()
+        self.assertEqual((version, stale), (2, True))
+
+
+if __name__ == "__main__":
+    unittest.main()